@@ -138,6 +138,45 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Cache for user_dashboard.response_cache; file based by default so that
+# every worker process sees the same generation counters
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=os.path.join(BASE_DIR, '.cache')),
+    }
+}
+
+# List search (user_dashboard.search): 'prefix' works on every database;
+# 'fulltext' adds word-prefix matching through the FTS5/FULLTEXT indexes
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='prefix')
+# Also match substrings in prefix searches: 'on', 'off', or 'auto' (only on
+# PostgreSQL, the one database with an index for it, pg_trgm)
+SEARCH_SUBSTRING = config('SEARCH_SUBSTRING', default='auto')
+
+# Router telemetry (user_dashboard.telemetry): time-series file and poll interval in seconds
+TELEMETRY_DB = config('TELEMETRY_DB', default=os.path.join(BASE_DIR, '.telemetry.sqlite3'))
+TELEMETRY_INTERVAL = config('TELEMETRY_INTERVAL', default=60, cast=int)
+
+# Router connection detection (user_dashboard.connections): shared secret of the
+# VPN side's router-connected webhook, and the watch_connections cycle in seconds
+VPN_WEBHOOK_SECRET = config('VPN_WEBHOOK_SECRET', default='')
+CONNECTION_WATCH_INTERVAL = config('CONNECTION_WATCH_INTERVAL', default=5, cast=int)
+
+# Payment webhooks (user_dashboard.payment_events): worker threads per process applying
+# stored events; 0 leaves them all to manage.py process_payment_events
+PAYMENT_EVENT_WORKERS = config('PAYMENT_EVENT_WORKERS', default=4, cast=int)
+
+# IntaSend gateway (user_dashboard.intasend_client). INTASEND_BASE_URL overrides the
+# sandbox/live API root, e.g. for manage.py fake_intasend; INTASEND_ASYNC_CHECKOUT makes
+# initiate_payment answer before the gateway does
+INTASEND_PUBLISHABLE_KEY = config('INTASEND_PUBLISHABLE_KEY', default='')
+INTASEND_SECRET_KEY = config('INTASEND_SECRET_KEY', default='')
+INTASEND_TEST = config('INTASEND_TEST', default=True, cast=bool)
+INTASEND_BASE_URL = config('INTASEND_BASE_URL', default='')
+INTASEND_TIMEOUT = config('INTASEND_TIMEOUT', default=10, cast=float)
+INTASEND_ASYNC_CHECKOUT = config('INTASEND_ASYNC_CHECKOUT', default=False, cast=bool)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -28,6 +28,8 @@ router_url_patterns = [
     path('api/routers/', views.router_list, name='router_list'),  # GET all
     path('api/routers/create/', views.router_create, name='router_create'),  # POST
     path('api/routers/provision/', mtk_views.gen_mtk_provision, name='router_provison'),  # POST
+    path('api/routers/provision/batch/', mtk_views.gen_mtk_provision_batch, name='router_provision_batch'),  # POST
+    path('api/routers/provision/status/', mtk_views.provision_status, name='router_provision_status'),
     path('provision_content/<encoded_payload>/', mtk_views.provision_content, name='provision_content'),  # POST
     path('provision_content/<encoded_payload>/ovpn/<int:version>/', mtk_views.provision_version_content,
          name='provision_version_content'),  # POST
@@ -37,6 +39,8 @@ router_url_patterns = [
     path('api/routers/count/', views.router_count, name='router_count'),
     path('api/routers/interface/', views.router_interfaces, name='router_interfaces'),
     path('api/routers/check-connection/<mtk>/', views.check_connection, name='router_conn'),  # DELETE
+    path('api/routers/connected/', views.router_connected_webhook, name='router_connected_webhook'),  # POST
+    path('api/routers/<int:pk>/metrics/', views.router_metrics, name='router_metrics'),  # GET
 ]
 
 pkg_url_patterns = [
@@ -55,6 +59,9 @@ user_urlpatterns: list[URLResolver | URLPattern] = [
     path('api/user/<int:pk>/', views.user_detail, name='user_detail'),  # GET one
     path('api/user/<int:pk>/update/', views.user_update, name='user_update'),  # PUT/PATCH
     path('api/clients/delete/', views.delete_client, name='user_delete'),  # DELETE
+    path('api/clients/import/', views.client_import, name='client_import'),  # POST
+    path('api/clients/import/<int:pk>/', views.client_import_status, name='client_import_status'),  # GET
+    path('api/exports/<str:kind>/', views.export_data, name='export_data'),  # GET, streamed
 ]
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -63,6 +70,7 @@ urlpatterns = [
 
     #Payment Enpoints 
     path('api/initiate-payment/', views.initiate_payment, name='initiate_payment'),
+    path('api/payments/<str:invoice_id>/status/', views.payment_status, name='payment_status'),  # GET
     path('api/intasend_webhook/', views.intasend_webhook_view, name='initiate_payment'),
 
 
@@ -82,7 +90,6 @@ urlpatterns = [
     # Add these new patterns
     path('mikrotik/hotspot/<str:router_identity>/<str:file_name>', serve_hotspot_file, name='hotspot_file'),
     path("hotspot/", include("user_dashboard.urls")),
-    path("test/", views.et, name="sss"),
     *team.urlpatterns
 
 ]
@@ -5,13 +5,13 @@ This package provides an intuitive interface for common ISP operations without r
 deep knowledge of MikroTik RouterOS commands and structure.
 """
 
-import requests
 import json
 from typing import Dict, List, Any, Optional, Union
 from dataclasses import dataclass
 from enum import Enum
 
-from easy_client.context import ServerContext
+from easy_client import session, cache
+from easy_client.context import ServerContext, ResultRef
 from mtk_command_api.utility import EthernetInterface, DhcpClient
 
 
@@ -34,6 +34,50 @@ class Response:
         )
 
 
+class PendingResponse(Response):
+    """
+    Response of an operation queued in a bulk context
+
+    It resolves to the operation's own result once the batch has been sent.
+    Until then ``done`` is False and ``ref()`` can be used to feed fields of the
+    result into later operations of the same batch.
+    """
+
+    def __init__(self):
+        super().__init__(success=None)
+        self.index = None
+        self.done = False
+
+    def ref(self, key: str = ".id", row: int = 0) -> ResultRef:
+        """Symbolic reference to ``data[row][key]`` of this operation's result"""
+        return ResultRef(self.index, key, row)
+
+    def resolve(self, response: Response) -> None:
+        """Fill this response with the result of the executed operation"""
+        self.success = response.success
+        self.data = response.data
+        self.error_code = response.error_code
+        self.error_message = response.error_message
+        self.done = True
+
+    def resolve_dict(self, data: Dict) -> None:
+        self.resolve(Response.from_dict(data))
+
+
+def _first_id(response: Response):
+    """
+    Get the .id of the first row of a print response
+
+    Returns a ResultRef when the print is still queued in a bulk context,
+    or None when nothing matched.
+    """
+    if isinstance(response, PendingResponse) and not response.done:
+        return response.ref(".id")
+    if not response.success or not response.data:
+        return None
+    return response.data[0].get(".id")
+
+
 class SpeedLimit(Enum):
     """Common internet speed limits"""
     UNLIMITED = "0/0"
@@ -56,7 +100,12 @@ class MikrotikClient:
     without requiring deep knowledge of MikroTik RouterOS.
     """
 
-    def __init__(self, api_url: str, username: str, password: str, api_key: Optional[str] = None, **kwargs):
+    def __init__(self, api_url: str, username: str, password: str, api_key: Optional[str] = None,
+                 timeout: float = session.DEFAULT_TIMEOUT,
+                 pool_size: int = session.DEFAULT_POOL_SIZE,
+                 retries: int = session.DEFAULT_RETRIES,
+                 backoff: float = session.DEFAULT_BACKOFF,
+                 **kwargs):
         """
         Initialize the MikroTik client
 
@@ -65,12 +114,22 @@ class MikrotikClient:
             username: MikroTik router username
             password: MikroTik router password
             api_key: Optional API key for the Flask server
+            timeout: Per-request timeout in seconds
+            pool_size: Keep-alive connections kept to the API server (shared per api_url)
+            retries: Retries for idempotent ``print`` commands on connection errors
+            backoff: Base delay in seconds between retries
         """
         self.extra_params = kwargs
         self.api_url = api_url.rstrip('/')
         self.username = username
         self.password = password
         self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = session.get_session(self.api_url, pool_size)
+        # Key of this router in the shared name -> .id cache
+        self.router_key = (self.api_url, self.extra_params.get("host"), self.username)
 
         # Create sub-clients for different sections
         self.internet_packages = InternetPackages(self)
@@ -78,7 +137,7 @@ class MikrotikClient:
         self.network = Network(self)
         self.hotspot = Hotspot(self)
         self.system = System(self)
-        self._context: SeverContext | None = None
+        self._context: ServerContext | None = None
 
     def _send_request(self, command: str, parameters: Dict = None) -> 'Response':
         """
@@ -94,11 +153,11 @@ class MikrotikClient:
         if parameters is None:
             parameters = {}
 
-        # If we're in a batch context, add the operation to the batch
+        # If we're in a batch context, queue the operation; its response resolves on flush
         if self._context and self._context.in_context:
-            self._context.add_operation(command, parameters)
-            # Return a placeholder response since actual execution will happen later
-            return Response(success=True, data={"batched": True})
+            pending = PendingResponse()
+            pending.index = self._context.add_operation(command, parameters, pending)
+            return pending
 
         payload = {
             "credentials": {
@@ -114,9 +173,13 @@ class MikrotikClient:
             payload["api_key"] = self.api_key
 
         try:
-            response = requests.post(f"{self.api_url}/api/routeros", json=payload)
-            print(response.text)
-            return Response.from_dict(response.json())
+            response = session.post(
+                self.session, f"{self.api_url}/api/routeros", payload,
+                timeout=self.timeout,
+                retries=self.retries if session.is_idempotent(command) else 0,
+                backoff=self.backoff
+            )
+            result = Response.from_dict(response.json())
         except Exception as e:
             return Response(
                 success=False,
@@ -124,6 +187,45 @@ class MikrotikClient:
                 error_message=str(e)
             )
 
+        cache.observe(self.router_key, command, parameters, result)
+        return result
+
+    def _resolve_id(self, menu: str, name: str):
+        """
+        Get the .id of a named item, from the cache when known
+
+        Args:
+            menu: RouterOS menu (e.g. "/ppp/secret")
+            name: Value of the menu's name attribute
+
+        Returns:
+            The .id, a ResultRef when the lookup is queued in a batch, or None if not found
+        """
+        item_id = cache.id_cache.get(self.router_key, menu, name)
+        if item_id is None:
+            item_id = _first_id(self._send_request(f"{menu}/print", {cache.CACHED_MENUS[menu]: name}))
+        return item_id
+
+    def _send_by_name(self, menu: str, action: str, name: str, parameters: Dict = None) -> Optional[Response]:
+        """
+        Run a command against a named item, resolving its .id first
+
+        A cached .id that the router no longer knows is dropped and looked up again.
+
+        Returns:
+            Response of the command, or None if no such item exists
+        """
+        cached = cache.id_cache.get(self.router_key, menu, name) is not None
+        item_id = self._resolve_id(menu, name)
+        if item_id is None:
+            return None
+
+        response = self._send_request(f"{menu}/{action}", {".id": item_id, **(parameters or {})})
+        if cached and cache.is_stale(response):
+            cache.id_cache.discard(self.router_key, menu, name)
+            return self._send_by_name(menu, action, name, parameters)
+        return response
+
     def send_bulk_request(self, operations: list) -> Response:
         """
         Send multiple operations in a single request
@@ -148,7 +250,8 @@ class MikrotikClient:
             payload["api_key"] = self.api_key
 
         try:
-            response = requests.post(f"{self.api_url}/api/routeros/bulk", json=payload)
+            response = session.post(self.session, f"{self.api_url}/api/routeros/bulk", payload,
+                                    timeout=self.timeout)
             return Response.from_dict(response.json())
         except Exception as e:
             return Response(
@@ -161,13 +264,16 @@ class MikrotikClient:
         """
         Create a new context for batched operations
 
+        Operations issued inside the context return PendingResponse objects and
+        are sent in bulk requests when the context exits.
+
         Args:
             context_type: Type of context ("bulk" for now)
 
         Returns:
             Context manager for the batch operations
         """
-        self._context = ServerContext(context_type)
+        self._context = ServerContext(context_type, self)
         return self._context
 
 
@@ -260,23 +366,14 @@ class InternetPackages:
         Returns:
             Response indicating success or failure
         """
-        # First find the profile to get its ID
-        profile_response = self.get(name)
-        if not profile_response.success or not profile_response.data:
+        response = self.client._send_by_name("/ppp/profile", "set", name, attributes)
+        if response is None:
             return Response(
                 success=False,
                 error_code="profile_not_found",
                 error_message=f"Internet package '{name}' not found"
             )
-
-        # Get the ID of the first matching profile
-        profile_id = profile_response.data[0].get(".id")
-
-        # Prepare parameters
-        parameters = {".id": profile_id}
-        parameters.update(attributes)
-
-        return self.client._send_request("/ppp/profile/set", parameters)
+        return response
 
     def delete(self, name: str) -> Response:
         """
@@ -288,19 +385,14 @@ class InternetPackages:
         Returns:
             Response indicating success or failure
         """
-        # First find the profile to get its ID
-        profile_response = self.get(name)
-        if not profile_response.success or not profile_response.data:
+        response = self.client._send_by_name("/ppp/profile", "remove", name)
+        if response is None:
             return Response(
                 success=False,
                 error_code="profile_not_found",
                 error_message=f"Internet package '{name}' not found"
             )
-
-        # Get the ID of the first matching profile
-        profile_id = profile_response.data[0].get(".id")
-
-        return self.client._send_request("/ppp/profile/remove", {".id": profile_id})
+        return response
 
 
 class Customers:
@@ -377,23 +469,14 @@ class Customers:
         Returns:
             Response indicating success or failure
         """
-        # First find the secret to get its ID
-        secret_response = self.get(username)
-        if not secret_response.success or not secret_response.data:
+        response = self.client._send_by_name("/ppp/secret", "set", username, attributes)
+        if response is None:
             return Response(
                 success=False,
                 error_code="customer_not_found",
                 error_message=f"Customer '{username}' not found"
             )
-
-        # Get the ID of the first matching secret
-        secret_id = secret_response.data[0].get(".id")
-
-        # Prepare parameters
-        parameters = {".id": secret_id}
-        parameters.update(attributes)
-
-        return self.client._send_request("/ppp/secret/set", parameters)
+        return response
 
     def delete(self, username: str) -> Response:
         """
@@ -405,19 +488,14 @@ class Customers:
         Returns:
             Response indicating success or failure
         """
-        # First find the secret to get its ID
-        secret_response = self.get(username)
-        if not secret_response.success or not secret_response.data:
+        response = self.client._send_by_name("/ppp/secret", "remove", username)
+        if response is None:
             return Response(
                 success=False,
                 error_code="customer_not_found",
                 error_message=f"Customer '{username}' not found"
             )
-
-        # Get the ID of the first matching secret
-        secret_id = secret_response.data[0].get(".id")
-
-        return self.client._send_request("/ppp/secret/remove", {".id": secret_id})
+        return response
 
     def get_active_connections(self) -> Response:
         """
@@ -438,19 +516,14 @@ class Customers:
         Returns:
             Response indicating success or failure
         """
-        # First find the active connection to get its ID
-        active_response = self.client._send_request("/ppp/active/print", {"name": username})
-        if not active_response.success or not active_response.data:
+        response = self.client._send_by_name("/ppp/active", "remove", username)
+        if response is None:
             return Response(
                 success=False,
                 error_code="not_connected",
                 error_message=f"Customer '{username}' is not currently connected"
             )
-
-        # Get the ID of the first matching active connection
-        active_id = active_response.data[0].get(".id")
-
-        return self.client._send_request("/ppp/active/remove", {".id": active_id})
+        return response
 
 
 class Network:
@@ -610,18 +683,14 @@ class Network:
         Returns:
             Response indicating success or failure
         """
-        # First get the port ID
-        port_response = self.client._send_request("/interface/bridge/port/print", {"interface": interface})
-
-        if not port_response.success or not port_response.data:
+        response = self.client._send_by_name("/interface/bridge/port", "remove", interface)
+        if response is None:
             return Response(
                 success=False,
                 error_code="port_not_found",
                 error_message=f"Bridge port for interface '{interface}' not found"
             )
-
-        port_id = port_response.data[0].get(".id")
-        return self.client._send_request("/interface/bridge/port/remove", {".id": port_id})
+        return response
 
 
 class Hotspot:
@@ -788,3 +857,6 @@ class System:
             Response indicating success or failure
         """
         return self.client._send_request("/system/identity/set", {"name": name})
+
+
+from easy_client.aio import AsyncMikrotikClient
@@ -0,0 +1,262 @@
+"""
+Asyncio variant of the MikroTik Easy Client
+
+Mirrors MikrotikClient and its sub-clients, but every call is a coroutine sent
+over a shared async HTTP session, so one event loop can drive many routers
+concurrently:
+
+    clients = [AsyncMikrotikClient(API_URL, user, pwd, host=r) for r in routers]
+    results = await asyncio.gather(*(c.system.get_resources() for c in clients))
+
+Results are the same Response objects returned by the synchronous client.
+"""
+
+from typing import Dict, List, Optional
+
+from easy_client import (
+    session, cache, Response, InternetPackages, Customers, Network, Hotspot, System, _first_id
+)
+from mtk_command_api.utility import EthernetInterface, DhcpClient
+
+
+class AsyncMikrotikClient:
+    """
+    Async client for interacting with MikroTik routers through a Flask API server
+
+    Sub-clients expose the same methods as MikrotikClient; each one returns
+    an awaitable resolving to a Response.
+    """
+
+    def __init__(self, api_url: str, username: str, password: str, api_key: Optional[str] = None,
+                 timeout: float = session.DEFAULT_TIMEOUT,
+                 pool_size: int = session.DEFAULT_POOL_SIZE,
+                 retries: int = session.DEFAULT_RETRIES,
+                 backoff: float = session.DEFAULT_BACKOFF,
+                 **kwargs):
+        """
+        Initialize the async MikroTik client
+
+        Args:
+            api_url: URL of the Flask API server
+            username: MikroTik router username
+            password: MikroTik router password
+            api_key: Optional API key for the Flask server
+            timeout: Per-request timeout in seconds
+            pool_size: Concurrent connections kept to the API server (shared per api_url and loop)
+            retries: Retries for idempotent ``print`` commands on connection errors
+            backoff: Base delay in seconds between retries
+        """
+        self.extra_params = kwargs
+        self.api_url = api_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.api_key = api_key
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        # Key of this router in the shared name -> .id cache
+        self.router_key = (self.api_url, self.extra_params.get("host"), self.username)
+
+        # Create sub-clients for different sections
+        self.internet_packages = AsyncInternetPackages(self)
+        self.customers = AsyncCustomers(self)
+        self.network = AsyncNetwork(self)
+        self.hotspot = AsyncHotspot(self)
+        self.system = AsyncSystem(self)
+
+    def _payload(self, **fields) -> Dict:
+        payload = {
+            "credentials": {
+                "username": self.username,
+                "password": self.password
+            },
+            **fields,
+            **self.extra_params
+        }
+
+        if self.api_key:
+            payload["api_key"] = self.api_key
+        return payload
+
+    async def _send_request(self, command: str, parameters: Dict = None) -> Response:
+        """
+        Send request to the API server
+
+        Args:
+            command: RouterOS command path
+            parameters: Command parameters
+
+        Returns:
+            Response object with result or error information
+        """
+        payload = self._payload(command=command, parameters=parameters or {})
+
+        try:
+            response = await session.async_post(
+                session.get_async_session(self.api_url, self.pool_size),
+                f"{self.api_url}/api/routeros", payload,
+                timeout=self.timeout,
+                retries=self.retries if session.is_idempotent(command) else 0,
+                backoff=self.backoff
+            )
+            result = Response.from_dict(response.json())
+        except Exception as e:
+            return Response(
+                success=False,
+                error_code="request_failed",
+                error_message=str(e)
+            )
+
+        cache.observe(self.router_key, command, parameters or {}, result)
+        return result
+
+    async def _resolve_id(self, menu: str, name: str) -> Optional[str]:
+        """Get the .id of a named item, from the cache when known"""
+        item_id = cache.id_cache.get(self.router_key, menu, name)
+        if item_id is None:
+            item_id = _first_id(await self._send_request(f"{menu}/print", {cache.CACHED_MENUS[menu]: name}))
+        return item_id
+
+    async def _send_by_name(self, menu: str, action: str, name: str,
+                            parameters: Dict = None) -> Optional[Response]:
+        """Run a command against a named item; None if no such item exists"""
+        cached = cache.id_cache.get(self.router_key, menu, name) is not None
+        item_id = await self._resolve_id(menu, name)
+        if item_id is None:
+            return None
+
+        response = await self._send_request(f"{menu}/{action}", {".id": item_id, **(parameters or {})})
+        if cached and cache.is_stale(response):
+            cache.id_cache.discard(self.router_key, menu, name)
+            return await self._send_by_name(menu, action, name, parameters)
+        return response
+
+    async def send_bulk_request(self, operations: list) -> Response:
+        """
+        Send multiple operations in a single request
+
+        Args:
+            operations: List of operations (command + parameters)
+
+        Returns:
+            Response object with combined results
+        """
+        payload = self._payload(bulk=True, operations=operations)
+
+        try:
+            response = await session.async_post(
+                session.get_async_session(self.api_url, self.pool_size),
+                f"{self.api_url}/api/routeros/bulk", payload,
+                timeout=self.timeout
+            )
+            return Response.from_dict(response.json())
+        except Exception as e:
+            return Response(
+                success=False,
+                error_code="request_failed",
+                error_message=str(e)
+            )
+
+
+class AsyncInternetPackages(InternetPackages):
+    """Async internet packages (PPP profiles)"""
+
+    async def update(self, name: str, **attributes) -> Response:
+        response = await self.client._send_by_name("/ppp/profile", "set", name, attributes)
+        if response is None:
+            return Response(
+                success=False,
+                error_code="profile_not_found",
+                error_message=f"Internet package '{name}' not found"
+            )
+        return response
+
+    async def delete(self, name: str) -> Response:
+        response = await self.client._send_by_name("/ppp/profile", "remove", name)
+        if response is None:
+            return Response(
+                success=False,
+                error_code="profile_not_found",
+                error_message=f"Internet package '{name}' not found"
+            )
+        return response
+
+
+class AsyncCustomers(Customers):
+    """Async customer connections (PPP secrets)"""
+
+    async def update(self, username: str, **attributes) -> Response:
+        response = await self.client._send_by_name("/ppp/secret", "set", username, attributes)
+        if response is None:
+            return Response(
+                success=False,
+                error_code="customer_not_found",
+                error_message=f"Customer '{username}' not found"
+            )
+        return response
+
+    async def delete(self, username: str) -> Response:
+        response = await self.client._send_by_name("/ppp/secret", "remove", username)
+        if response is None:
+            return Response(
+                success=False,
+                error_code="customer_not_found",
+                error_message=f"Customer '{username}' not found"
+            )
+        return response
+
+    async def disconnect(self, username: str) -> Response:
+        response = await self.client._send_by_name("/ppp/active", "remove", username)
+        if response is None:
+            return Response(
+                success=False,
+                error_code="not_connected",
+                error_message=f"Customer '{username}' is not currently connected"
+            )
+        return response
+
+
+class AsyncNetwork(Network):
+    """Async network settings"""
+
+    async def list_ports(self) -> List[EthernetInterface]:
+        res = await self.client._send_request("/interface/ethernet/print")
+        if res.success and res.data:
+            return [EthernetInterface.from_dict(d) for d in res.data]
+        return []
+
+    @property
+    async def wan(self) -> List[DhcpClient]:
+        res = await self.client._send_request("/ip/dhcp-client/print")
+        if res.success and res.data:
+            return [DhcpClient.from_dict(d) for d in res.data]
+        return []
+
+    async def ip_addresses(self, interface=None) -> Response | str:
+        res = await self.client._send_request("/ip/address/print")
+        if not interface:
+            return res
+        if res.success and res.data:
+            matching = list(filter(lambda e: interface in e['interface'], res.data))
+            if matching:
+                return matching[0]['address'].split('/')[0]
+        return ''
+
+    async def remove_bridge_port(self, interface: str) -> Response:
+        response = await self.client._send_by_name("/interface/bridge/port", "remove", interface)
+        if response is None:
+            return Response(
+                success=False,
+                error_code="port_not_found",
+                error_message=f"Bridge port for interface '{interface}' not found"
+            )
+        return response
+
+
+class AsyncHotspot(Hotspot):
+    """Async hotspot services"""
+
+
+class AsyncSystem(System):
+    """Async system settings and operations"""
@@ -0,0 +1,107 @@
+"""
+Name to .id resolution cache for the MikroTik Easy Client
+
+RouterOS mutations (set/remove) address items by their internal ``.id``.
+Looking it up costs a ``print`` round trip before every update or delete, so
+ids seen in print/add responses are remembered per router and per menu.
+"""
+
+import threading
+from typing import Dict, Hashable, Optional
+
+# Menus whose items are cached, mapped to the attribute used as their name
+CACHED_MENUS = {
+    "/ppp/profile": "name",
+    "/ppp/secret": "name",
+    "/ppp/active": "name",
+    "/interface/bridge/port": "interface",
+}
+
+
+class IdCache:
+    """Thread-safe name -> .id map per (router, menu)"""
+
+    def __init__(self):
+        self._menus: Dict[tuple, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, router: Hashable, menu: str, name: str) -> Optional[str]:
+        with self._lock:
+            return self._menus.get((router, menu), {}).get(name)
+
+    def put(self, router: Hashable, menu: str, name: str, item_id: str) -> None:
+        with self._lock:
+            self._menus.setdefault((router, menu), {})[name] = item_id
+
+    def fill(self, router: Hashable, menu: str, items: Dict[str, str]) -> None:
+        """Replace everything known about a menu with a full listing"""
+        with self._lock:
+            self._menus[(router, menu)] = dict(items)
+
+    def discard(self, router: Hashable, menu: str, name: str) -> None:
+        with self._lock:
+            self._menus.get((router, menu), {}).pop(name, None)
+
+    def discard_id(self, router: Hashable, menu: str, item_id: str) -> None:
+        with self._lock:
+            names = self._menus.get((router, menu), {})
+            for name in [n for n, i in names.items() if i == item_id]:
+                del names[name]
+
+    def clear(self, router: Hashable = None) -> None:
+        """Forget a single router, or every router when none is given"""
+        with self._lock:
+            if router is None:
+                self._menus.clear()
+            else:
+                for key in [k for k in self._menus if k[0] == router]:
+                    del self._menus[key]
+
+
+id_cache = IdCache()
+
+
+def split_command(command: str) -> tuple:
+    """Split ``/ppp/secret/print`` into (``/ppp/secret``, ``print``)"""
+    menu, _, action = ("/" + command.strip("/")).rpartition("/")
+    return menu, action
+
+
+def added_id(data) -> Optional[str]:
+    """Extract the new item's .id from an ``add`` response"""
+    if isinstance(data, list) and len(data) == 1:
+        data = data[0]
+    if isinstance(data, dict):
+        data = data.get("ret") or data.get(".id")
+    return data if isinstance(data, str) else None
+
+
+def is_stale(response) -> bool:
+    """Check whether a mutation failed because the .id no longer exists"""
+    return not response.success and "no such item" in (response.error_message or "").lower()
+
+
+def observe(router: Hashable, command: str, parameters: Dict, response) -> None:
+    """Update the cache from the response of an executed command"""
+    menu, action = split_command(command)
+    key = CACHED_MENUS.get(menu)
+    if key is None or not response.success:
+        return
+
+    if action == "print" and isinstance(response.data, list):
+        items = {row[key]: row[".id"] for row in response.data
+                 if isinstance(row, dict) and key in row and ".id" in row}
+        if parameters:
+            for name, item_id in items.items():
+                id_cache.put(router, menu, name, item_id)
+        else:
+            id_cache.fill(router, menu, items)
+    elif action == "add" and key in parameters:
+        item_id = added_id(response.data)
+        if item_id:
+            id_cache.put(router, menu, parameters[key], item_id)
+    elif action == "remove" and isinstance(parameters.get(".id"), str):
+        id_cache.discard_id(router, menu, parameters[".id"])
+    elif action == "set" and key in parameters and isinstance(parameters.get(".id"), str):
+        id_cache.discard_id(router, menu, parameters[".id"])
+        id_cache.put(router, menu, parameters[key], parameters[".id"])
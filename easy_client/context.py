@@ -1,42 +1,176 @@
+from easy_client.cache import observe
+
+
+class ResultRef:
+    """
+    Symbolic reference to a field of an earlier operation's result in the same batch
+
+    It is never sent to the server: the context substitutes it with the value
+    found at ``results[index].data[row][key]`` once that operation has run.
+    """
+
+    def __init__(self, index: int, key: str = ".id", row: int = 0):
+        self.index = index
+        self.key = key
+        self.row = row
+
+    def __repr__(self):
+        return f"ResultRef({self.index}, {self.key!r}, row={self.row})"
+
+
+class UnresolvedRef(Exception):
+    """The referenced result failed or has no such row/key"""
+
+
+def _refs(value) -> set:
+    """Indexes of the operations a parameter value refers to"""
+    if isinstance(value, ResultRef):
+        return {value.index}
+    if isinstance(value, dict):
+        return set().union(*(_refs(v) for v in value.values()))
+    if isinstance(value, (list, tuple)):
+        return set().union(*(_refs(v) for v in value))
+    return set()
+
+
+def _substitute(value, results: dict):
+    """Replace every ResultRef in a parameter value by the referenced result field"""
+    if isinstance(value, ResultRef):
+        response = results.get(value.index)
+        try:
+            if not response.success:
+                raise UnresolvedRef(f"Operation {value.index} failed: {response.error_message}")
+            return response.data[value.row][value.key]
+        except (AttributeError, IndexError, KeyError, TypeError):
+            raise UnresolvedRef(f"Operation {value.index} returned no {value.key!r} at row {value.row}")
+    if isinstance(value, dict):
+        return {k: _substitute(v, results) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_substitute(v, results) for v in value]
+    return value
+
+
 class ServerContext:
     """
     Context manager for batching operations to be sent in bulk
+
+    Operations issued through the client while the context is open are queued
+    and answered with pending responses. On exit the queue is sent in bulk
+    requests and every pending response is resolved with its own result.
+
+    Operations referring to the result of another queued operation (ResultRef)
+    cannot go out in the same request, because the server does not resolve
+    references. The queue is therefore sent in waves: each bulk request holds
+    every operation whose references are already answered, and the referenced
+    values are filled in on the client. A batch without references is a
+    single request; lookup-then-mutate batches take two.
     """
 
-    def __init__(self, context_type):
+    def __init__(self, context_type, client=None):
         self.context_type = context_type
+        self.client = client
         self.in_context = False
         self.operations = []
+        self.pending = []
+        self.result = None
 
     def __enter__(self):
         self.in_context = True
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.in_context = False
+        try:
+            if exc_type is None and self.operations:
+                self.run_process()
+        finally:
+            self.in_context = False
+
+    def add_operation(self, command: str, parameters: dict, pending=None) -> int:
+        """
+        Add an operation to the batch queue
 
-    def add_operation(self, command: str, parameters: dict):
-        """Add an operation to the batch queue"""
+        Args:
+            command: RouterOS command path
+            parameters: Command parameters, may contain ResultRef values
+            pending: Pending response to resolve once the batch has run
+
+        Returns:
+            Index of the operation in the batch
+        """
         if not self.in_context:
             raise RuntimeError("Cannot add operations outside of context!")
 
+        index = len(self.operations)
         self.operations.append({
+            "id": index,
             "command": command,
             "parameters": parameters
         })
+        self.pending.append(pending)
+        return index
 
     def run_process(self):
         """
-        Execute all batched operations and return the results
+        Execute all batched operations and resolve their responses
+
+        Returns:
+            Response of the last bulk request
         """
         if not self.in_context:
             raise RuntimeError("Cannot run process outside of context!")
 
-        if self.context_type == "bulk":
-            return {
-                "status": "success",
-                "operations_count": len(self.operations),
-                "bulk_id": id(self)  # Using object id as a simple unique identifier
-            }
-        else:
+        if self.context_type != "bulk":
             raise ValueError(f"Unsupported context type: {self.context_type}")
+        if self.client is None:
+            raise RuntimeError("Bulk context has no client to send operations with!")
+
+        operations, pending = self.operations, self.pending
+        self.operations, self.pending = [], []
+
+        results = {}
+        waiting = list(operations)
+        while waiting:
+            ready = [op for op in waiting if _refs(op["parameters"]) <= results.keys()]
+            if not ready:
+                # References to operations that are not part of this batch
+                ready = waiting
+            waiting = [op for op in waiting if op not in ready]
+            batch = []
+            for op in ready:
+                try:
+                    batch.append({**op, "parameters": _substitute(op["parameters"], results)})
+                except UnresolvedRef as e:
+                    results[op["id"]] = self._failure("unresolved_reference", str(e))
+            if batch:
+                self.result = self.client.send_bulk_request(batch)
+                results.update(self._split(batch, self.result))
+                for op in batch:
+                    observe(self.client.router_key, op["command"], op["parameters"], results[op["id"]])
+
+        for i, response in enumerate(pending):
+            if response is not None:
+                response.resolve(results[i])
+        return self.result
+
+    def _split(self, batch: list, result) -> dict:
+        """Per-operation responses of a bulk request"""
+        data = result.data if result.success else None
+        if isinstance(data, list) and len(data) == len(batch):
+            return {op["id"]: self._response(row) for op, row in zip(batch, data)}
+        if result.success:
+            failure = self._failure("invalid_bulk_response",
+                                    "Bulk response does not hold one result per operation")
+        else:
+            failure = self._failure(result.error_code, result.error_message)
+        return {op["id"]: failure for op in batch}
+
+    @staticmethod
+    def _response(row):
+        from easy_client import Response
+        return Response.from_dict(row) if isinstance(row, dict) else \
+            Response(success=False, error_code="invalid_bulk_response", error_message=f"Unexpected result {row!r}")
+
+    @staticmethod
+    def _failure(code, message):
+        from easy_client import Response
+        return Response(success=False, error_code=code, error_message=message)
@@ -1,4 +1,4 @@
-from easy_client import SpeedLimit, MikrotikClient
+from easy_client import SpeedLimit, MikrotikClient, Response
 
 
 class SiteSetup:
@@ -59,14 +59,14 @@ class SiteSetup:
         bridge_name = f"{site_id}-bridge"
 
         # Create bridge
-        result = self.client.network._send_request("interface/bridge/add", {
+        result = self.client._send_request("interface/bridge/add", {
             "name": bridge_name,
             "auto-mac": "yes"
         })
 
         # Add interfaces to bridge
         for interface in lan_interfaces:
-            self.client.network._send_request("interface/bridge/port/add", {
+            self.client._send_request("interface/bridge/port/add", {
                 "bridge": bridge_name,
                 "interface": interface
             })
@@ -135,7 +135,8 @@ class SiteSetup:
         """
         results = {}
 
-        # Use the bulk context to batch all operations
+        # Use the bulk context to batch all operations; they are sent as one
+        # bulk request when the context exits
         with self.client.context("bulk") as bulk:
             # 1. Setup bridge for LAN interfaces
             bridge_name = self.setup_bridge(site_id, lan_interfaces)
@@ -147,7 +148,6 @@ class SiteSetup:
                 name=pool_name,
                 ranges=["192.168.70.2-192.168.73.254"]
             )
-            results["pool"] = pool_result.success
 
             # 3. Create internet packages
             # Uncomment when needed
@@ -166,23 +166,20 @@ class SiteSetup:
             # results["premium_package"] = premium.success
 
             # 4. Setup PPPoE server
-            pppoe_result = self.setup_pppoe_server(
+            pppoe_result = self._add_pppoe_server(
                 interface=bridge_name,
                 service_name=f"ISP-{site_id}",
                 local_address="192.168.70.1",
                 address_pool=pool_name
             )
-            results["pppoe_server"] = pppoe_result
 
-            # 5. Execute all operations in bulk
-            bulk_results = bulk.run_process()
-
-            # After bulk execution, send the actual bulk request
-            if bulk_results["status"] == "success":
-                bulk_request_result = self.client.send_bulk_request(bulk.operations)
-                results["bulk_execution"] = bulk_request_result.data
+        # 5. Pending responses are resolved once the bulk request has run
+        results["pool"] = pool_result.success
+        results["pppoe_server"] = pppoe_result.data if pppoe_result.success else {
+            "error": pppoe_result.error_message}
+        results["bulk_execution"] = bulk.result.data if bulk.result else None
 
-            return results
+        return results
 
     def setup_pppoe_server(self, interface: str, service_name: str,
                            local_address: str, address_pool: str) -> dict:
@@ -198,6 +195,11 @@ class SiteSetup:
         Returns:
             Result of the operation
         """
+        result = self._add_pppoe_server(interface, service_name, local_address, address_pool)
+        return result.data if result.success else {"error": result.error_message}
+
+    def _add_pppoe_server(self, interface: str, service_name: str,
+                          local_address: str, address_pool: str) -> Response:
         # First, ensure PPPoE service is enabled
         self.client._send_request("ppp/service-enable", {
             "service": "pppoe"
@@ -218,7 +220,7 @@ class SiteSetup:
             "dns-server": "8.8.8.8,8.8.4.4"
         })
 
-        return result.data if result.success else {"error": result.error_message}
+        return result
 
     def clear_existing_configuration(self) -> dict:
         """
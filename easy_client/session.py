@@ -0,0 +1,140 @@
+"""
+HTTP session pool for the MikroTik Easy Client
+
+Every client talking to the same API server shares one keep-alive
+``requests.Session`` so RouterOS commands reuse pooled TCP/TLS connections
+instead of opening a new one per call.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import Dict
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+RETRY_STATUSES = (502, 503, 504)
+
+_sessions: Dict[str, requests.Session] = {}
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = \
+    weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def get_session(api_url: str, pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Get the shared session for an API server, creating it on first use
+
+    Args:
+        api_url: Base URL of the API server
+        pool_size: Maximum number of keep-alive connections kept to the server
+
+    Returns:
+        Session reused by every client of this API server
+    """
+    session = _sessions.get(api_url)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(api_url)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Connection": "keep-alive"})
+            _sessions[api_url] = session
+        return session
+
+
+def get_async_session(api_url: str, pool_size: int = DEFAULT_POOL_SIZE) -> httpx.AsyncClient:
+    """
+    Get the shared async session for an API server on the running event loop
+
+    Args:
+        api_url: Base URL of the API server
+        pool_size: Maximum number of concurrent connections kept to the server
+
+    Returns:
+        AsyncClient reused by every async client of this API server on this loop
+    """
+    sessions = _async_sessions.setdefault(asyncio.get_running_loop(), {})
+    client = sessions.get(api_url)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=httpx.Limits(max_connections=pool_size,
+                                                       max_keepalive_connections=pool_size))
+        sessions[api_url] = client
+    return client
+
+
+async def close_async_sessions() -> None:
+    """Close every pooled async session on the running event loop"""
+    sessions = _async_sessions.pop(asyncio.get_running_loop(), {})
+    for client in sessions.values():
+        await client.aclose()
+
+
+def close_sessions() -> None:
+    """Close every pooled session (e.g. before forking worker processes)"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def is_idempotent(command: str) -> bool:
+    """Check whether a RouterOS command is safe to retry"""
+    return command.rstrip("/").endswith("/print")
+
+
+def post(session: requests.Session, url: str, payload: Dict, timeout: float = DEFAULT_TIMEOUT,
+         retries: int = 0, backoff: float = DEFAULT_BACKOFF) -> requests.Response:
+    """
+    POST a JSON payload, retrying connection errors, timeouts and gateway errors with exponential backoff
+
+    Args:
+        session: Pooled session to send the request on
+        url: Target URL
+        payload: JSON body
+        timeout: Per-request timeout in seconds
+        retries: Number of retries after the first attempt
+        backoff: Base delay in seconds, doubled after each failed attempt
+
+    Returns:
+        The HTTP response
+    """
+    attempt = 0
+    while True:
+        try:
+            response = session.post(url, json=payload, timeout=timeout)
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= retries:
+                raise
+        time.sleep(backoff * (2 ** attempt))
+        attempt += 1
+
+
+async def async_post(client: httpx.AsyncClient, url: str, payload: Dict, timeout: float = DEFAULT_TIMEOUT,
+                     retries: int = 0, backoff: float = DEFAULT_BACKOFF) -> httpx.Response:
+    """Async counterpart of :func:`post`"""
+    attempt = 0
+    while True:
+        try:
+            response = await client.post(url, json=payload, timeout=timeout)
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+        except (httpx.TransportError, httpx.TimeoutException):
+            if attempt >= retries:
+                raise
+        await asyncio.sleep(backoff * (2 ** attempt))
+        attempt += 1
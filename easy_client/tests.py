@@ -0,0 +1,97 @@
+import unittest
+
+from easy_client import MikrotikClient, PendingResponse, cache
+
+
+class FakeBulkClient(MikrotikClient):
+    """Client answering bulk requests from an in-memory menu instead of the API server"""
+
+    def __init__(self, secrets=None):
+        super().__init__("http://routeros.test", "admin", "secret", host="10.8.0.2")
+        self.secrets = dict(secrets or {})
+        self.batches = []
+
+    def send_bulk_request(self, operations):
+        self.batches.append(operations)
+        return self._answer(operations)
+
+    def _answer(self, operations):
+        from easy_client import Response
+        results = []
+        for op in operations:
+            command, parameters = op["command"], op["parameters"]
+            if command == "/ppp/secret/print":
+                rows = [{".id": item_id, "name": name} for name, item_id in self.secrets.items()
+                        if parameters.get("name") in (None, name)]
+                results.append({"status": "success", "data": rows})
+            elif command == "/ppp/secret/remove":
+                found = [name for name, item_id in self.secrets.items() if item_id == parameters[".id"]]
+                for name in found:
+                    del self.secrets[name]
+                results.append({"status": "success", "data": []} if found else
+                               {"status": "error", "error": "not_found", "message": "no such item"})
+            else:
+                results.append({"status": "error", "error": "unknown", "message": command})
+        return Response(success=True, data=results)
+
+
+class BulkContextTest(unittest.TestCase):
+    def setUp(self):
+        cache.id_cache.clear()
+
+    def test_references_are_resolved_on_the_client(self):
+        client = FakeBulkClient({"alice": "*1", "bob": "*2"})
+        with client.context("bulk"):
+            removed = client.customers.delete("alice")
+            self.assertIsInstance(removed, PendingResponse)
+
+        # The lookup and the remove go out in two waves, with the real .id substituted
+        self.assertEqual([[op["command"] for op in batch] for batch in client.batches],
+                         [["/ppp/secret/print"], ["/ppp/secret/remove"]])
+        self.assertEqual(client.batches[1][0]["parameters"], {".id": "*1"})
+        self.assertTrue(removed.success)
+        self.assertEqual(client.secrets, {"bob": "*2"})
+
+    def test_missing_reference_fails_only_its_operation(self):
+        client = FakeBulkClient({"bob": "*2"})
+        with client.context("bulk"):
+            missing = client.customers.delete("alice")
+            listed = client.customers.list_all()
+
+        self.assertEqual(len(client.batches), 1)
+        self.assertFalse(missing.success)
+        self.assertEqual(missing.error_code, "unresolved_reference")
+        self.assertTrue(listed.success)
+        self.assertEqual(listed.data, [{".id": "*2", "name": "bob"}])
+
+    def test_batched_lookups_fill_the_id_cache(self):
+        client = FakeBulkClient({"carol": "*3", "dave": "*4"})
+        with client.context("bulk"):
+            client.customers.list_all()
+        client.batches.clear()
+        with client.context("bulk"):
+            removed = client.customers.delete("dave")
+
+        # The .id came from the batched print, so the second batch skips the lookup
+        self.assertEqual(client.batches, [[{"id": 0, "command": "/ppp/secret/remove",
+                                            "parameters": {".id": "*4"}}]])
+        self.assertTrue(removed.success)
+        self.assertIsNone(cache.id_cache.get(client.router_key, "/ppp/secret", "dave"))
+
+    def test_failed_bulk_request_fails_each_operation(self):
+        from easy_client import Response
+        client = FakeBulkClient()
+        client._answer = lambda operations: Response(success=False, error_code="request_failed",
+                                                     error_message="down")
+        with client.context("bulk"):
+            first = client.customers.list_all()
+            second = client.internet_packages.list_all()
+
+        for response in (first, second):
+            self.assertFalse(response.success)
+            self.assertEqual(response.error_code, "request_failed")
+            self.assertIsNone(response.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,16 +4,19 @@ MikroTik Client Utilities
 Helper classes and functions for the MikroTik Easy Client package.
 """
 
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, Iterable, List, Any, Optional, Union
+from array import array
 from dataclasses import dataclass
 from enum import Enum
+from operator import itemgetter
 import datetime
+import heapq
 import ipaddress
 
 
 # Data classes for common MikroTik objects
 
-@dataclass
+@dataclass(slots=True)
 class CustomerUsage:
     """Represents bandwidth usage stats for a customer"""
     username: str
@@ -161,52 +164,174 @@ class BandwidthCalculator:
             return (0, 0)  # Return unlimited on parse error
 
 
+class UsageTable:
+    """
+    Column-wise view of active sessions (/ppp/active/print rows)
+
+    Rows are parsed once into parallel columns, with byte counters in
+    array('q'), so totals, breakdowns, top-N and snapshot deltas run over
+    the columns instead of re-reading dicts and building one object per
+    session. Use row() for a CustomerUsage object when one is needed.
+    """
+    __slots__ = ("usernames", "services", "uptimes", "download", "upload", "_positions")
+
+    def __init__(self, usernames: List[str], services: List[str], uptimes: List[str],
+                 download: array, upload: array):
+        self.usernames = usernames
+        self.services = services
+        self.uptimes = uptimes
+        self.download = download
+        self.upload = upload
+        self._positions = None
+
+    @classmethod
+    def from_active(cls, active_data: Iterable[Dict]) -> 'UsageTable':
+        """Parse RouterOS active session rows"""
+        rows = active_data if isinstance(active_data, list) else list(active_data)
+        return cls(
+            usernames=[row.get("name") for row in rows],
+            services=[row.get("service", "unknown") for row in rows],
+            uptimes=[row.get("uptime", "00:00:00") for row in rows],
+            download=array("q", [int(row.get("bytes-out", 0)) for row in rows]),
+            upload=array("q", [int(row.get("bytes-in", 0)) for row in rows]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    def positions(self) -> Dict[str, int]:
+        """Username -> row"""
+        if self._positions is None:
+            self._positions = {name: i for i, name in enumerate(self.usernames)}
+        return self._positions
+
+    def position(self, username: str) -> Optional[int]:
+        """Row of a username, or None when the customer is not active"""
+        return self.positions().get(username)
+
+    def row(self, i: int) -> CustomerUsage:
+        return CustomerUsage(
+            username=self.usernames[i],
+            download_bytes=self.download[i],
+            upload_bytes=self.upload[i],
+            session_time=self.uptimes[i]
+        )
+
+    def totals(self) -> tuple:
+        """(download bytes, upload bytes) over all sessions"""
+        return sum(self.download), sum(self.upload)
+
+    def by_service(self) -> Dict[str, Dict[str, int]]:
+        """Session count and byte totals per service (pppoe, hotspot, ...)"""
+        groups = {}
+        for service, down, up in zip(self.services, self.download, self.upload):
+            group = groups.get(service)
+            if group is None:
+                group = groups[service] = [0, 0, 0]
+            group[0] += 1
+            group[1] += down
+            group[2] += up
+        return {
+            service: {"customers": count, "download_bytes": down, "upload_bytes": up}
+            for service, (count, down, up) in groups.items()
+        }
+
+    def top(self, n: int = 10, by: str = "total") -> List[CustomerUsage]:
+        """
+        Heaviest consumers, largest first
+
+        Args:
+            n: Number of customers
+            by: "download", "upload" or "total"
+        """
+        if by == "download":
+            values = self.download
+        elif by == "upload":
+            values = self.upload
+        else:
+            values = map(int.__add__, self.download, self.upload)
+        return [self.row(i) for i, _ in heapq.nlargest(n, enumerate(values), key=itemgetter(1))]
+
+    def delta(self, previous: 'UsageTable') -> 'UsageTable':
+        """
+        Bytes used since an earlier snapshot, per session in this one
+
+        A customer missing from the earlier snapshot, or whose counter went
+        down (the session reconnected), is counted from zero.
+        """
+        if previous.usernames == self.usernames:
+            rows = range(len(self))
+        else:
+            rows = list(map(previous.positions().get, self.usernames))
+        return UsageTable(self.usernames, self.services, self.uptimes,
+                          self._since(self.download, previous.download, rows),
+                          self._since(self.upload, previous.upload, rows))
+
+    @staticmethod
+    def _since(current: array, previous: array, rows) -> array:
+        before = [previous[j] if j is not None else 0 for j in rows]
+        return array("q", [now - then if now >= then else now for now, then in zip(current, before)])
+
+
 class ReportGenerator:
     """Generate reports from RouterOS data"""
 
     @staticmethod
-    def active_customers_report(active_data: List[Dict]) -> Dict:
+    def active_customers_report(active_data: Union[List[Dict], UsageTable]) -> Dict:
         """Generate a report of active customer connections"""
-        total_customers = len(active_data)
-        total_download = sum(int(client.get("bytes-out", 0)) for client in active_data)
-        total_upload = sum(int(client.get("bytes-in", 0)) for client in active_data)
-
-        services = {}
-        for client in active_data:
-            service = client.get("service", "unknown")
-            if service not in services:
-                services[service] = 0
-            services[service] += 1
+        table = active_data if isinstance(active_data, UsageTable) else UsageTable.from_active(active_data)
+        total_download, total_upload = table.totals()
+        services = table.by_service()
 
         return {
             "timestamp": datetime.datetime.now().isoformat(),
-            "total_active_customers": total_customers,
+            "total_active_customers": len(table),
             "total_download_bytes": total_download,
             "total_upload_bytes": total_upload,
             "total_download_formatted": BandwidthCalculator.format_data_usage(total_download),
             "total_upload_formatted": BandwidthCalculator.format_data_usage(total_upload),
-            "services_breakdown": services
+            "services_breakdown": {service: group["customers"] for service, group in services.items()},
+            "services_usage": services
         }
 
     @staticmethod
-    def customer_usage_report(customer_data: List[Dict], active_data: List[Dict]) -> List[CustomerUsage]:
+    def customer_usage_report(customer_data: List[Dict],
+                              active_data: Union[List[Dict], UsageTable]) -> List[CustomerUsage]:
         """Generate a usage report for all customers"""
-        # Create a mapping of usernames to active connections
-        active_map = {client.get("name"): client for client in active_data}
+        table = active_data if isinstance(active_data, UsageTable) else UsageTable.from_active(active_data)
 
         usages = []
         for customer in customer_data:
             username = customer.get("name")
+            i = table.position(username)
+            if i is None:
+                usages.append(CustomerUsage(username=username, download_bytes=0, upload_bytes=0,
+                                            session_time="00:00:00"))
+            else:
+                usages.append(table.row(i))
+        return usages
 
-            # Get active connection data if available
-            active_info = active_map.get(username, {})
-
-            usage = CustomerUsage(
-                username=username,
-                download_bytes=int(active_info.get("bytes-out", 0)),
-                upload_bytes=int(active_info.get("bytes-in", 0)),
-                session_time=active_info.get("uptime", "00:00:00")
-            )
-            usages.append(usage)
+    @staticmethod
+    def top_consumers(active_data: Union[List[Dict], UsageTable], n: int = 10,
+                      by: str = "total") -> List[CustomerUsage]:
+        """The ``n`` active customers that used the most data"""
+        table = active_data if isinstance(active_data, UsageTable) else UsageTable.from_active(active_data)
+        return table.top(n, by)
 
-        return usages
+    @staticmethod
+    def usage_delta_report(previous: Union[List[Dict], UsageTable],
+                           current: Union[List[Dict], UsageTable], top: int = 10) -> Dict:
+        """Traffic between two snapshots of the active sessions"""
+        if not isinstance(previous, UsageTable):
+            previous = UsageTable.from_active(previous)
+        if not isinstance(current, UsageTable):
+            current = UsageTable.from_active(current)
+        delta = current.delta(previous)
+        download, upload = delta.totals()
+        return {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "download_bytes": download,
+            "upload_bytes": upload,
+            "services_usage": delta.by_service(),
+            "top_consumers": delta.top(top),
+        }
@@ -11,6 +11,7 @@ import {Package, Router} from "./packages_components/types.pkg.ts";
 export default function PackagesPage() {
     const [page, setPage] = useState(1);
     const [hasMore, setHasMore] = useState(true);
+    const cursorRef = useRef<string | null>(null);
     const [isLoadingMore, setIsLoadingMore] = useState(false);
     const searchTimeoutRef = useRef<NodeJS.Timeout | null>(null);
     const [_totalCount, setTotalCount] = useState({
@@ -134,9 +135,11 @@ export default function PackagesPage() {
                 pkgs: Package[];
                 all_count: number;
                 pppoe_count: number;
-                hotspot_count: number
+                hotspot_count: number;
+                next_cursor: string | null;
+                has_more: boolean
             }>('/api/pkgs/', {
-                page: pageNum,
+                cursor: pageNum > 1 ? cursorRef.current : null,
                 search: search,
                 load_type: filter,
             });
@@ -155,7 +158,8 @@ export default function PackagesPage() {
                     hotspot: res.data.hotspot_count,
                 });
 
-                setHasMore(res.data.pkgs.length > 0);
+                cursorRef.current = res.data.next_cursor;
+                setHasMore(res.data.has_more);
             }
         } catch (error) {
             console.error("Failed to fetch packages:", error);
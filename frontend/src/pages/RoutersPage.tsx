@@ -23,7 +23,7 @@ export default function RoutersPage() {
 
     // Enhanced pagination states
     const [page, setPage] = useState(1);
-    const [, setTotalPages] = useState(1);
+    const [cursor, setCursor] = useState<string | null>(null);
     const [hasMore, setHasMore] = useState(true);
     const [loadingMore, setLoadingMore] = useState(false);
     const [itemsPerPage,] = useState(9); // Default per page count matching backend
@@ -110,7 +110,9 @@ export default function RoutersPage() {
 
         const fd = new FormData();
         fd.append("load_type", tab);
-        fd.append("page", currentPage.toString());
+        if (currentPage > 1 && cursor) {
+            fd.append("cursor", cursor);
+        }
         fd.append("search", searchQuery);
         fd.append("per_page", itemsPerPage.toString());
 
@@ -129,10 +131,10 @@ export default function RoutersPage() {
                 setAllCount(data.all_count);
                 setActiveCount(data.active_count);
                 setInactiveCount(data.inactive_count);
-                setTotalPages(data.total_pages);
+                setCursor(data.next_cursor);
 
                 // Check if we've loaded all items
-                setHasMore(data.has_next);
+                setHasMore(data.has_more);
 
                 setLoading(false);
                 setLoadingMore(false);
@@ -150,7 +152,7 @@ export default function RoutersPage() {
             setPage(nextPage);
             fetchItems(activeTab, nextPage, debouncedSearchText);
         }
-    }, [loadingMore, hasMore, page, activeTab, debouncedSearchText]);
+    }, [loadingMore, hasMore, page, cursor, activeTab, debouncedSearchText]);
 
     const handleTabChange = (tab: string) => {
         setActiveTab(tab);
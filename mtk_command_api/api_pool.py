@@ -0,0 +1,177 @@
+"""
+Process-wide registry of authenticated RouterOS API connections
+
+Logging in to a router over the VPN is slow, so connections are kept open per
+router and reused across requests. Entries are health-checked before reuse
+when they have been quiet for a while, reconnected on failure, closed after
+sitting idle and evicted least-recently-used first once the registry is full.
+
+RouterOS API sockets are not thread-safe, so a connection is only ever used
+inside ``lease()``, which holds it exclusively. An entry evicted while leased
+is closed by its last user.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Hashable, Iterator
+
+from routeros_api import RouterOsApiPool
+from routeros_api.api import RouterOsApi
+
+DEFAULT_MAX_SIZE = 64
+DEFAULT_IDLE_TIMEOUT = 300
+DEFAULT_HEALTH_INTERVAL = 60
+DEFAULT_SOCKET_TIMEOUT = 15
+
+
+def connect(host: str, username: str, password: str, socket_timeout: float = DEFAULT_SOCKET_TIMEOUT) -> RouterOsApiPool:
+    """
+    Open and authenticate a RouterOS API connection
+
+    Raises:
+        RouterOsApiError subclasses when the router is unreachable or rejects the login
+    """
+    pool = RouterOsApiPool(host=host, username=username, password=password, plaintext_login=True)
+    pool.set_timeout(socket_timeout)
+    pool.get_api()
+    return pool
+
+
+class _Entry:
+    def __init__(self, credentials: tuple):
+        self.credentials = credentials
+        self.pool: RouterOsApiPool | None = None
+        self.last_used = time.monotonic()
+        self.last_checked = 0.0
+        # Held while the connection is being opened, checked or leased
+        self.lock = threading.RLock()
+        # Guarded by the registry lock: threads holding or waiting for the entry, and
+        # whether it left the registry (the last of those threads then closes it)
+        self.users = 0
+        self.evicted = False
+
+    def close(self):
+        if self.pool is not None:
+            try:
+                self.pool.disconnect()
+            except Exception:
+                pass
+            self.pool = None
+
+
+class ApiConnectionRegistry:
+    """Thread-safe LRU registry of RouterOS API connections keyed by router id"""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 health_interval: float = DEFAULT_HEALTH_INTERVAL):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self, key: Hashable, host: str, username: str, password: str) -> Iterator[RouterOsApi]:
+        """Use a router's API connection exclusively for the duration of the block"""
+        entry = self._reserve(key, (host, username, password))
+        try:
+            with entry.lock:
+                try:
+                    yield self._ensure_connected(entry)
+                except Exception:
+                    # The socket may be mid-reply; make the next user reconnect
+                    entry.close()
+                    raise
+                finally:
+                    entry.last_used = time.monotonic()
+        finally:
+            self._release(entry)
+
+    def adopt(self, key: Hashable, pool: RouterOsApiPool, host: str, username: str, password: str) -> None:
+        """Register an already authenticated connection (e.g. one opened to validate a new router)"""
+        entry = self._reserve(key, (host, username, password))
+        try:
+            with entry.lock:
+                entry.close()
+                entry.pool = pool
+                entry.last_checked = entry.last_used = time.monotonic()
+        finally:
+            self._release(entry)
+
+    def evict(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            idle = [entry] if entry is not None and self._retire(entry) else []
+        self._close(idle)
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle = [entry for entry in self._entries.values() if self._retire(entry)]
+            self._entries.clear()
+        self._close(idle)
+
+    def _reserve(self, key: Hashable, credentials: tuple) -> _Entry:
+        """Registry entry of a router, counted as in use until _release()"""
+        idle = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.credentials != credentials:
+                if entry is not None and self._retire(entry):
+                    idle.append(entry)
+                entry = self._entries[key] = _Entry(credentials)
+            self._entries.move_to_end(key)
+            entry.users += 1
+
+            now = time.monotonic()
+            for other_key, other in list(self._entries.items()):
+                if other.users == 0 and now - other.last_used > self.idle_timeout:
+                    self._entries.pop(other_key)
+                    if self._retire(other):
+                        idle.append(other)
+            while len(self._entries) > self.max_size:
+                oldest = self._entries.popitem(last=False)[1]
+                if self._retire(oldest):
+                    idle.append(oldest)
+        self._close(idle)
+        return entry
+
+    def _release(self, entry: _Entry) -> None:
+        with self._lock:
+            entry.users -= 1
+            idle = entry.evicted and entry.users == 0
+        if idle:
+            self._close([entry])
+
+    @staticmethod
+    def _retire(entry: _Entry) -> bool:
+        """Mark an entry removed from the registry (registry lock held); True when nobody uses it"""
+        entry.evicted = True
+        return entry.users == 0
+
+    @staticmethod
+    def _close(entries) -> None:
+        # Out of the registry and unused, so nobody else can take these locks any more
+        for entry in entries:
+            with entry.lock:
+                entry.close()
+
+    def _ensure_connected(self, entry: _Entry) -> RouterOsApi:
+        now = time.monotonic()
+        if entry.pool is not None and now - entry.last_checked > self.health_interval:
+            try:
+                entry.pool.get_api().get_resource('/system/identity').get()
+                entry.last_checked = now
+            except Exception:
+                entry.close()
+
+        if entry.pool is None:
+            entry.pool = connect(*entry.credentials)
+            entry.last_checked = now
+
+        entry.last_used = now
+        return entry.pool.get_api()
+
+
+connections = ApiConnectionRegistry()
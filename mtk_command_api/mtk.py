@@ -1,21 +1,59 @@
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Union
 
-from easy_client import Network, MikrotikClient
+from easy_client import Network, MikrotikClient, Customers, Hotspot, session
+
+# Concurrency slots per API server, shared by every manager in the process
+_server_slots: Dict[str, threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+
+
+def _server_slot(server_url: str, limit: int) -> threading.BoundedSemaphore:
+    with _slots_lock:
+        if server_url not in _server_slots:
+            _server_slots[server_url] = threading.BoundedSemaphore(limit)
+        return _server_slots[server_url]
+
+
+@dataclass
+class FanOutResult:
+    """Outcome of one router's share of a fan-out operation"""
+    router: Any
+    ok: bool
+    data: Any = None
+    error: str = None
+    elapsed: float = 0.0
 
 
 class MTKClient:
     def __init__(self, server_url, host, username, password):
         client = MikrotikClient(server_url, username, password, host=host)
+        self.client = client
         self.network = Network(client)
+        self.customers = Customers(client)
+        self.hotspot = Hotspot(client)
 
 
 class MikroManager:
     mikrotik: "MikroManager" = None
 
-    def __init__(self, api_key, server_id, server_url):
+    def __init__(self, api_key, server_id, server_url, max_workers=32, max_per_server=16):
         self.api_key = api_key
         self.server_url = server_url
         self.server_id = server_id
+        self.max_workers = max_workers
+        self.max_per_server = max_per_server
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        # Size the console session's keep-alive pool for a full fan-out
+        session.get_session(self.console_url, max(max_per_server, session.DEFAULT_POOL_SIZE))
+
+    @property
+    def console_url(self) -> str:
+        return self.server_url + "/mtk/console"
 
     @classmethod
     def initialise(cls, api_key, server_id, server_url) -> None:
@@ -23,18 +61,74 @@ class MikroManager:
 
     def connect_router(self, host, username, password) -> 'RouterConnection':
         """Create a router connection instance"""
-        return RouterConnection(self.api_key, self.server_url + "/mtk/console", host, username, password,
+        return RouterConnection(self.api_key, self.console_url, host, username, password,
                                 self.server_id)
 
     def client(self, *, host, username, password) -> 'MTKClient':
         return MTKClient(self.server_url, host, username, password)
 
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mtk-fan-out")
+            return self._executor
+
+    def fan_out(self, routers: Iterable[Any], action: Union[str, Callable[['RouterConnection'], Any]],
+                params: Dict = None, timeout: float = session.DEFAULT_TIMEOUT) -> Iterator[FanOutResult]:
+        """
+        Run the same action on many routers concurrently
+
+        Work runs on a bounded thread pool, with at most ``max_per_server``
+        requests in flight to the API server at once.
+
+        Args:
+            routers: Router models (identity/username/password) or dicts with host/username/password
+            action: RouterConnection method or console action name, or a callable taking the connection
+            params: Keyword parameters for the action
+            timeout: Per-router request timeout in seconds
+
+        Returns:
+            Iterator yielding a FanOutResult for each router as soon as it finishes
+        """
+        slot = _server_slot(self.console_url, self.max_per_server)
+        futures = [
+            self.executor.submit(self._run_on_router, router, action, params or {}, timeout, slot)
+            for router in routers
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+    def _run_on_router(self, router, action, params, timeout, slot) -> FanOutResult:
+        if isinstance(router, dict):
+            host, username, password = router["host"], router["username"], router["password"]
+        else:
+            host, username, password = router.identity, router.username, router.password
+
+        start = time.monotonic()
+        try:
+            with slot:
+                conn = self.connect_router(host, username, password)
+                conn.timeout = timeout
+                if callable(action):
+                    data = action(conn)
+                elif not action.startswith("_") and callable(getattr(conn, action, None)):
+                    data = getattr(conn, action)(**params)
+                else:
+                    data = conn._send_request(action, params)
+            ok = not (isinstance(data, dict) and data.get("error"))
+            error = data.get("error") if not ok else None
+            return FanOutResult(router, ok, data=data, error=error, elapsed=time.monotonic() - start)
+        except Exception as e:
+            return FanOutResult(router, False, error=str(e), elapsed=time.monotonic() - start)
+
 
 class RouterConnection:
     def __init__(self, api_key, server_url, router_ip, username, password, server_id):
         self.sever_id = server_id
         self.api_key = api_key
         self.server_url = server_url
+        self.timeout = session.DEFAULT_TIMEOUT
         self.router_credentials = {
             "host": router_ip,
             "username": username,
@@ -50,9 +144,7 @@ class RouterConnection:
             "action": action,
             "params": params or {}
         }
-        print(self.server_url,data)
-
-        response = requests.post(self.server_url, json=data)
+        response = session.post(session.get_session(self.server_url), self.server_url, data, timeout=self.timeout)
         return response.json()
 
     # PPPoE Server Management
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UserDashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_dashboard'
+
+    def ready(self):
+        # Register the ISPCounters, DailyRevenue, response cache and provisioning script signal handlers
+        from user_dashboard import counters, revenue, response_cache, provisioning  # noqa: F401
@@ -0,0 +1,256 @@
+"""
+Bulk client import
+
+Rows are stored in a ClientImport job first, so a crashed import can be resumed
+where it stopped. Pending rows are processed in chunks: every router receives
+its chunk's secrets in a single bulk request, then the Client and Billing rows
+of the accepted entries are written with bulk_create in one transaction.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from ISP.settings import mikrotik_manager
+from user_dashboard import revenue, response_cache
+from user_dashboard.counters import bump, COUNTED_TYPES
+from user_dashboard.helpers import generate_password, generate_invoice_numbers
+from user_dashboard.models import Client, Billing, Package, User, ClientImport, ClientImportRow
+
+DEFAULT_CHUNK_SIZE = 200
+
+# Column aliases accepted in import files, mapped to the canonical row keys
+FIELD_ALIASES = {
+    'fullName': 'full_name',
+    'full_name': 'full_name',
+    'name': 'full_name',
+    'phone': 'phone',
+    'packageId': 'package_id',
+    'package_id': 'package_id',
+    'package': 'package_id',
+    'address': 'address',
+    'expiry_date': 'expiry_date',
+    'due': 'expiry_date',
+}
+
+
+def parse_rows(content: str, fmt: str) -> List[Dict]:
+    """
+    Parse a CSV or JSON document into row dictionaries with canonical keys
+
+    Args:
+        content: File content
+        fmt: "csv" or "json"
+    """
+    if fmt == 'json':
+        rows = json.loads(content)
+        if isinstance(rows, dict):
+            rows = rows.get('rows', [])
+    elif fmt == 'csv':
+        rows = list(csv.DictReader(io.StringIO(content)))
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+    return [
+        {FIELD_ALIASES[k]: (v.strip() if isinstance(v, str) else v)
+         for k, v in row.items() if k in FIELD_ALIASES}
+        for row in rows
+    ]
+
+
+def create_import(isp: User, rows: Iterable[Dict], source: str = '') -> ClientImport:
+    """
+    Validate rows and store them as a new import job
+
+    Invalid rows are recorded as failed straight away; valid rows get their
+    router credentials generated now so that a resumed import reuses them.
+    """
+    rows = list(rows)
+    packages = Package.objects.filter(router__isp__user=isp).in_bulk()
+    package_ids = {str(pk): pk for pk in packages}
+
+    existing = set(Client.objects.filter(
+        package__in=packages.keys(),
+        phone__in=[row.get('phone') for row in rows if row.get('phone')]
+    ).values_list('package_id', 'phone'))
+
+    job = ClientImport.objects.create(isp=isp, source=source, total=len(rows), status='pending')
+    entries, seen = [], set()
+    for line, row in enumerate(rows, start=1):
+        entry = ClientImportRow(job=job, line=line, data=row)
+        missing = [f for f in ('full_name', 'phone', 'package_id') if not row.get(f)]
+        package_id = package_ids.get(str(row.get('package_id')))
+        if missing:
+            entry.status, entry.error = 'failed', f"Missing fields: {', '.join(missing)}"
+        elif package_id is None:
+            entry.status, entry.error = 'failed', 'Package not found'
+        elif (package_id, row['phone']) in existing or (package_id, row['phone']) in seen:
+            entry.status, entry.error = 'failed', f"Client: {row['full_name']} already exists for this package"
+        elif row.get('expiry_date') and _parse_due(row['expiry_date']) is None:
+            entry.status, entry.error = 'failed', 'Invalid expiry_date'
+        else:
+            seen.add((package_id, row['phone']))
+            entry.package_id = package_id
+            entry.router_username = generate_password(row['full_name'])
+            entry.router_password = generate_password(row['full_name'])
+        entries.append(entry)
+
+    ClientImportRow.objects.bulk_create(entries, batch_size=1000)
+    job.failed_count = sum(1 for e in entries if e.status == 'failed')
+    job.save(update_fields=['failed_count'])
+    return job
+
+
+def run_import(job: ClientImport, chunk_size: int = DEFAULT_CHUNK_SIZE) -> ClientImport:
+    """
+    Process every pending row of an import job; safe to call again after a crash
+
+    Returns:
+        The job with updated counters
+    """
+    job.status = 'running'
+    job.save(update_fields=['status', 'updated_at'])
+    try:
+        while True:
+            chunk = list(job.rows.filter(status='pending').select_related('package__router')[:chunk_size])
+            if not chunk:
+                break
+            _process_chunk(job, chunk)
+    except Exception as e:
+        job.status, job.error = 'failed', str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    job.status = 'completed'
+    job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def _parse_due(value):
+    due = parse_datetime(value)
+    if due is None:
+        day = parse_date(value)
+        if day is not None:
+            due = timezone.make_aware(datetime.combine(day, time.min))
+    elif timezone.is_naive(due):
+        due = timezone.make_aware(due)
+    return due
+
+
+def _push_to_routers(rows: List[ClientImportRow]) -> Dict[int, str]:
+    """
+    Add the chunk's clients to their routers, one bulk request per router
+
+    Returns:
+        Error message per row id for rows the router rejected
+    """
+    by_router = defaultdict(list)
+    for row in rows:
+        by_router[row.package.router].append(row)
+
+    errors = {}
+    for router, router_rows in by_router.items():
+        mtk = mikrotik_manager.client(host=router.identity, username=router.username, password=router.password)
+        with mtk.client.context("bulk") as bulk:
+            responses = [
+                mtk.hotspot.create_user(row.router_username, row.router_password, row.package.name)
+                if row.package.type == 'hotspot' else
+                mtk.customers.create(row.router_username, row.router_password, row.package.name,
+                                     service=row.package.type)
+                for row in router_rows
+            ]
+
+        for row, response in zip(router_rows, responses):
+            # A secret left behind by an interrupted run is already on the router
+            already_added = 'already' in (response.error_message or '').lower()
+            if not response.success and not already_added:
+                errors[row.id] = response.error_message or bulk.result.error_message or 'MikroTik connection failed'
+    return errors
+
+
+def _process_chunk(job: ClientImport, rows: List[ClientImportRow]) -> None:
+    errors = _push_to_routers(rows)
+    accepted = [row for row in rows if row.id not in errors]
+    now = timezone.now()
+
+    with transaction.atomic():
+        clients = [
+            Client(
+                phone=row.data['phone'],
+                full_name=row.data['full_name'],
+                address=row.data.get('address') or 'No address',
+                isp=job.isp,
+                package=row.package,
+                router_username=row.router_username,
+                router_password=row.router_password,
+                due=_parse_due(row.data['expiry_date']) if row.data.get('expiry_date') else now + timedelta(days=30),
+                package_start=now
+            )
+            for row in accepted
+        ]
+        # bulk_create skips save(), which fills the search columns
+        for client in clients:
+            client.refresh_search_columns()
+        clients = Client.objects.bulk_create(clients)
+        Billing.objects.bulk_create([
+            Billing(
+                invoice=invoice,
+                package_name=row.package.name,
+                package_price=row.package.price,
+                package_type=row.package.type,
+                package_start=now.date(),
+                user=job.isp
+            )
+            for row, invoice in zip(accepted, generate_invoice_numbers(len(accepted)))
+        ])
+
+        for row, client in zip(accepted, clients):
+            # Backends without RETURNING (MySQL) leave bulk-created pks unset
+            row.status, row.client = 'created', client if client.pk else None
+        for row in rows:
+            if row.id in errors:
+                row.status, row.error = 'failed', errors[row.id][:255]
+        ClientImportRow.objects.bulk_update(rows, ['status', 'error', 'client'])
+
+        # bulk_create bypasses the counter and revenue signals
+        bump(job.isp_id, clients=len(accepted), **{
+            f'clients_{t}': sum(1 for row in accepted if row.package.type == t) for t in COUNTED_TYPES
+        })
+        billed = defaultdict(lambda: [Decimal(0), 0])
+        for row in accepted:
+            billed[row.package.type][0] += Decimal(row.package.price)
+            billed[row.package.type][1] += 1
+        for package_type, (amount, count) in billed.items():
+            revenue.add(job.isp_id, timezone.localdate(now), package_type, billed_amount=amount, billed_count=count)
+        response_cache.bump_on_commit(job.isp_id)
+
+        job.created_count += len(accepted)
+        job.failed_count += len(errors)
+        job.save(update_fields=['created_count', 'failed_count', 'updated_at'])
+
+
+def import_to_dict(job: ClientImport, include_rows: bool = False) -> Dict:
+    data = {
+        "id": job.id,
+        "source": job.source,
+        "status": job.status,
+        "total": job.total,
+        "created": job.created_count,
+        "failed": job.failed_count,
+        "pending": job.total - job.created_count - job.failed_count,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+    }
+    rows = job.rows.all() if include_rows else job.rows.filter(status='failed')
+    data["rows"] = [
+        {"line": row.line, "status": row.status, "error": row.error, "client": row.client_id}
+        for row in rows.only('line', 'status', 'error', 'client_id')
+    ]
+    return data
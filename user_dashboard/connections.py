@@ -0,0 +1,168 @@
+"""
+Router connection detection
+
+A freshly provisioned router is "connected" once the VPN server has handed
+it a 10.8.0.x address. Detection happens outside the request workers, in
+one of two ways:
+
+* push: the VPN side POSTs {"identity": ..., "ip": ...} to the
+  router-connected webhook (VPN_WEBHOOK_SECRET), or
+* watch: manage.py watch_connections looks up the addresses of every router
+  still waiting, in one cycle per CONNECTION_WATCH_INTERVAL seconds, over a
+  shared keep-alive session and a bounded pool.
+
+Both end in mark_connected(), which saves the routers and so bumps their
+ISP's response cache generation. check_connection only reads the router
+row, and with ?wait= (at most MAX_WAIT seconds, since it holds a request
+worker) waits on that generation: each tick is a single cache read, and the
+row is read again only when something of the ISP changed.
+"""
+import hmac
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, Optional
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from user_dashboard import response_cache
+from user_dashboard.models import Router
+
+logger = logging.getLogger(__name__)
+
+VPN_SUBNET = "10.8.0."
+# Routers not connected this long after provisioning are no longer watched
+WATCH_WINDOW = timedelta(days=2)
+HEARTBEAT_KEY = 'conn-watch:heartbeat'
+# ?wait= holds a sync request worker, so it stays short: enough to save a few
+# round trips of the onboarding modal's polling, not a real long-poll
+MAX_WAIT = 3
+POLL_TICK = 0.5
+
+
+def vpn_ip(text: Optional[str]) -> Optional[str]:
+    """The address when it is one the VPN server hands out"""
+    text = (text or '').strip()
+    return text if text.startswith(VPN_SUBNET) else None
+
+
+def mark_connected(addresses: Dict[str, str]) -> int:
+    """
+    Record routers as connected
+
+    Args:
+        addresses: Router identity -> VPN address; other addresses are ignored
+
+    Returns:
+        Number of routers whose state changed
+    """
+    addresses = {identity: vpn_ip(ip) for identity, ip in addresses.items()}
+    addresses = {identity: ip for identity, ip in addresses.items() if ip}
+    changed = 0
+    for router in Router.objects.filter(identity__in=list(addresses)):
+        ip = addresses[router.identity]
+        if router.provision_status == 'connected' and router.ip_address == ip:
+            continue
+        router.ip_address = ip
+        router.provision_status = 'connected'
+        # save() rather than update() so the cache and counter signals run
+        router.save(update_fields=['ip_address', 'provision_status'])
+        changed += 1
+    return changed
+
+
+def watched_routers(now=None):
+    """Routers waiting for their first connection"""
+    now = now or timezone.now()
+    return Router.objects.exclude(provision_status='connected').filter(created_at__gte=now - WATCH_WINDOW)
+
+
+def lookup_ip(identity: str, session=requests) -> Optional[str]:
+    """Ask the VPN backend for a router's address"""
+    res = session.get(settings.API_URL + f"/mikrotik/openvpn/client_ip/{identity}", timeout=10)
+    return vpn_ip(res.text)
+
+
+def webhook_enabled() -> bool:
+    return bool(settings.VPN_WEBHOOK_SECRET)
+
+
+def webhook_authorized(secret: str) -> bool:
+    """Whether a router-connected webhook call carries the shared secret"""
+    return webhook_enabled() and hmac.compare_digest(secret.encode(), settings.VPN_WEBHOOK_SECRET.encode())
+
+
+def watcher_alive() -> bool:
+    """Whether watch_connections completed a cycle recently"""
+    last = cache.get(HEARTBEAT_KEY)
+    return last is not None and time.time() - last < 3 * settings.CONNECTION_WATCH_INTERVAL
+
+
+class ConnectionWatcher:
+    """Looks up the addresses of all waiting routers per cycle"""
+
+    def __init__(self, interval: float = None, concurrency: int = 8):
+        """
+        Args:
+            interval: Seconds between cycles
+            concurrency: Lookups in flight at the same time
+        """
+        self.interval = interval or settings.CONNECTION_WATCH_INTERVAL
+        self.concurrency = concurrency
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    def run_forever(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                self.check_once()
+            except Exception:
+                logger.exception("Connection watch cycle failed")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def check_once(self, identities: Iterable[str] = None) -> int:
+        """Look up every waiting router once; returns how many became connected"""
+        close_old_connections()
+        if identities is None:
+            identities = watched_routers().values_list('identity', flat=True)
+        identities = list(identities)
+        addresses = {}
+        if identities:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='conn-watch') as executor:
+                for identity, ip in zip(identities, executor.map(self._lookup, identities)):
+                    if ip:
+                        addresses[identity] = ip
+        cache.set(HEARTBEAT_KEY, time.time(), None)
+        return mark_connected(addresses) if addresses else 0
+
+    def _lookup(self, identity: str) -> Optional[str]:
+        try:
+            return lookup_ip(identity, self.session)
+        except requests.RequestException as e:
+            logger.warning("Address lookup of router %s failed: %s", identity, e)
+            return None
+
+
+def wait_for_connection(router: Router, isp_id: int, wait: float) -> Router:
+    """
+    Wait up to ``wait`` seconds (at most MAX_WAIT) for a router to connect
+
+    Returns:
+        The router as last read
+    """
+    deadline = time.monotonic() + min(max(wait, 0), MAX_WAIT)
+    seen = response_cache.generation(isp_id)
+    while router.provision_status != 'connected' and time.monotonic() < deadline:
+        time.sleep(POLL_TICK)
+        current = response_cache.generation(isp_id)
+        if current != seen:
+            seen = current
+            router.refresh_from_db(fields=['ip_address', 'provision_status'])
+    return router
@@ -0,0 +1,215 @@
+"""
+Denormalized per-ISP badge counts
+
+List views show router/package/client totals on every tab. Instead of running
+COUNT(*) queries per page load, the numbers live in ISPCounters and are moved
+by F() deltas from model signals, inside the transaction that changed the
+rows. Writes made without signals (bulk_create, queryset.update/delete) must
+call bump() themselves; reconcile() recomputes everything from the tables.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from user_dashboard.models import ISPCounters, Router, Package, Client, SystemUser
+
+FIELDS = ('routers', 'routers_active', 'packages', 'packages_hotspot', 'packages_pppoe',
+          'clients', 'clients_hotspot', 'clients_pppoe')
+
+# Package types with their own tab count
+COUNTED_TYPES = ('hotspot', 'pppoe')
+
+
+def compute(isp_id: int) -> Dict[str, int]:
+    """Count everything from the source tables (one aggregate query per table)"""
+    values = {}
+    values.update(Router.objects.filter(isp__user=isp_id).aggregate(
+        routers=Count('id'),
+        routers_active=Count('id', filter=Q(active=True)),
+    ))
+    values.update(Package.objects.filter(router__isp__user=isp_id).aggregate(
+        packages=Count('id'),
+        **{f'packages_{t}': Count('id', filter=Q(type=t)) for t in COUNTED_TYPES}
+    ))
+    values.update(Client.objects.filter(isp=isp_id).aggregate(
+        clients=Count('id'),
+        **{f'clients_{t}': Count('id', filter=Q(package__type=t)) for t in COUNTED_TYPES}
+    ))
+    return values
+
+
+def get_counters(isp_id: int) -> ISPCounters:
+    """
+    Counters of an ISP account, computed from the tables on first use
+
+    Args:
+        isp_id: id of the ISP owner User
+    """
+    counters = ISPCounters.objects.filter(isp_id=isp_id).first()
+    if counters is None:
+        try:
+            with transaction.atomic():
+                counters = ISPCounters.objects.create(isp_id=isp_id, **compute(isp_id))
+        except IntegrityError:
+            # Created concurrently by another request
+            counters = ISPCounters.objects.get(isp_id=isp_id)
+    return counters
+
+
+def bump(isp_id: Optional[int], **deltas: int) -> None:
+    """
+    Apply count deltas to an ISP's counters
+
+    Nothing is written while the row does not exist yet: get_counters() will
+    compute it, change included, on first read.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if isp_id is None or not deltas:
+        return
+    ISPCounters.objects.filter(isp_id=isp_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def reconcile(isp_ids: Iterable[int] = None) -> List[tuple]:
+    """
+    Recompute counters from the tables and repair any drift
+
+    Args:
+        isp_ids: Owner accounts to check; every account with counters when omitted
+
+    Returns:
+        (isp_id, {field: (stored, actual)}) for each account that had drifted
+    """
+    rows = ISPCounters.objects.all()
+    if isp_ids is not None:
+        rows = rows.filter(isp_id__in=list(isp_ids))
+
+    repaired = []
+    for counters in rows.iterator():
+        with transaction.atomic():
+            counters = ISPCounters.objects.select_for_update().get(pk=counters.pk)
+            actual = compute(counters.isp_id)
+            drift = {f: (getattr(counters, f), v) for f, v in actual.items() if getattr(counters, f) != v}
+            if drift:
+                ISPCounters.objects.filter(pk=counters.pk).update(**actual)
+                repaired.append((counters.isp_id, drift))
+    return repaired
+
+
+def _type_field(prefix: str, package_type: Optional[str]) -> Optional[str]:
+    return f'{prefix}_{package_type}' if package_type in COUNTED_TYPES else None
+
+
+def _deltas(sign: int, *fields: Optional[str]) -> Dict[str, int]:
+    deltas = {}
+    for field in fields:
+        if field:
+            deltas[field] = deltas.get(field, 0) + sign
+    return deltas
+
+
+def _router_owner(isp_id: Optional[int]) -> Optional[int]:
+    """SystemUser id -> owner User id"""
+    if isp_id is None:
+        return None
+    return SystemUser.objects.filter(pk=isp_id).values_list('user_id', flat=True).first()
+
+
+def _package_owner(router_id: Optional[int]) -> Optional[int]:
+    if router_id is None:
+        return None
+    return Router.objects.filter(pk=router_id).values_list('isp__user', flat=True).first()
+
+
+def _package_type(instance: Client, package_id: Optional[int]) -> Optional[str]:
+    package = instance._state.fields_cache.get('package')
+    if package is not None and package.pk == package_id:
+        return package.type
+    return Package.objects.filter(pk=package_id).values_list('type', flat=True).first()
+
+
+@receiver(post_init, sender=Router)
+@receiver(post_init, sender=Package)
+@receiver(post_init, sender=Client)
+def _snapshot(sender, instance, **kwargs):
+    # Read __dict__ so deferred fields (.only()) are not fetched one by one
+    if sender is Router:
+        keys = ('isp_id', 'active')
+    elif sender is Package:
+        keys = ('router_id', 'type')
+    else:
+        keys = ('isp_id', 'package_id')
+    instance._counted = tuple(instance.__dict__.get(k) for k in keys)
+
+
+@receiver(post_save, sender=Router)
+def _router_saved(sender, instance, created, **kwargs):
+    old_isp, old_active = (None, False) if created else instance._counted
+    if created or old_isp != instance.isp_id:
+        owner = _router_owner(instance.isp_id)
+        if not created:
+            old_owner = _router_owner(old_isp)
+            bump(old_owner, routers=-1, routers_active=-int(bool(old_active)))
+            # Its packages move to the new owner
+            by_type = dict(instance.packages.values_list('type').annotate(n=Count('id')))
+            moved = {f'packages_{t}': by_type.get(t, 0) for t in COUNTED_TYPES}
+            moved['packages'] = sum(by_type.values())
+            bump(old_owner, **{f: -n for f, n in moved.items()})
+            bump(owner, **moved)
+        bump(owner, routers=1, routers_active=int(bool(instance.active)))
+    elif bool(old_active) != bool(instance.active):
+        bump(_router_owner(instance.isp_id), routers_active=1 if instance.active else -1)
+    instance._counted = (instance.isp_id, instance.active)
+
+
+@receiver(post_delete, sender=Router)
+def _router_deleted(sender, instance, **kwargs):
+    bump(_router_owner(instance.isp_id), routers=-1, routers_active=-int(bool(instance.active)))
+
+
+@receiver(post_save, sender=Package)
+def _package_saved(sender, instance, created, **kwargs):
+    old_router, old_type = (None, None) if created else instance._counted
+    if created or old_router != instance.router_id:
+        if not created:
+            bump(_package_owner(old_router), **_deltas(-1, 'packages', _type_field('packages', old_type)))
+        bump(_package_owner(instance.router_id), **_deltas(1, 'packages', _type_field('packages', instance.type)))
+    elif old_type != instance.type:
+        bump(_package_owner(instance.router_id), **{
+            **_deltas(-1, _type_field('packages', old_type)),
+            **_deltas(1, _type_field('packages', instance.type)),
+        })
+
+    if not created and old_type != instance.type:
+        # Clients on this package now show under the other tab
+        for isp_id, n in instance.packages.values_list('isp').annotate(n=Count('id')):
+            old_field, new_field = _type_field('clients', old_type), _type_field('clients', instance.type)
+            bump(isp_id, **{
+                **({old_field: -n} if old_field else {}),
+                **({new_field: n} if new_field else {}),
+            })
+    instance._counted = (instance.router_id, instance.type)
+
+
+@receiver(post_delete, sender=Package)
+def _package_deleted(sender, instance, **kwargs):
+    bump(_package_owner(instance.router_id), **_deltas(-1, 'packages', _type_field('packages', instance.type)))
+
+
+@receiver(post_save, sender=Client)
+def _client_saved(sender, instance, created, **kwargs):
+    old_isp, old_package = (None, None) if created else instance._counted
+    if created or (old_isp, old_package) != (instance.isp_id, instance.package_id):
+        if not created:
+            bump(old_isp, **_deltas(-1, 'clients', _type_field('clients', _package_type(instance, old_package))))
+        bump(instance.isp_id, **_deltas(1, 'clients', _type_field('clients', _package_type(instance, instance.package_id))))
+    instance._counted = (instance.isp_id, instance.package_id)
+
+
+@receiver(post_delete, sender=Client)
+def _client_deleted(sender, instance, **kwargs):
+    bump(instance.isp_id, **_deltas(-1, 'clients', _type_field('clients', _package_type(instance, instance.package_id))))
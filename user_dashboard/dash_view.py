@@ -1,111 +1,114 @@
 from django.http import JsonResponse, HttpResponseBadRequest
 from django.shortcuts import render
-from django.db.models import Sum, Count
-from django.utils.timezone import now
+from django.db.models import Sum, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
 from calendar import monthrange
 
 from .helpers import user_to_dict, payment_to_dict, ticket_to_dict
-from .models import User, Package, Billing, Payment, Ticket, Detail
-from collections import defaultdict
+from .models import User, Package, Billing, Payment, Ticket, Detail, DailyRevenue
+from .pagination import keyset_page, InvalidCursor
+from .response_cache import cached_response, global_scope
 import datetime
 
 
+def money_by_period(queryset, today: datetime.date, amount: str = 'package_price',
+                    date_field: str = 'created_at') -> dict:
+    """
+    Sum an amount column in one grouped query
+
+    Rows are grouped by calendar month, and the current month's days are
+    split out with conditional aggregation, so every dashboard figure for
+    the table comes from the same query.
+
+    Args:
+        queryset: Rows to sum (raw Billing/Payment or the DailyRevenue rollup)
+        today: Reference day for the year, month and daily figures
+        amount: Column to sum
+        date_field: DateTimeField or DateField to bucket by
+
+    Returns:
+        total, this_month, this_year, by_month ({month name: float} for this
+        year) and daily (one entry per day of this month)
+    """
+    days_in_month = monthrange(today.year, today.month)[1]
+    day_starts = [datetime.date(today.year, today.month, day) for day in range(1, days_in_month + 1)]
+    if queryset.model._meta.get_field(date_field).get_internal_type() == 'DateTimeField':
+        day_starts = [timezone.make_aware(datetime.datetime.combine(day, datetime.time.min)) for day in day_starts]
+    day_ends = day_starts[1:] + [day_starts[-1] + datetime.timedelta(days=1)]
+
+    rows = queryset.annotate(month=TruncMonth(date_field)).values('month').annotate(
+        total=Sum(amount),
+        **{
+            f'day_{i}': Sum(amount, filter=Q(**{f'{date_field}__gte': start, f'{date_field}__lt': end}))
+            for i, (start, end) in enumerate(zip(day_starts, day_ends))
+        }
+    ).order_by('month')
+
+    result = {'total': 0, 'this_month': 0, 'this_year': 0, 'by_month': {}, 'daily': [0] * days_in_month}
+    for row in rows:
+        month = row['month']
+        result['total'] += row['total']
+        if month.year != today.year:
+            continue
+        result['this_year'] += row['total']
+        result['by_month'][month.strftime('%B')] = float(row['total'])
+        if month.month == today.month:
+            result['this_month'] = row['total']
+            result['daily'] = [row[f'day_{i}'] or 0 for i in range(days_in_month)]
+    return result
+
+
+@cached_response(global_scope)
 def dashboard_view(request):
     if request.method != "POST":
         return HttpResponseBadRequest()
-    current_month = now().month
-    current_year = now().year
-    days_in_month = monthrange(current_year, current_month)[1]
+    today = timezone.localdate()
 
     # Totals
     total_packages = Package.objects.count()
-    total_bills = Billing.objects.aggregate(total=Sum('package_price'))['total'] or 0
-    total_payments = Payment.objects.aggregate(total=Sum('package_price'))['total'] or 0
     total_users = User.objects.filter(role='user').count()
     open_tickets = Ticket.objects.filter(status='open').count()
 
+    # Overall, yearly, monthly and daily sums, read from the daily rollup
+    bills = money_by_period(DailyRevenue.objects.all(), today, 'billed_amount', 'date')
+    payments = money_by_period(DailyRevenue.objects.all(), today, 'paid_amount', 'date')
+
     # Recent
-    recent_users = User.objects.filter(role='user').select_related('detail').prefetch_related('billings').order_by(
-        '-id')[:5]
+    recent_users = User.objects.filter(role='user').with_balance().select_related('isp').order_by('-id')[:5]
     recent_payments = Payment.objects.select_related('user').order_by('-id')[:5]
     recent_tickets = Ticket.objects.order_by('-id')[:5]
 
-    # Monthly & Yearly
-    payments_this_month = Payment.objects.filter(created_at__month=current_month).aggregate(total=Sum('package_price'))[
-                              'total'] or 0
-    bills_this_month = Billing.objects.filter(created_at__month=current_month).aggregate(total=Sum('package_price'))[
-                           'total'] or 0
-    payments_this_year = Payment.objects.filter(created_at__year=current_year).aggregate(total=Sum('package_price'))[
-                             'total'] or 0
-    bills_this_year = Billing.objects.filter(created_at__year=current_year).aggregate(total=Sum('package_price'))[
-                          'total'] or 0
-
-    # Users with dues
-    users_with_due = [user for user in User.objects.filter(role='user').select_related('detail') if
-                      user.due_amount() > 0]
-    users_with_due_count = len(users_with_due)
+    # Users with dues, one page at a time
+    users_with_due = User.objects.filter(role='user').with_due().select_related('isp')
+    users_with_due_count = users_with_due.count()
+    try:
+        due_page, due_cursor, due_has_more = keyset_page(
+            users_with_due, request.POST.get('due_cursor'), int(request.POST.get('due_page_size', 10)),
+            field='date_joined'
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-    # Monthly aggregation by month name
-    billing_data = defaultdict(float)
-    payment_data = defaultdict(float)
-
-    for b in Billing.objects.filter(created_at__year=current_year):
-        billing_data[b.created_at.strftime('%B')] += float(b.package_price)
-
-    for p in Payment.objects.filter(created_at__year=current_year):
-        payment_data[p.created_at.strftime('%B')] += float(p.package_price)
-
-    # Daily aggregation for current month
-    daily_billing_data = []
-    daily_payment_data = []
-
-    for day in range(1, days_in_month + 1):
-        date = datetime.date(current_year, current_month, day)
-        # daily_billing = Billing.objects.filter(created_at__date=date).aggregate(total=Sum('package_price'))[
-        #                     'total'] or 0
-        daily_billing = Billing.objects.filter(created_at__date=date.today()).aggregate(total=Sum('package_price'))[
-                            'total'] or 0
-        daily_payment = Payment.objects.filter(created_at__date=date.today()).aggregate(total=Sum('package_price'))[
-                            'total'] or 0
-        daily_billing_data.append(daily_billing)
-        daily_payment_data.append(daily_payment)
-    print({
-        'total_packages': total_packages,
-        'total_bills': total_bills,
-        'total_payments': total_payments,
-        'total_users': total_users,
-        'open_tickets': open_tickets,
-        'recent_users': recent_users,
-        'recent_payments': [payment_to_dict(pmt) for pmt in recent_payments],
-        'recent_tickets': [ticket_to_dict(tkt) for tkt in recent_tickets],
-        'payments_this_month': payments_this_month,
-        'bills_this_month': bills_this_month,
-        'payments_this_year': payments_this_year,
-        'bills_this_year': bills_this_year,
-        'users_with_due_count': users_with_due_count,
-        'users_with_due_list': users_with_due,
-        'billing_data': dict(billing_data),
-        'payment_data': dict(payment_data),
-        'daily_billing_data': daily_billing_data,
-        'daily_payment_data': daily_payment_data,
-    })
     return JsonResponse({
         'total_packages': total_packages,
-        'total_bills': total_bills,
-        'total_payments': total_payments,
+        'total_bills': bills['total'],
+        'total_payments': payments['total'],
         'total_users': total_users,
         'open_tickets': open_tickets,
         'recentUsers': [user_to_dict(user) for user in recent_users],
         'recentPayments': [payment_to_dict(pmt) for pmt in recent_payments],
         'recent_tickets': [ticket_to_dict(tkt) for tkt in recent_tickets],
-        'payments_this_month': payments_this_month,
-        'bills_this_month': bills_this_month,
-        'payments_this_year': payments_this_year,
-        'billsThisYear': bills_this_year,
+        'payments_this_month': payments['this_month'],
+        'bills_this_month': bills['this_month'],
+        'payments_this_year': payments['this_year'],
+        'billsThisYear': bills['this_year'],
         'users_with_due_count': users_with_due_count,
-        'usersWithDueList': users_with_due,
-        'billingData': dict(billing_data),
-        'paymentData': dict(payment_data),
-        'dailyBillingData': daily_billing_data,
-        'dailyPaymentData': daily_payment_data,
+        'usersWithDueList': [user_to_dict(user) for user in due_page],
+        'usersWithDueCursor': due_cursor,
+        'usersWithDueHasMore': due_has_more,
+        'billingData': bills['by_month'],
+        'paymentData': payments['by_month'],
+        'dailyBillingData': bills['daily'],
+        'dailyPaymentData': payments['daily'],
     }, safe=False)
@@ -0,0 +1,162 @@
+"""
+Streaming CSV/NDJSON exports of clients, invoices and payments
+
+Rows are read with values_list().iterator(), so the database hands them
+over in chunks (a server-side cursor on PostgreSQL), and are encoded one
+line at a time into a StreamingHttpResponse. Memory use stays constant
+whatever the export size. Client and billing exports are served by their
+(isp, created_at) indexes; payment exports are scoped through the billing
+they pay:
+
+    lines = export_lines('billing', isp_id=user.id, fmt='csv', start=date(2026, 1, 1))
+"""
+import csv
+import datetime
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable, Iterator, Optional, Tuple
+
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from user_dashboard.models import Client, Billing, Payment
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+@dataclass(frozen=True)
+class Export:
+    queryset: Callable[[], QuerySet]
+    # (column header, values_list lookup)
+    columns: Tuple[Tuple[str, str], ...]
+    isp_lookup: str
+    package_type_lookup: str
+    date_lookup: str = 'created_at'
+
+
+EXPORTS = {
+    'clients': Export(
+        queryset=Client.objects.all,
+        columns=(
+            ('id', 'id'),
+            ('full_name', 'full_name'),
+            ('phone', 'phone'),
+            ('address', 'address'),
+            ('package', 'package__name'),
+            ('package_type', 'package__type'),
+            ('price', 'package__price'),
+            ('router', 'package__router__name'),
+            ('router_username', 'router_username'),
+            ('package_start', 'package_start'),
+            ('due', 'due'),
+            ('created_at', 'created_at'),
+        ),
+        isp_lookup='isp',
+        package_type_lookup='package__type',
+    ),
+    'billing': Export(
+        queryset=Billing.objects.all,
+        columns=(
+            ('id', 'id'),
+            ('invoice', 'invoice'),
+            ('package', 'package_name'),
+            ('package_type', 'package_type'),
+            ('amount', 'package_price'),
+            ('package_start', 'package_start'),
+            ('created_at', 'created_at'),
+        ),
+        isp_lookup='user',
+        package_type_lookup='package_type',
+    ),
+    'payments': Export(
+        queryset=Payment.objects.all,
+        columns=(
+            ('id', 'id'),
+            ('invoice', 'invoice'),
+            ('billing_invoice', 'billing__invoice'),
+            ('package_type', 'billing__package_type'),
+            ('amount', 'package_price'),
+            ('payment_method', 'payment_method'),
+            ('created_at', 'created_at'),
+        ),
+        # The ISP is the billing's owner, as in the revenue rollup (revenue.py). Scoped
+        # through the join, so the (user, created_at) index of payments does not apply
+        isp_lookup='billing__user',
+        package_type_lookup='billing__package_type',
+    ),
+}
+
+
+def export_queryset(kind: str, isp_id: int, package_type: Optional[str] = None,
+                    start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> QuerySet:
+    """
+    Rows of an export as value tuples, in id order
+
+    Args:
+        kind: Key of EXPORTS
+        isp_id: ISP owner user id
+        package_type: Only rows of this package type (hotspot, pppoe, ...)
+        start: First day (inclusive), by creation date
+        end: Last day (inclusive), by creation date
+    """
+    export = EXPORTS[kind]
+    queryset = export.queryset().filter(**{export.isp_lookup: isp_id})
+    if package_type:
+        queryset = queryset.filter(**{export.package_type_lookup: package_type})
+    # Datetime bounds rather than __date keep the (isp, created_at) indexes of clients
+    # and billing usable; payments are scoped through billing and filtered after the join
+    if start:
+        queryset = queryset.filter(**{f'{export.date_lookup}__gte': _day_start(start)})
+    if end:
+        queryset = queryset.filter(**{f'{export.date_lookup}__lt': _day_start(end + datetime.timedelta(days=1))})
+    return queryset.order_by('id').values_list(*(lookup for _, lookup in export.columns))
+
+
+def export_lines(kind: str, isp_id: int, fmt: str = 'csv', **filters) -> Iterator[str]:
+    """Encoded lines of an export (CSV with a header row, or one JSON object per line)"""
+    header = [name for name, _ in EXPORTS[kind].columns]
+    rows = export_queryset(kind, isp_id, **filters).iterator(chunk_size=CHUNK_SIZE)
+    if fmt == 'csv':
+        return _csv_lines(header, rows)
+    return _ndjson_lines(header, rows)
+
+
+def _day_start(day: datetime.date) -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _json(value):
+    if isinstance(value, (datetime.date, datetime.datetime, Decimal)):
+        return _text(value)
+    return value
+
+
+class _Line:
+    """File-like target that hands back what csv.writer writes"""
+    def write(self, value):
+        return value
+
+
+def _csv_lines(header, rows) -> Iterator[str]:
+    writer = csv.writer(_Line())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_text(value) for value in row])
+
+
+def _ndjson_lines(header, rows) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(header, (_json(value) for value in row)))) + '\n'
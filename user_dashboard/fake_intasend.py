@@ -0,0 +1,113 @@
+"""
+Local fake of the IntaSend checkout API, for development and tests
+
+    server = FakeIntaSend(delay=0.5).start()
+    # INTASEND_BASE_URL = server.url
+    ...
+    server.send_webhook('http://127.0.0.1:8000/api/intasend_webhook/', invoice_id, 'COMPLETED')
+    server.stop()
+
+or standalone: manage.py fake_intasend --port 8765. Checkouts are answered
+after ``delay`` seconds; ``fail_with`` makes the server answer every call
+with that HTTP status instead, to exercise timeouts and the circuit breaker.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import requests
+
+
+class FakeIntaSend:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0, fail_with: Optional[int] = None):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on; a free one when 0
+            delay: Seconds before each answer
+            fail_with: HTTP status to answer every call with
+        """
+        self.delay = delay
+        self.fail_with = fail_with
+        self.checkouts: List[Dict] = []
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self) -> 'FakeIntaSend':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-intasend', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def send_webhook(self, url: str, invoice_id: str, state: str, **fields) -> requests.Response:
+        """Deliver a payment state change the way IntaSend does"""
+        checkout = next((c for c in self.checkouts if c.get('api_ref') == invoice_id), {})
+        payload = {
+            "invoice_id": checkout.get('invoice_id'),
+            "api_ref": invoice_id,
+            "state": state,
+            "value": checkout.get('amount'),
+            "currency": checkout.get('currency'),
+            "updated_at": time.strftime('%Y-%m-%dT%H:%M:%S') + f".{time.time_ns() % 10 ** 9:09d}",
+            **fields,
+        }
+        return requests.post(url, json=payload, timeout=10)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                time.sleep(fake.delay)
+                if fake.fail_with:
+                    return self._answer(fake.fail_with, {"detail": "Fake failure"})
+                if self.path.rstrip('/') != '/api/v1/checkout':
+                    return self._answer(404, {"detail": "Not found"})
+                try:
+                    data = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+                except ValueError:
+                    return self._answer(400, {"errors": "Invalid JSON"})
+                if not data.get('public_key') or not data.get('amount'):
+                    return self._answer(400, {"errors": "public_key and amount are required"})
+                checkout_id = str(uuid.uuid4())
+                checkout = {
+                    **data,
+                    "id": checkout_id,
+                    "invoice_id": uuid.uuid4().hex[:7].upper(),
+                    "url": f"{fake.url}/checkout/{checkout_id}/express/",
+                    "signature": uuid.uuid4().hex,
+                    "paid": False,
+                }
+                fake.checkouts.append(checkout)
+                self._answer(201, {key: value for key, value in checkout.items() if key != 'public_key'})
+
+            def _answer(self, status: int, body: Dict):
+                content = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client timed out waiting for a delayed answer
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
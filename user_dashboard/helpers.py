@@ -7,33 +7,16 @@ from django.http import JsonResponse
 
 from mtk_command_api.utility import EthernetInterface, DhcpClient
 from .models import Router, Package, User, Payment, Ticket, SystemUser, Client, Billing
+from .numbering import invoice_numbers
+from .serializers import RouterSerializer, PackageSerializer, ClientSerializer
 
 
-def router_to_dict(router: Router):
-    return {
-        "id": router.id,
-        "name": router.name,
-        "password": router.password,
-        "location": router.location,
-        "username": router.username,
-        "ip_address": router.ip_address,
-        "identity": router.identity,
-    }
+def router_to_dict(router: Router, compact: bool = False):
+    return RouterSerializer(compact=compact).to_dict(router)
 
 
-def pkg_to_dict(pkg: Package):
-    return {
-        "id": pkg.id,
-        "name": pkg.name,
-        "duration": pkg.duration,
-        "price": pkg.price,
-        "upload_speed": pkg.upload_speed,
-        "download_speed": pkg.download_speed,
-        "speed": pkg.download_speed,
-        "type": pkg.type,
-        "router": router_to_dict(pkg.router),
-        "created": pkg.created_at.isoformat(),
-    }
+def pkg_to_dict(pkg: Package, compact: bool = False):
+    return PackageSerializer(compact=compact).to_dict(pkg)
 
 
 def user_to_dict(user: User):
@@ -48,19 +31,8 @@ def user_to_dict(user: User):
     }
 
 
-def client_to_dict(client: Client):
-    return {
-        "id": client.id,
-        "full_name": client.full_name,
-        "phone": client.phone,
-        "package": pkg_to_dict(client.package),
-        "package_start": client.package_start,
-        "router_username": client.router_username,
-        "router_password": client.router_password,
-        "due": client.due,
-        "created_at": client.created_at,
-        "isp": client.isp.id
-    }
+def client_to_dict(client: Client, compact: bool = False):
+    return ClientSerializer(compact=compact).to_dict(client)
 
 
 def payment_to_dict(payment: Payment) -> Dict:
@@ -100,11 +72,20 @@ def company_to_dict(company: SystemUser):
     }
 
 
-def generate_invoice_number():
-    while True:
-        number = str(random.randint(100000, 999999))
-        if not Billing.objects.filter(invoice=number).exists():
-            return number
+def generate_invoice_number() -> str:
+    return invoice_numbers.next()
+
+
+def generate_invoice_numbers(count: int) -> List[str]:
+    """Allocate ``count`` unique invoice numbers, with at most one query"""
+    return invoice_numbers.take(count)
+
+
+def generate_password(name: str) -> str:
+    # Generate 4 random alphanumeric characters
+    random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=5))
+    # Combine the name with the random suffix
+    return f"{name}_{random_suffix}"
 
 
 def get_client_provisioning_data(info, server_url):
@@ -0,0 +1,223 @@
+"""
+Process-wide IntaSend client
+
+One client per process keeps a pooled keep-alive session to the gateway.
+Every call has connect/read timeouts and goes through a circuit breaker.
+After CIRCUIT_FAILURES consecutive failures, calls fail at once with
+GatewayUnavailable for CIRCUIT_RESET seconds. A single trial call then
+decides whether the circuit closes again. A slow or failing gateway
+therefore costs a worker at most one timeout, not one per payment:
+
+    response = get_client().checkout(email=..., amount=500, currency='KES', api_ref=invoice_id, ...)
+
+Checkouts can also be completed in the background (start_checkout), so
+initiate_payment answers before the gateway does. INTASEND_BASE_URL
+points the client elsewhere, e.g. at the local fake server in
+user_dashboard.fake_intasend.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+
+from user_dashboard.models import ISPAccountPayment
+
+logger = logging.getLogger(__name__)
+
+LIVE_URL = "https://payment.intasend.com/api"
+SANDBOX_URL = "https://sandbox.intasend.com/api"
+CIRCUIT_FAILURES = 5
+CIRCUIT_RESET = 30
+CHECKOUT_WORKERS = 4
+
+
+class GatewayError(Exception):
+    """The gateway rejected a call or could not be reached"""
+
+
+class GatewayUnavailable(GatewayError):
+    """The circuit is open; the gateway is not called"""
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = CIRCUIT_FAILURES, reset_after: float = CIRCUIT_RESET):
+        """
+        Args:
+            failures: Consecutive failures that open the circuit
+            reset_after: Seconds the circuit stays open before a trial call
+        """
+        self.failures = failures
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._count = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            return 'half-open' if time.monotonic() - self._opened_at >= self.reset_after else 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (one trial call at a time while half-open)"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self._trial = True
+            return True
+
+    def success(self) -> None:
+        with self._lock:
+            self._count = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self._count += 1
+            if self._trial or self._count >= self.failures:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class IntaSendClient:
+    def __init__(self, token: str, publishable_key: str, base_url: str = None, test: bool = True,
+                 timeout: float = 10, breaker: CircuitBreaker = None):
+        """
+        Args:
+            token: Secret API key
+            publishable_key: Public API key, sent with checkouts
+            base_url: Gateway API root; the sandbox or live API by ``test`` when omitted
+            test: Use the sandbox
+            timeout: Seconds to wait for the gateway to accept a connection and to answer
+            breaker: Circuit breaker of the gateway
+        """
+        self.token = token
+        self.publishable_key = publishable_key
+        self.base_url = (base_url or (SANDBOX_URL if test else LIVE_URL)).rstrip('/')
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}",
+        })
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=16)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def checkout(self, email: str, amount, currency: str = 'KES', api_ref: str = None, phone_number=None,
+                 comment: str = None, redirect_url: str = None, **extra) -> Dict:
+        """
+        Create a hosted checkout
+
+        Returns:
+            The gateway's checkout; "id" and "url" are the checkout id and payment page
+        """
+        payload = {
+            "public_key": self.publishable_key,
+            "email": email,
+            "amount": amount,
+            "currency": currency,
+            "api_ref": api_ref,
+            "phone_number": phone_number,
+            "comment": comment,
+            "redirect_url": redirect_url,
+            **extra,
+        }
+        return self._post("/v1/checkout/", payload)
+
+    def _post(self, path: str, payload: Dict) -> Dict:
+        if not self.breaker.allow():
+            raise GatewayUnavailable("Payment gateway unavailable, retry shortly")
+        try:
+            res = self.session.post(self.base_url + path, json=payload, timeout=(min(self.timeout, 5), self.timeout))
+        except requests.RequestException as e:
+            self.breaker.failure()
+            raise GatewayError(f"Payment gateway unreachable: {e}") from e
+        if res.status_code >= 500:
+            self.breaker.failure()
+            raise GatewayError(f"Payment gateway error {res.status_code}")
+        # A 4xx is our request's fault, not the gateway's
+        self.breaker.success()
+        try:
+            data = res.json()
+        except ValueError:
+            raise GatewayError(f"Invalid gateway response ({res.status_code})")
+        if res.status_code >= 400:
+            raise GatewayError(str(data.get('errors') or data.get('detail') or data) if isinstance(data, dict)
+                               else str(data))
+        return data
+
+
+_lock = threading.Lock()
+_client: Optional[IntaSendClient] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_pid = None
+
+
+def _reset_after_fork() -> None:
+    global _client, _executor, _pid
+    if _pid != os.getpid():
+        # Sessions and threads are not shared with a forked child
+        _client = _executor = None
+        _pid = os.getpid()
+
+
+def get_client() -> IntaSendClient:
+    """The process-wide client, built from the INTASEND_* settings"""
+    global _client
+    with _lock:
+        _reset_after_fork()
+        if _client is None:
+            _client = IntaSendClient(
+                token=settings.INTASEND_SECRET_KEY,
+                publishable_key=settings.INTASEND_PUBLISHABLE_KEY,
+                base_url=settings.INTASEND_BASE_URL or None,
+                test=settings.INTASEND_TEST,
+                timeout=settings.INTASEND_TIMEOUT,
+            )
+        return _client
+
+
+def start_checkout(payment: ISPAccountPayment, **checkout) -> None:
+    """
+    Complete a payment's checkout on a background worker
+
+    The payment gets its checkout id and url when the gateway answers, or
+    status 'failed' with the reason when it does not.
+    """
+    global _executor
+    with _lock:
+        _reset_after_fork()
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=CHECKOUT_WORKERS, thread_name_prefix='checkout')
+        executor = _executor
+    executor.submit(_complete_checkout, payment.pk, checkout)
+
+
+def _complete_checkout(payment_id: int, checkout: Dict) -> None:
+    try:
+        try:
+            response = get_client().checkout(**checkout)
+        except GatewayError as e:
+            logger.warning("Checkout of payment %s failed: %s", payment_id, e)
+            ISPAccountPayment.objects.filter(pk=payment_id, status='pending').update(
+                status='failed', failed_reason=str(e)[:255], failed_code='checkout')
+            return
+        ISPAccountPayment.objects.filter(pk=payment_id).update(
+            checkout_id=response.get('id'), payment_url=response.get('url'))
+    except Exception:
+        logger.exception("Checkout of payment %s failed", payment_id)
+    finally:
+        close_old_connections()
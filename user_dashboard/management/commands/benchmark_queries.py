@@ -0,0 +1,128 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from user_dashboard.models import User, SystemUser, Router, Package, Client, Billing, Payment
+
+BENCH_PREFIX = 'bench_isp_'
+CLIENTS_PER_ISP = 10000
+ROUTERS_PER_ISP = 10
+PACKAGE_TYPES = ('hotspot', 'hotspot', 'pppoe', 'pppoe')
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = ('Print query plans and timings of the hot filter paths, optionally on a seeded dataset. '
+            'To compare indexes, run it once after "migrate user_dashboard 0012_search_columns" and '
+            'once after "migrate".')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, metavar='CLIENTS',
+                            help='First create this many benchmark clients (e.g. 1000000), with one invoice '
+                                 'each and a payment for every other invoice')
+        parser.add_argument('--drop', action='store_true', help='Delete the benchmark accounts and exit')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query (default 20)')
+
+    def handle(self, *args, **options):
+        if options['drop']:
+            self.drop()
+            return
+        if options['seed']:
+            if User.objects.filter(username__startswith=BENCH_PREFIX).exists():
+                raise CommandError('Benchmark data already exists; run with --drop first')
+            self.seed(options['seed'])
+
+        isp = User.objects.filter(username__startswith=BENCH_PREFIX).order_by('-id').first() \
+            or User.objects.filter(ispAccount__isnull=False).order_by('-id').first()
+        if isp is None:
+            raise CommandError('No clients to query; seed some with --seed')
+        router = Router.objects.filter(isp__user=isp).order_by('id').first()
+        client = Client.objects.filter(isp=isp).order_by('id').first()
+        since = timezone.now() - timedelta(days=30)
+
+        queries = [
+            ('Router by identity', Router.objects.filter(identity=router.identity)),
+            ('Active routers of an ISP', Router.objects.filter(isp=router.isp_id, active=True)),
+            ('Hotspot packages of a router', Package.objects.filter(router=router, type='hotspot')),
+            ('Latest clients of an ISP', Client.objects.filter(isp=isp).order_by('-created_at', '-id')[:10]),
+            ('Client by package and phone', Client.objects.filter(package=client.package_id, phone=client.phone)),
+            ('Invoices of a user, last 30 days', Billing.objects.filter(user=isp, created_at__gte=since)),
+            ('Payments of a user, last 30 days', Payment.objects.filter(user=isp, created_at__gte=since)),
+        ]
+        for label, queryset in queries:
+            self.report(label, queryset, options['repeat'])
+
+    def report(self, label, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{label}: median {statistics.median(timings):.2f} ms"))
+        self.stdout.write(queryset.explain())
+        self.stdout.write('')
+
+    def drop(self):
+        users = User.objects.filter(username__startswith=BENCH_PREFIX)
+        deleted = 0
+        with transaction.atomic():
+            # Plain DELETEs: cascading a million rows through the per-row signals would take hours
+            for queryset in (Payment.objects.filter(user__in=users), Billing.objects.filter(user__in=users),
+                             Client.objects.filter(isp__in=users), Package.objects.filter(router__isp__user__in=users),
+                             Router.objects.filter(isp__user__in=users)):
+                deleted += queryset._raw_delete(queryset.db)
+            deleted += users.delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} benchmark row(s)"))
+
+    def seed(self, clients):
+        now = timezone.now()
+        isps = max(1, -(-clients // CLIENTS_PER_ISP))
+        for n in range(isps):
+            count = min(CLIENTS_PER_ISP, clients - n * CLIENTS_PER_ISP)
+            with transaction.atomic():
+                self.seed_isp(n, count, now)
+            self.stdout.write(f"Seeded ISP {n + 1}/{isps}")
+
+    def seed_isp(self, n, clients, now):
+        # bulk_create skips the counter and revenue signals; benchmark accounts are not shown anywhere
+        user = User.objects.create(username=f'{BENCH_PREFIX}{n}')
+        account = SystemUser.objects.create(name=user.username, address='-', phone='-', email='bench@example.com',
+                                            user=user)
+        routers = Router.objects.bulk_create([
+            Router(name=f'router {r}', identity=f'{user.username}_router{r}', secrete='-', ip_address='10.0.0.1',
+                   username='admin', password='-', active=r % 2 == 0, isp=account, search_name=f'router {r}')
+            for r in range(ROUTERS_PER_ISP)
+        ])
+        packages = Package.objects.bulk_create([
+            Package(name=f'{kind} {p}', type=kind, price='1000', router=router, search_name=f'{kind} {p}')
+            for router in routers for p, kind in enumerate(PACKAGE_TYPES)
+        ])
+
+        for offset in range(0, clients, BATCH_SIZE):
+            batch = []
+            for i in range(offset, min(offset + BATCH_SIZE, clients)):
+                created = now - timedelta(minutes=i * 53 % 525600)
+                client = Client(full_name=f'client {n} {i}', phone=f'07{n:03d}{i:05d}', isp=user,
+                                package=packages[i % len(packages)], router_username=f'c{n}x{i}',
+                                router_password='-', due=created + timedelta(days=30), created_at=created)
+                client.refresh_search_columns()
+                batch.append(client)
+            Client.objects.bulk_create(batch)
+
+            invoices = Billing.objects.bulk_create([
+                Billing(invoice=f'BN{n:04d}{i:06d}', package_name=client.package.name, package_price=1000,
+                        package_type=client.package.type, user=user, created_at=client.created_at)
+                for i, client in enumerate(batch, offset)
+            ])
+            if invoices and invoices[0].pk is None:
+                # MySQL does not return the ids of bulk inserted rows
+                invoices = list(Billing.objects.filter(invoice__in=[b.invoice for b in invoices]).order_by('id'))
+            Payment.objects.bulk_create([
+                Payment(billing=invoice, user=user, invoice=invoice.invoice, payment_method='mpesa',
+                        package_price=1000, created_at=invoice.created_at)
+                for invoice in invoices[::2]
+            ])
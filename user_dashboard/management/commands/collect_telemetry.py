@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from user_dashboard.telemetry import TelemetryCollector, TimeSeriesStore
+
+
+class Command(BaseCommand):
+    help = 'Poll active routers for CPU, memory, session and traffic metrics into the telemetry store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Seconds between polls (default TELEMETRY_INTERVAL)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Routers polled at the same time (default 8)')
+        parser.add_argument('--once', action='store_true', help='Poll once and exit')
+
+    def handle(self, *args, **options):
+        collector = TelemetryCollector(TimeSeriesStore(), interval=options['interval'],
+                                       concurrency=options['concurrency'])
+        if options['once']:
+            answered = collector.poll_once()
+            self.stdout.write(self.style.SUCCESS(f"Polled routers, {answered} answered"))
+            return
+        self.stdout.write(f"Collecting telemetry every {collector.interval:g}s, Ctrl+C to stop")
+        collector.run_forever()
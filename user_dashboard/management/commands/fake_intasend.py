@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from user_dashboard.fake_intasend import FakeIntaSend
+
+
+class Command(BaseCommand):
+    help = 'Run a local fake of the IntaSend checkout API (point INTASEND_BASE_URL at it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default 8765)')
+        parser.add_argument('--delay', type=float, default=0, help='Seconds before each answer (default 0)')
+        parser.add_argument('--fail-with', type=int, help='Answer every call with this HTTP status')
+
+    def handle(self, *args, **options):
+        server = FakeIntaSend(port=options['port'], delay=options['delay'], fail_with=options['fail_with'])
+        self.stdout.write(f"Fake IntaSend listening, set INTASEND_BASE_URL={server.url}; Ctrl+C to stop")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
@@ -0,0 +1,56 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user_dashboard.client_import import parse_rows, create_import, run_import, DEFAULT_CHUNK_SIZE
+from user_dashboard.models import User, ClientImport
+
+
+class Command(BaseCommand):
+    help = 'Bulk import clients from a CSV or JSON file, or resume an interrupted import'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', help='CSV or JSON file with fullName, phone and packageId columns')
+        parser.add_argument('--isp', help='Username of the ISP account the clients belong to')
+        parser.add_argument('--format', choices=['csv', 'json'], help='File format (defaults to the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows written per router bulk request and transaction')
+        parser.add_argument('--resume', type=int, metavar='JOB_ID', help='Resume the pending rows of an import job')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                job = ClientImport.objects.get(id=options['resume'])
+            except ClientImport.DoesNotExist:
+                raise CommandError(f"Import job {options['resume']} not found")
+        else:
+            job = self.create_job(options)
+            self.stdout.write(f"Created import job {job.id} with {job.total} rows")
+
+        job = run_import(job, chunk_size=options['chunk_size'])
+
+        for row in job.rows.filter(status='failed'):
+            self.stdout.write(self.style.WARNING(f"Line {row.line}: {row.error}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Import job {job.id} {job.status}: {job.created_count} created, {job.failed_count} failed"
+        ))
+
+    def create_job(self, options):
+        path = options['file']
+        if not path or not options['isp']:
+            raise CommandError('A file and --isp are required unless --resume is given')
+        if not os.path.exists(path):
+            raise CommandError(f"{path} not found")
+
+        try:
+            isp = User.objects.get(username=options['isp'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['isp']} not found")
+
+        fmt = options['format'] or ('json' if path.lower().endswith('.json') else 'csv')
+        with open(path, encoding='utf-8-sig') as f:
+            try:
+                rows = parse_rows(f.read(), fmt)
+            except ValueError as e:
+                raise CommandError(f"Invalid import file: {e}")
+        return create_import(isp, rows, source=os.path.basename(path))
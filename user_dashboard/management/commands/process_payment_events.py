@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_dashboard.payment_events import drain
+
+
+class Command(BaseCommand):
+    help = 'Apply payment webhook events still queued (left over after a restart, or when workers are disabled)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Events per run (default all)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for queued events')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds between polls with --loop (default 2)')
+
+    def handle(self, *args, **options):
+        while True:
+            counts = drain(options['limit'])
+            # A poll that only finds events still waiting for their payment stays quiet
+            if set(counts) - {'queued'} or not options['loop']:
+                summary = ', '.join(f"{count} {status}" for status, count in sorted(counts.items())) or 'none queued'
+                self.stdout.write(self.style.SUCCESS(f"Payment events: {summary}"))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
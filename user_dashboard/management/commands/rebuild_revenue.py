@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from user_dashboard.revenue import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the DailyRevenue rollup for a date range from Billing and Payment rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day to rebuild (YYYY-MM-DD); all history when omitted')
+        parser.add_argument('--to', dest='end', help='Last day to rebuild (YYYY-MM-DD); up to today when omitted')
+        parser.add_argument('--isp', type=int, action='append', dest='isp_ids',
+                            help='ISP owner user id (repeatable); all ISPs when omitted')
+
+    def handle(self, *args, **options):
+        start, end = self.parse_day(options['start']), self.parse_day(options['end'])
+        if start and end and start > end:
+            raise CommandError('--from must not be after --to')
+
+        written = rebuild(start, end, options['isp_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt daily revenue, {written} row(s) written"))
+
+    def parse_day(self, value):
+        if value is None:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date: {value}")
+        return day
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from user_dashboard.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-ISP router/package/client counters and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--isp', type=int, action='append', dest='isp_ids',
+                            help='ISP owner user id (repeatable); all ISPs when omitted')
+
+    def handle(self, *args, **options):
+        repaired = reconcile(options['isp_ids'])
+        for isp_id, drift in repaired:
+            changes = ', '.join(f"{field} {stored} -> {actual}" for field, (stored, actual) in drift.items())
+            self.stdout.write(self.style.WARNING(f"ISP {isp_id}: {changes}"))
+        self.stdout.write(self.style.SUCCESS(f"Reconciled counters, {len(repaired)} ISP(s) repaired"))
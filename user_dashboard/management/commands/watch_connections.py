@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from user_dashboard.connections import ConnectionWatcher
+
+
+class Command(BaseCommand):
+    help = 'Detect newly provisioned routers connecting to the VPN and record their addresses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Seconds between cycles (default CONNECTION_WATCH_INTERVAL)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Lookups in flight at the same time (default 8)')
+        parser.add_argument('--once', action='store_true', help='Check once and exit')
+
+    def handle(self, *args, **options):
+        watcher = ConnectionWatcher(interval=options['interval'], concurrency=options['concurrency'])
+        if options['once']:
+            connected = watcher.check_once()
+            self.stdout.write(self.style.SUCCESS(f"Checked waiting routers, {connected} connected"))
+            return
+        self.stdout.write(f"Watching for router connections every {watcher.interval:g}s, Ctrl+C to stop")
+        watcher.run_forever()
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 10:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_dashboard', '0007_clientimport_clientimportrow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ISPCounters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('routers', models.IntegerField(default=0)),
+                ('routers_active', models.IntegerField(default=0)),
+                ('packages', models.IntegerField(default=0)),
+                ('packages_hotspot', models.IntegerField(default=0)),
+                ('packages_pppoe', models.IntegerField(default=0)),
+                ('clients', models.IntegerField(default=0)),
+                ('clients_hotspot', models.IntegerField(default=0)),
+                ('clients_pppoe', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('isp', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 10:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_dashboard', '0008_ispcounters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='router',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='router',
+            index=models.Index(fields=['isp', '-created_at', '-id'], name='router_isp_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(fields=['router', '-created_at', '-id'], name='package_router_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['isp', '-created_at', '-id'], name='client_isp_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 11:20
+
+import user_dashboard.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_dashboard', '0009_router_created_at_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', user_dashboard.models.UserManager()),
+            ],
+        ),
+    ]
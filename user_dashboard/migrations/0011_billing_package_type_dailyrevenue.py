@@ -0,0 +1,71 @@
+# Generated by Django 5.2 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from collections import defaultdict
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill(apps, schema_editor):
+    Billing = apps.get_model('user_dashboard', 'Billing')
+    Payment = apps.get_model('user_dashboard', 'Payment')
+    Package = apps.get_model('user_dashboard', 'Package')
+    DailyRevenue = apps.get_model('user_dashboard', 'DailyRevenue')
+
+    # Best match for old invoices: the ISP's package with the invoiced name
+    Billing.objects.filter(package_type='').update(package_type=Coalesce(Subquery(
+        Package.objects.filter(name=OuterRef('package_name'), router__isp__user=OuterRef('user'))
+        .order_by('id').values('type')[:1]
+    ), models.Value('')))
+
+    rows = defaultdict(lambda: {'billed_amount': 0, 'billed_count': 0, 'paid_amount': 0, 'paid_count': 0})
+    for row in Billing.objects.annotate(day=TruncDate('created_at')).values('user', 'day', 'package_type') \
+            .annotate(amount=Sum('package_price'), count=Count('id')).order_by():
+        values = rows[(row['user'], row['day'], row['package_type'])]
+        values['billed_amount'], values['billed_count'] = row['amount'], row['count']
+    for row in Payment.objects.annotate(day=TruncDate('created_at')) \
+            .values('billing__user', 'day', 'billing__package_type') \
+            .annotate(amount=Sum('package_price'), count=Count('id')).order_by():
+        values = rows[(row['billing__user'], row['day'], row['billing__package_type'])]
+        values['paid_amount'], values['paid_count'] = row['amount'], row['count']
+
+    DailyRevenue.objects.bulk_create([
+        DailyRevenue(isp_id=isp_id, date=day, package_type=package_type, **values)
+        for (isp_id, day, package_type), values in rows.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_dashboard', '0010_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billing',
+            name='package_type',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('package_type', models.CharField(blank=True, default='', max_length=20)),
+                ('billed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('billed_count', models.IntegerField(default=0)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('isp', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='user_dashbo_date_93405b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('isp', 'date', 'package_type'), name='daily_revenue_key')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
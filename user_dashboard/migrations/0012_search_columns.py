@@ -0,0 +1,105 @@
+# Generated by Django 5.2 on 2026-10-18 14:02
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+from user_dashboard.search import create_fulltext_index, drop_fulltext_index
+
+
+# Copies of models.normalize_text/normalize_phone; historical models have no custom save()
+def normalize_text(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return ' '.join(value.lower().split())
+
+
+def normalize_phone(value):
+    digits = re.sub(r'\D', '', value or '')
+    if digits.startswith('254'):
+        digits = '0' + digits[3:]
+    return digits
+
+
+# Model -> {search column: (source field, normalizer)}
+SEARCH_COLUMNS = {
+    'router': {'search_name': ('name', normalize_text)},
+    'package': {'search_name': ('name', normalize_text)},
+    'client': {'search_name': ('full_name', normalize_text), 'search_phone': ('phone', normalize_phone)},
+}
+
+
+def backfill(apps, schema_editor):
+    for model_name, columns in SEARCH_COLUMNS.items():
+        model = apps.get_model('user_dashboard', model_name)
+        sources = [source for source, _ in columns.values()]
+        batch = []
+        for obj in model.objects.only('id', *sources).order_by('id').iterator(chunk_size=2000):
+            for column, (source, normalize) in columns.items():
+                setattr(obj, column, normalize(getattr(obj, source)))
+            batch.append(obj)
+            if len(batch) == 2000:
+                model.objects.bulk_update(batch, list(columns))
+                batch = []
+        model.objects.bulk_update(batch, list(columns))
+
+
+def create_fulltext(apps, schema_editor):
+    for model_name, columns in SEARCH_COLUMNS.items():
+        table = apps.get_model('user_dashboard', model_name)._meta.db_table
+        create_fulltext_index(schema_editor, table, list(columns))
+
+
+def drop_fulltext(apps, schema_editor):
+    for model_name, columns in SEARCH_COLUMNS.items():
+        table = apps.get_model('user_dashboard', model_name)._meta.db_table
+        drop_fulltext_index(schema_editor, table, list(columns))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_dashboard', '0011_billing_package_type_dailyrevenue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='router',
+            name='search_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='search_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='search_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='search_phone',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='router',
+            index=models.Index(fields=['isp', 'search_name'], name='router_isp_search_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(fields=['router', 'search_name'], name='package_router_search_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['isp', 'search_name'], name='client_isp_search_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['isp', 'search_phone'], name='client_isp_search_phone_idx'),
+        ),
+        migrations.RunPython(create_fulltext, drop_fulltext),
+    ]
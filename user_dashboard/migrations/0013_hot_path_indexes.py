@@ -0,0 +1,100 @@
+# Generated by Django 5.2 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+from user_dashboard.search import create_fulltext_index
+
+
+# Identities routers got without being provisioned: hand-added routers had none, 0002 gave older rows '1'
+PLACEHOLDER_IDENTITIES = ('', '1')
+
+
+def _provisioned(router):
+    # Provisioned routers carry the task id their VPN certificate was issued under
+    return router.secrete not in PLACEHOLDER_IDENTITIES
+
+
+def unique_identities(apps, schema_editor):
+    """
+    Give every router a unique identity before the unique constraint
+
+    Unprovisioned routers are named the way router_create names them now,
+    "<owner>_<name>", with "-<id>" appended on a collision. A provisioned
+    router's identity names its VPN certificate and client_ip lookups, so two
+    provisioned routers sharing one stop the migration for an operator to
+    decide.
+    """
+    Router = apps.get_model('user_dashboard', 'Router')
+    routers = list(Router.objects.select_related('isp__user').order_by('id'))
+    taken = {router.identity for router in routers if router.identity not in PLACEHOLDER_IDENTITIES}
+    by_identity = {}
+    for router in routers:
+        if router.identity in PLACEHOLDER_IDENTITIES:
+            identity = f"{router.isp.user.username}_{router.name}"[:240]
+            router.identity = identity if identity not in taken else f"{identity}-{router.id}"
+            taken.add(router.identity)
+            router.save(update_fields=['identity'])
+        by_identity.setdefault(router.identity, []).append(router)
+
+    conflicts = []
+    for identity, group in by_identity.items():
+        if len(group) < 2:
+            continue
+        provisioned = [router for router in group if _provisioned(router)]
+        if len(provisioned) > 1:
+            conflicts.append(f"  {identity}: router ids {', '.join(str(router.id) for router in provisioned)}")
+            continue
+        # The provisioned router, or else the oldest, keeps the identity
+        keeper = provisioned[0] if provisioned else group[0]
+        for router in group:
+            if router is not keeper:
+                router.identity = f"{identity[:240]}-{router.id}"
+                router.save(update_fields=['identity'])
+    if conflicts:
+        raise RuntimeError(
+            "Provisioned routers share an identity, so their VPN certificates cannot be told apart. "
+            "Delete the stale routers, then migrate again:\n" + "\n".join(conflicts)
+        )
+
+
+def restore_router_search(apps, schema_editor):
+    # SQLite rebuilds the router table to add the unique constraint, dropping the FTS5 triggers
+    if schema_editor.connection.vendor == 'sqlite':
+        create_fulltext_index(schema_editor, apps.get_model('user_dashboard', 'Router')._meta.db_table, ['search_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_dashboard', '0012_search_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(unique_identities, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='router',
+            name='identity',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.RunPython(restore_router_search, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='router',
+            index=models.Index(fields=['isp', 'active'], name='router_isp_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(fields=['router', 'type'], name='package_router_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['package', 'phone'], name='client_package_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='billing',
+            index=models.Index(fields=['user', 'created_at'], name='billing_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', 'created_at'], name='payment_user_created_idx'),
+        ),
+    ]
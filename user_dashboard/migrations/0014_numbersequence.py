@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+FIRST_NUMBER = 1000000
+
+
+def seed_sequences(apps, schema_editor):
+    """Start each series above every number already issued"""
+    NumberSequence = apps.get_model('user_dashboard', 'NumberSequence')
+    series = {
+        'invoice': apps.get_model('user_dashboard', 'Billing').objects.values_list('invoice', flat=True),
+        'ticket': apps.get_model('user_dashboard', 'Ticket').objects.values_list('number', flat=True),
+    }
+    for name, numbers in series.items():
+        highest = max((int(n) for n in numbers.iterator() if n.isdigit()), default=0)
+        NumberSequence.objects.create(name=name, next_value=max(FIRST_NUMBER, highest + 1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_dashboard', '0013_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('next_value', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
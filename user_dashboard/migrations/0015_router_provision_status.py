@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+from user_dashboard.search import create_fulltext_index
+
+
+def backfill(apps, schema_editor):
+    Router = apps.get_model('user_dashboard', 'Router')
+    # Provisioned routers get their VPN address once they have connected
+    Router.objects.exclude(ip_address='not found').update(provision_status='connected')
+
+
+def restore_router_search(apps, schema_editor):
+    # SQLite rebuilds the router table to add the column, dropping the FTS5 triggers
+    if schema_editor.connection.vendor == 'sqlite':
+        create_fulltext_index(schema_editor, apps.get_model('user_dashboard', 'Router')._meta.db_table, ['search_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_dashboard', '0014_numbersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='router',
+            name='provision_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('issued', 'Issued'), ('connected', 'Connected')], default='issued', max_length=20),
+        ),
+        migrations.RunPython(restore_router_search, migrations.RunPython.noop),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 18:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_dashboard', '0015_router_provision_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('invoice_id', models.CharField(max_length=50)),
+                ('state', models.CharField(max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('applied', 'Applied'), ('ignored', 'Ignored'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('error', models.CharField(blank=True, default='', max_length=255)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='payment_event_queue_idx'), models.Index(fields=['invoice_id', 'id'], name='payment_event_invoice_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_dashboard', '0006_ispaccountpayment'),
+        ('user_dashboard', '0016_paymentevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ispaccountpayment',
+            name='payment_expiry',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -1,10 +1,84 @@
 import datetime
-import random
-from routeros_api import RouterOsApiPool
-from django.contrib.auth.models import AbstractUser
+import re
+import unicodedata
+from contextlib import contextmanager
+from django.contrib.auth.models import AbstractUser, UserManager as AuthUserManager
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from routeros_api.api import RouterOsApi
+
+from mtk_command_api.api_pool import connections
+
+
+def normalize_text(value) -> str:
+    """Lowercase, accent-free, single-spaced form of a name, as stored in search columns"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return ' '.join(value.lower().split())
+
+
+def normalize_phone(value) -> str:
+    """Digits of a phone number in national form (+254 7xx / 2547xx -> 07xx)"""
+    digits = re.sub(r'\D', '', value or '')
+    if digits.startswith('254'):
+        digits = '0' + digits[3:]
+    return digits
+
+
+class SearchIndexed(models.Model):
+    """Keeps normalized, indexed search columns in step with their source fields"""
+    # Search column -> (source field, normalizer)
+    SEARCH_COLUMNS = {}
+
+    class Meta:
+        abstract = True
+
+    def refresh_search_columns(self):
+        """Recompute the search columns; call before bulk_create/bulk_update"""
+        for column, (source, normalize) in self.SEARCH_COLUMNS.items():
+            setattr(self, column, normalize(getattr(self, source)))
+
+    def save(self, *args, **kwargs):
+        self.refresh_search_columns()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                column for column, (source, _) in self.SEARCH_COLUMNS.items() if source in update_fields
+            }
+        super().save(*args, **kwargs)
+
+
+class UserQuerySet(models.QuerySet):
+    def with_balance(self):
+        """
+        Annotate billed, paid and balance (billed - paid) in the same query
+
+        Each sum is a correlated subquery, so the annotation does not multiply
+        rows the way joining both tables would.
+        """
+        money = models.DecimalField(max_digits=12, decimal_places=2)
+
+        def total(model):
+            return Coalesce(
+                models.Subquery(
+                    model.objects.filter(user=models.OuterRef('pk')).order_by().values('user')
+                    .annotate(total=models.Sum('package_price')).values('total')
+                ),
+                models.Value(0),
+                output_field=money,
+            )
+
+        return self.annotate(billed=total(Billing), paid=total(Payment)).annotate(
+            balance=models.ExpressionWrapper(models.F('billed') - models.F('paid'), output_field=money)
+        )
+
+    def with_due(self):
+        """Users whose bills exceed their payments"""
+        return self.with_balance().filter(balance__gt=0)
+
+
+class UserManager(AuthUserManager.from_queryset(UserQuerySet)):
+    pass
 
 
 class User(AbstractUser):
@@ -19,6 +93,8 @@ class User(AbstractUser):
 
     # package = models.ForeignKey(Package, related_name='users', on_delete=models.CASCADE)
 
+    objects = UserManager()
+
     def is_admin(self):
         return self.role == 'admin'
 
@@ -26,6 +102,9 @@ class User(AbstractUser):
         return self.role == 'user'
 
     def due_amount(self):
+        if hasattr(self, 'balance'):
+            # Loaded through User.objects.with_balance()
+            return self.balance
         bill = Billing.objects.filter(user=self).aggregate(models.Sum('package_price'))['package_price__sum'] or 0
         pay = Payment.objects.filter(user=self).aggregate(models.Sum('package_price'))['package_price__sum'] or 0
         return bill - pay
@@ -54,7 +133,7 @@ class SystemUser(models.Model):
     role = models.CharField(max_length=50, choices=ROLE_CHOICES, default='technician')
 
 class ISPAccountPayment(models.Model):
-    user = models.ForeignKey('ISPProvider', on_delete=models.CASCADE, related_name='isp_account_payments')
+    user = models.ForeignKey(SystemUser, on_delete=models.CASCADE, related_name='isp_account_payments')
     amount = models.DecimalField(max_digits=10, decimal_places=2, blank=False)
     payment_method = models.CharField(max_length=100, blank=False)
     created_at = models.DateTimeField(default=timezone.now)
@@ -72,15 +151,48 @@ class ISPAccountPayment(models.Model):
     mpesa_reference = models.CharField(max_length=100, null=True, blank=True)
     failed_reason = models.CharField(max_length=255, null=True, blank=True)
     failed_code = models.CharField(max_length=50, null=True, blank=True)
-    
+
     def __str__(self):
         return f"{self.user.username} - {self.amount} {self.currency} - {self.status}"
 
 
+class PaymentEvent(models.Model):
+    """Raw payment webhook, stored before it is applied (see user_dashboard.payment_events)"""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('applied', 'Applied'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    )
+    # Hash of (invoice id, state, event id); a redelivered webhook has the same key
+    key = models.CharField(max_length=64, unique=True)
+    invoice_id = models.CharField(max_length=50)
+    state = models.CharField(max_length=20)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    error = models.CharField(max_length=255, blank=True, default='')
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='payment_event_queue_idx'),
+            models.Index(fields=['invoice_id', 'id'], name='payment_event_invoice_idx'),
+        ]
+
+
+
+class Router(SearchIndexed):
+    SEARCH_COLUMNS = {'search_name': ('name', normalize_text)}
+
+    PROVISION_CHOICES = (
+        ('pending', 'Pending'),
+        ('issued', 'Issued'),
+        ('connected', 'Connected'),
+    )
 
-class Router(models.Model):
     name = models.CharField(max_length=255)
-    identity = models.CharField(max_length=255)
+    identity = models.CharField(max_length=255, unique=True)
     secrete = models.CharField(max_length=255)
     location = models.CharField(max_length=255, null=True)
     ip_address = models.GenericIPAddressField()
@@ -88,34 +200,48 @@ class Router(models.Model):
     password = models.CharField(max_length=255)
     active = models.BooleanField(default=False)
     isp = models.ForeignKey(SystemUser, related_name='routers', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+    # pending: being provisioned; issued: bootstrap script handed out; connected: reached us over the VPN
+    provision_status = models.CharField(max_length=20, choices=PROVISION_CHOICES, default='issued')
+    search_name = models.CharField(max_length=255, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['isp', '-created_at', '-id'], name='router_isp_recent_idx'),
+            models.Index(fields=['isp', 'search_name'], name='router_isp_search_name_idx'),
+            models.Index(fields=['isp', 'active'], name='router_isp_active_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
-    def connection(self) -> RouterOsApi | None:
-        try:
-            res = RouterOsApiPool(
-                host=self.ip_address, username=self.username,
-                password=self.password, plaintext_login=True
-            )
-            return res.get_api()
-        except Exception as e:
-            return None
+    @contextmanager
+    def lease(self):
+        """
+        Exclusive use of the router's API connection for a sequence of commands
+
+        Raises:
+            RouterOsApiError subclasses when the router is unreachable
+        """
+        with connections.lease(self.id, self.ip_address, self.username, self.password) as api:
+            yield api
 
 
 class Billing(models.Model):
     invoice = models.CharField(max_length=20, unique=True)
     package_name = models.CharField(max_length=255)
     package_price = models.DecimalField(max_digits=10, decimal_places=2)
+    package_type = models.CharField(max_length=20, blank=True, default='')
     package_start = models.DateField(null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='billings')
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'created_at'], name='billing_user_created_idx')]
+
     def generate_random_number(self):
-        while True:
-            number = random.randint(100000, 999999)
-            if not Billing.objects.filter(invoice=number).exists():
-                return number
+        from user_dashboard.numbering import invoice_numbers
+        return invoice_numbers.next()
 
 
 class Payment(models.Model):
@@ -126,6 +252,9 @@ class Payment(models.Model):
     package_price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'created_at'], name='payment_user_created_idx')]
+
 
 class Ticket(models.Model):
     STATUS_CHOICES = (
@@ -148,13 +277,13 @@ class Ticket(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
 
     def generate_random_number(self):
-        while True:
-            number = random.randint(100000, 999999)
-            if not Ticket.objects.filter(number=number).exists():
-                return number
+        from user_dashboard.numbering import ticket_numbers
+        return ticket_numbers.next()
+
 
+class Package(SearchIndexed):
+    SEARCH_COLUMNS = {'search_name': ('name', normalize_text)}
 
-class Package(models.Model):
     PACKAGE_CHOICES = (
         ('hotspot', 'Hotspot'),
         ('pppoe', 'PPPoE'),
@@ -168,12 +297,25 @@ class Package(models.Model):
     router = models.ForeignKey(Router, related_name='packages', on_delete=models.CASCADE)
     duration = models.CharField(max_length=100, default="30 days")
     created_at = models.DateTimeField(default=timezone.now)
+    search_name = models.CharField(max_length=255, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['router', '-created_at', '-id'], name='package_router_recent_idx'),
+            models.Index(fields=['router', 'search_name'], name='package_router_search_name_idx'),
+            models.Index(fields=['router', 'type'], name='package_router_type_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Client(models.Model):
+class Client(SearchIndexed):
+    SEARCH_COLUMNS = {
+        'search_name': ('full_name', normalize_text),
+        'search_phone': ('phone', normalize_phone),
+    }
+
     package = models.ForeignKey(Package, related_name='packages', on_delete=models.CASCADE)
     full_name = models.CharField(max_length=255)
     phone = models.CharField(max_length=255)
@@ -184,3 +326,114 @@ class Client(models.Model):
     due = models.DateTimeField()
     created_at = models.DateTimeField(default=timezone.now)
     address = models.CharField(max_length=255, default="No address")
+    search_name = models.CharField(max_length=255, blank=True, default='', editable=False)
+    search_phone = models.CharField(max_length=255, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['isp', '-created_at', '-id'], name='client_isp_recent_idx'),
+            models.Index(fields=['isp', 'search_name'], name='client_isp_search_name_idx'),
+            models.Index(fields=['isp', 'search_phone'], name='client_isp_search_phone_idx'),
+            models.Index(fields=['package', 'phone'], name='client_package_phone_idx'),
+        ]
+
+
+class ISPCounters(models.Model):
+    """
+    Denormalized badge counts per ISP owner account
+
+    Kept current by the signal handlers in user_dashboard.counters; run the
+    reconcile_counters command to repair drift.
+    """
+    isp = models.OneToOneField(User, on_delete=models.CASCADE, related_name='counters')
+    routers = models.IntegerField(default=0)
+    routers_active = models.IntegerField(default=0)
+    packages = models.IntegerField(default=0)
+    packages_hotspot = models.IntegerField(default=0)
+    packages_pppoe = models.IntegerField(default=0)
+    clients = models.IntegerField(default=0)
+    clients_hotspot = models.IntegerField(default=0)
+    clients_pppoe = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def routers_inactive(self):
+        return self.routers - self.routers_active
+
+    def __str__(self):
+        return f"Counters for {self.isp.username}"
+
+
+class DailyRevenue(models.Model):
+    """
+    Billed and paid totals per ISP, day and package type
+
+    Maintained from Billing/Payment signals by user_dashboard.revenue; the
+    rebuild_revenue command recomputes any date range from the raw rows.
+    """
+    isp = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_revenue')
+    date = models.DateField()
+    package_type = models.CharField(max_length=20, blank=True, default='')
+    billed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    billed_count = models.IntegerField(default=0)
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['isp', 'date', 'package_type'], name='daily_revenue_key')
+        ]
+        indexes = [models.Index(fields=['date'])]
+
+
+class NumberSequence(models.Model):
+    """
+    Next unreserved value of a document number series (invoices, tickets)
+
+    Workers reserve blocks of numbers from it, see user_dashboard.numbering.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class ClientImport(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    isp = models.ForeignKey(User, related_name='client_imports', on_delete=models.CASCADE)
+    source = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class ClientImportRow(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('created', 'Created'),
+        ('failed', 'Failed'),
+    )
+    job = models.ForeignKey(ClientImport, related_name='rows', on_delete=models.CASCADE)
+    line = models.IntegerField()
+    data = models.JSONField(default=dict)
+    package = models.ForeignKey(Package, null=True, blank=True, on_delete=models.SET_NULL)
+    router_username = models.CharField(max_length=255, blank=True, default='')
+    router_password = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.CharField(max_length=255, blank=True, default='')
+    client = models.ForeignKey(Client, null=True, blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        ordering = ['line']
+        indexes = [models.Index(fields=['job', 'status', 'line'])]
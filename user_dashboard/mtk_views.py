@@ -1,21 +1,31 @@
 import base64
 import dataclasses
 import datetime
+import functools
+import io
 import json
 import time
 import socket
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from urllib.parse import urlparse
 from cryptography.fernet import Fernet
-from django.http import JsonResponse, HttpResponse
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, HttpResponseNotModified
 from django.shortcuts import render, get_object_or_404
 from django.template.loader import render_to_string
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import ensure_csrf_cookie
 from rest_framework.decorators import api_view
 
 from ISP import settings
 import requests as req
 
-from user_dashboard.helpers import get_client_provisioning_data, get_host, generate_key, get_mode_from_url
+from user_dashboard.helpers import get_client_provisioning_data, get_host, generate_key
+from user_dashboard import provisioning, response_cache
+from user_dashboard.counters import bump
+from user_dashboard.response_cache import cached_response, isp_scope
 from user_dashboard.models import Router, SystemUser
 
 
@@ -33,6 +43,52 @@ class ResponseData:
 fernet = Fernet(settings.FERNET_KEY.encode())
 
 
+# Concurrent calls to the provisioning backend per batch, and routers per batch
+PROVISION_WORKERS = 8
+MAX_PROVISION_BATCH = 100
+
+
+def request_provision(identity: str) -> ResponseData:
+    """Ask the provisioning backend to issue VPN credentials for a router identity"""
+    res = req.post(settings.API_URL + f"/mikrotik/openvpn/create_provision/{identity}", timeout=60)
+    return ResponseData(**res.json())
+
+
+def bootstrap_script(router: Router, user, host: str) -> Tuple[str, str]:
+    """
+    One-line RouterOS script that fetches and imports the router's provisioning config
+
+    Returns:
+        (script, provisioning url)
+    """
+    client_info = {
+        "mtk": router.id,
+        "user": user.username,
+    }
+    provisioning_data = get_client_provisioning_data(client_info, host)
+    payload = {
+        **provisioning_data,
+        'timestamp': datetime.datetime.utcnow().isoformat()
+    }
+
+    json_payload = json.dumps(payload)
+    encrypted_payload = fernet.encrypt(json_payload.encode()).decode()
+    encoded_payload = base64.urlsafe_b64encode(encrypted_payload.encode()).decode()
+
+    rsc_file = settings.RSC_FILE
+    provisioning_url = f"{provisioning_data['server_url']}/{encoded_payload}/"
+    script = f""":do {{
+                :local url "{provisioning_url}";
+
+                /tool fetch url=$url dst-path={rsc_file};
+                :delay 2s;
+                /import {rsc_file};
+            }} on-error={{
+                :put "Error occurred during configuration. Check internet and retry.";
+            }}"""
+    return script, provisioning_url
+
+
 @ensure_csrf_cookie
 def gen_mtk_provision(request):
     if request.method == 'POST':
@@ -51,62 +107,36 @@ def gen_mtk_provision(request):
                     "error": f"Router with identity {router_name} already exists."
                 })
 
-            mtk_info = {
-                "name": router_identity,
-                "password": generate_key()
-            }
-
-            api_url = settings.API_URL
-
             # Initial request to create provision
-            res = req.post(api_url + f"/mikrotik/openvpn/create_provision/{mtk_info['name']}")
-            res = ResponseData(**res.json())
-            print(res)
+            res = request_provision(router_identity)
             if res.status in ["error", None]:
                 return JsonResponse({
                     "error": f"Something went wrong. {res.message or ''}"
                 })
 
-            router = Router.objects.create(
-                name=router_name,
-                username=settings.MTK_USERNAME,
-                password=mtk_info["password"],
-                location="ss",
-                ip_address="not found",
-                secrete=res.task_id,
-                isp=SystemUser.objects.get(user=user.id),
-                identity=mtk_info["name"]
-            )
-            client_info = {
-                "mtk": router.id,
-                "user": user.username,
-            }
-            print("getting cient provisioning data ")
-            provisioning_data = get_client_provisioning_data(client_info, get_host(request))
-            print("provisioning data ", provisioning_data)
-            payload = {
-                **provisioning_data,
-                'timestamp': datetime.datetime.utcnow().isoformat()
-            }
-
-            json_payload = json.dumps(payload)
-            encrypted_payload = fernet.encrypt(json_payload.encode()).decode()
-            encoded_payload = base64.urlsafe_b64encode(encrypted_payload.encode()).decode()
-
-            rsc_file = settings.RSC_FILE
-            provisioning_url = f"{provisioning_data['server_url']}/{encoded_payload}/"
-            script = f""":do {{
-                :local url "{provisioning_url}";
+            try:
+                router = Router.objects.create(
+                    name=router_name,
+                    username=settings.MTK_USERNAME,
+                    password=generate_key(),
+                    location="ss",
+                    ip_address="not found",
+                    secrete=res.task_id,
+                    isp=SystemUser.objects.get(user=user.id),
+                    identity=router_identity,
+                    provision_status='issued'
+                )
+            except IntegrityError:
+                # Same identity provisioned concurrently
+                return JsonResponse({
+                    "ok": False,
+                    "error": f"Router with identity {router_name} already exists."
+                })
 
-                /tool fetch url=$url dst-path={rsc_file};
-                :delay 2s;
-                /import {rsc_file};
-            }} on-error={{
-                :put "Error occurred during configuration. Check internet and retry.";
-            }}"""
+            script, provisioning_url = bootstrap_script(router, user, get_host(request))
             return JsonResponse({
                 "ok": True,
-                "script": str(script), "pvr_url": provisioning_url, "rsc_file": rsc_file
+                "script": str(script), "pvr_url": provisioning_url, "rsc_file": settings.RSC_FILE
             })
         except Exception as e:
             raise
@@ -117,6 +147,124 @@ def gen_mtk_provision(request):
             })
 
 
+@ensure_csrf_cookie
+def gen_mtk_provision_batch(request):
+    """
+    Provision many routers at once
+
+    POST JSON {"router_names": [...], "format": "json" | "zip"}. Router rows
+    are created as pending first, which also reserves their identities; the
+    backend is then called for all of them concurrently. Routers it rejects
+    are removed again and reported under "errors".
+    """
+    if request.method != 'POST':
+        return HttpResponseBadRequest()
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Invalid JSON body"}, status=400)
+
+    names = list(dict.fromkeys(str(name).strip() for name in data.get("router_names") or [] if str(name).strip()))
+    if not names:
+        return JsonResponse({"ok": False, "error": "router_names is required"}, status=400)
+    if len(names) > MAX_PROVISION_BATCH:
+        return JsonResponse({"ok": False, "error": f"At most {MAX_PROVISION_BATCH} routers per batch"}, status=400)
+
+    user = request.user
+    account = SystemUser.objects.filter(user=user.id).first()
+    if account is None:
+        return JsonResponse({"ok": False, "error": "Update company information first"}, status=400)
+
+    identities = {name: f"{user.username}_{name}" for name in names}
+    taken = set(Router.objects.filter(identity__in=identities.values()).values_list('identity', flat=True))
+    errors = [{"name": name, "error": f"Router with identity {name} already exists."}
+              for name in names if identities[name] in taken]
+    routers = [
+        Router(name=name, username=settings.MTK_USERNAME, password=generate_key(), location="ss",
+               ip_address="not found", secrete="", isp=account, identity=identities[name],
+               provision_status='pending')
+        for name in names if identities[name] not in taken
+    ]
+    if not routers:
+        return JsonResponse({"ok": False, "routers": [], "errors": errors}, status=409)
+    for router in routers:
+        router.refresh_search_columns()
+
+    try:
+        with transaction.atomic():
+            Router.objects.bulk_create(routers)
+            # bulk_create bypasses the counter and response cache signals
+            bump(user.id, routers=len(routers))
+            response_cache.bump_on_commit(user.id)
+    except IntegrityError:
+        return JsonResponse({"ok": False, "error": "Some of these routers were created concurrently, retry"},
+                            status=409)
+    if routers[0].pk is None:
+        # MySQL does not return the ids of bulk inserted rows
+        routers = list(Router.objects.filter(identity__in=[router.identity for router in routers]))
+
+    with ThreadPoolExecutor(max_workers=PROVISION_WORKERS) as pool:
+        results = list(pool.map(_try_provision, [router.identity for router in routers]))
+
+    issued, failed = [], []
+    for router, (res, error) in zip(routers, results):
+        if error:
+            errors.append({"name": router.name, "error": error})
+            failed.append(router.pk)
+        else:
+            router.secrete, router.provision_status = res.task_id, 'issued'
+            issued.append(router)
+    with transaction.atomic():
+        Router.objects.bulk_update(issued, ['secrete', 'provision_status'])
+        # One by one so the counter signals see each row
+        for router in Router.objects.filter(pk__in=failed):
+            router.delete()
+        response_cache.bump_on_commit(user.id)
+
+    host = get_host(request)
+    entries = []
+    for router in issued:
+        script, provisioning_url = bootstrap_script(router, user, host)
+        entries.append({"id": router.id, "name": router.name, "identity": router.identity,
+                        "status": router.provision_status, "script": script, "pvr_url": provisioning_url})
+
+    if data.get("format") == "zip":
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for entry in entries:
+                archive.writestr(f"{entry['name']}.rsc", entry["script"])
+            if errors:
+                archive.writestr("errors.txt", "\n".join(f"{e['name']}: {e['error']}" for e in errors))
+        response = HttpResponse(buffer.getvalue(), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename=provisioning.zip'
+        return response
+
+    return JsonResponse({"ok": bool(entries), "rsc_file": settings.RSC_FILE, "routers": entries, "errors": errors},
+                        status=201 if entries else 502)
+
+
+def _try_provision(identity: str) -> Tuple[Optional[ResponseData], Optional[str]]:
+    # Runs on a pool thread, without database access
+    try:
+        res = request_provision(identity)
+    except Exception as e:
+        return None, f"Provisioning backend unreachable: {e}"
+    if res.status in ["error", None]:
+        return None, f"Something went wrong. {res.message or ''}".strip()
+    return res, None
+
+
+@cached_response(isp_scope, timeout=30)
+def provision_status(request):
+    """Provisioning status of the ISP's routers, e.g. ?ids=4,5,6 (default: all not yet connected)"""
+    routers = Router.objects.filter(isp__user=request.user.id)
+    ids = [i for i in request.GET.get('ids', '').split(',') if i.strip().isdigit()]
+    routers = routers.filter(pk__in=ids) if ids else routers.exclude(provision_status='connected')
+    return JsonResponse({
+        "routers": list(routers.order_by('id').values('id', 'name', 'identity', 'provision_status'))
+    })
+
+
 @api_view(['GET'])
 def provision_content(request, encoded_payload):
     # server_url = get_host(request)
@@ -199,46 +347,25 @@ def validate(encoded_payload) -> ValidPayload:
 #     except Exception as e:
 #         return HttpResponse(f':put "Failed to generate OpenVPN config: {str(e)}"', content_type='text/plain')
 
+# Tokens are immutable, so a router re-fetching its script skips the Fernet decryption
+_validate_cached = functools.lru_cache(maxsize=4096)(validate)
+
+
 @api_view(["GET"])
 def provision_version_content(request, encoded_payload, version):
     try:
-        info = validate(encoded_payload)
+        info = _validate_cached(encoded_payload)
         router = get_object_or_404(Router, id=info.mtk)
         if not router:
             raise ValueError("No router found")
 
-        # Determine which server IP to use for walled garden
-        server_ip = settings.SERVER_IP  # Make sure this is defined in your settings
-        url = get_host(request)
-
-        config = {
-            "firewall": "10.8.0.1",
-            "secret": router.password,
-            "identity": router.identity,
-            "mtk_user": settings.MTK_USERNAME,
-            "vpn_url": f"{settings.API_URL}/mikrotik/openvpn/{router.identity}",
-            "hs_login_url": f"{url}/mikrotik/hotspot/{router.identity}/login.html",
-            "hs_rlogin_url": f"{url}/mikrotik/hotspot/{router.identity}/rlogin.html",
-            "walled_garden_host": settings.HOSTNAME,
-            "walled_garden_ip": server_ip,
-        }
-        config["mode"] = get_mode_from_url(config["hs_login_url"])
-
-        # For RouterOS v6, we need additional parameters
-        if version == 6:
-            config.update({
-                "connect_to": settings.VPN_SERVER_IP,
-                "vpn_pass": router.password,
-                "client_cert": f"{router.identity}.config_1"
-            })
-
-        file = "vpn_7_config.rsc" if version == 7 else "vpn_6_config.rsc"
-        script_lines = render_to_string(f'rsc_files/{file}', {
-            'config': config
-        })
-
-        response = HttpResponse(script_lines, content_type='text/plain')
-        response['Content-Disposition'] = 'attachment; filename=script.rsc'
+        script_lines, etag = provisioning.render_script(router, version, get_host(request))
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(script_lines, content_type='text/plain')
+            response['Content-Disposition'] = 'attachment; filename=script.rsc'
+        response['ETag'] = etag
         return response
 
     except Exception as e:
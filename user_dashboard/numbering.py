@@ -0,0 +1,119 @@
+"""
+Block-reserving allocator for invoice and ticket numbers
+
+Each process reserves a block of consecutive numbers from its NumberSequence
+row with one UPDATE and hands them out from memory, so numbering costs no
+query most of the time and two workers can never get the same number:
+
+    number = invoice_numbers.next()
+    numbers = invoice_numbers.take(500)
+
+Numbers are unique but not gap-free or globally ordered: each worker
+uses its own block, and the unused part of a block is skipped when the
+process exits. Inside a transaction the reserved block is used only by that
+transaction until it commits (a rollback also rolls the reservation back),
+and the transaction's further numbers come from it before another block is
+reserved. Series start at 1000000, above the six-digit random
+numbers issued before, so old and new numbers never collide.
+"""
+import os
+import threading
+from typing import List
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from user_dashboard.models import NumberSequence
+
+FIRST_NUMBER = 1000000
+DEFAULT_BLOCK_SIZE = 50
+
+
+class NumberAllocator:
+    def __init__(self, name: str, block_size: int = DEFAULT_BLOCK_SIZE, start: int = FIRST_NUMBER):
+        """
+        Args:
+            name: NumberSequence row of the series
+            block_size: Numbers reserved per query
+            start: First number when the series row does not exist yet
+        """
+        self.name = name
+        self.block_size = block_size
+        self.start = start
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next = self._end = 0
+        self._pid = None
+
+    def next(self) -> str:
+        return self.take(1)[0]
+
+    def take(self, count: int) -> List[str]:
+        """Allocate ``count`` unique numbers, reserving at most one new block"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # A block inherited from the parent process is also used by the parent
+                self._next = self._end = 0
+                self._pid = os.getpid()
+
+            numbers = list(range(self._next, min(self._end, self._next + count)))
+            self._next += len(numbers)
+            in_transaction = transaction.get_connection().in_atomic_block
+            pending = self._pending() if in_transaction else None
+            if pending and len(numbers) < count:
+                # A block reserved earlier in the caller's transaction
+                more = list(range(pending[0], min(pending[1], pending[0] + count - len(numbers))))
+                pending[0] += len(more)
+                numbers += more
+            missing = count - len(numbers)
+            if missing:
+                size = max(missing, self.block_size)
+                first = self._reserve(size)
+                numbers += range(first, first + missing)
+                if in_transaction:
+                    # The caller's transaction may still roll the reservation back, and the
+                    # database would then hand the same block out again: until it commits,
+                    # only this transaction uses the block, and the rest is kept on commit
+                    block = [first + missing, first + size]
+                    keep = lambda: self._keep(*block)
+                    transaction.on_commit(keep)
+                    self._local.pending = (block, keep)
+                else:
+                    self._next, self._end = first + missing, first + size
+            return [str(number) for number in numbers]
+
+    def _pending(self):
+        """The block reserved in the current transaction, while that reservation can still commit"""
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            return None
+        block, keep = pending
+        # Rolling back the transaction (or the savepoint of the reservation) drops its callback
+        if not any(func is keep for _, func, _ in transaction.get_connection().run_on_commit):
+            self._local.pending = None
+            return None
+        return block
+
+    def _keep(self, start: int, end: int) -> None:
+        with self._lock:
+            self._local.pending = None
+            if self._pid == os.getpid() and self._next >= self._end and start < end:
+                self._next, self._end = start, end
+
+    def _reserve(self, size: int) -> int:
+        """Reserve ``size`` numbers in the database; returns the first one"""
+        with transaction.atomic():
+            # The UPDATE locks the row until commit, so the read below sees only our reservation
+            if not NumberSequence.objects.filter(name=self.name).update(next_value=F('next_value') + size):
+                try:
+                    with transaction.atomic():
+                        NumberSequence.objects.create(name=self.name, next_value=self.start + size)
+                    return self.start
+                except IntegrityError:
+                    # Created concurrently
+                    NumberSequence.objects.filter(name=self.name).update(next_value=F('next_value') + size)
+            return NumberSequence.objects.filter(name=self.name).values_list('next_value', flat=True).get() - size
+
+
+invoice_numbers = NumberAllocator('invoice')
+ticket_numbers = NumberAllocator('ticket')
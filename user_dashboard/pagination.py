@@ -0,0 +1,72 @@
+"""
+Keyset (cursor) pagination for the list endpoints
+
+Pages are ordered newest first by (created_at, id), or another timestamp
+column, and continue from the last row of the previous page, so fetching
+page N costs the same as page 1 and needs no COUNT(*). The cursor handed to
+clients is opaque.
+"""
+import base64
+import json
+from typing import List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_FIELD = 'created_at'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(obj, field: str = DEFAULT_FIELD) -> str:
+    """Cursor pointing just after ``obj`` in (field, id) descending order"""
+    raw = json.dumps([getattr(obj, field).isoformat(), obj.pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        value = parse_datetime(value)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    if value is None or not isinstance(pk, int):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return value, pk
+
+
+def keyset_page(queryset: QuerySet, cursor: Optional[str] = None, page_size: int = 10,
+                page: Optional[int] = None, field: str = DEFAULT_FIELD) -> Tuple[List, Optional[str], bool]:
+    """
+    Fetch one page of a queryset
+
+    Args:
+        queryset: Filtered queryset; its ordering is replaced by (field, id) descending
+        cursor: ``next_cursor`` of the previous page; None for the first page
+        page_size: Rows per page
+        page: Legacy 1-based page number, used with OFFSET only when no cursor is given
+        field: Timestamp column to order by
+
+    Returns:
+        (rows, next_cursor, has_more)
+
+    Raises:
+        InvalidCursor: The cursor was not produced by this module
+    """
+    queryset = queryset.order_by(f'-{field}', '-id')
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+        start = 0
+    else:
+        start = (max(int(page or 1), 1) - 1) * page_size
+
+    # One extra row tells whether another page exists
+    rows = list(queryset[start:start + page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(rows[-1], field) if has_more else None
+    return rows, next_cursor, has_more
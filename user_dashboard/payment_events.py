@@ -0,0 +1,193 @@
+"""
+Queued, idempotent processing of payment webhooks
+
+The webhook view only stores the raw event and answers:
+
+    event = ingest(data)   # one INSERT; None for a redelivered event
+
+Events are deduplicated by a hash of (invoice id, state, event id), so a
+retried or duplicated webhook is stored once and applied once. Stored
+events are handed to an in-process pool of PAYMENT_EVENT_WORKERS threads.
+Each invoice always goes to the same thread, so its events are applied in
+arrival order. The queue is bounded. Anything it cannot take, or anything
+left over after a restart, stays 'queued' in the database. Run
+manage.py process_payment_events to work through those.
+
+Applying an event locks the event and payment rows. Payment states only
+move forward (pending < processing < failed < completed): a late PENDING
+never overwrites COMPLETED, whichever process or thread sees it. An event
+whose payment row does not exist (yet) stays queued and is tried again by
+the next drain, until it is PAYMENT_WAIT old.
+"""
+import hashlib
+import logging
+import os
+import queue
+import threading
+import zlib
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from user_dashboard.models import ISPAccountPayment, PaymentEvent
+
+logger = logging.getLogger(__name__)
+
+# Webhook state -> ISPAccountPayment.status
+STATES = {
+    'PENDING': 'pending',
+    'PROCESSING': 'processing',
+    'FAILED': 'failed',
+    'COMPLETED': 'completed',
+}
+# A payment only moves to a higher rank; a retried checkout may still complete after failing
+RANK = {'pending': 0, 'processing': 1, 'failed': 2, 'completed': 3}
+QUEUE_SIZE = 10000
+# How long an event waits for its payment row before it fails
+PAYMENT_WAIT = timedelta(days=1)
+
+
+def event_key(invoice_id: str, state: str, event_id: str = '') -> str:
+    return hashlib.sha256(f"{invoice_id}\x1f{state}\x1f{event_id}".encode()).hexdigest()
+
+
+def ingest(data: Dict) -> Optional[PaymentEvent]:
+    """
+    Store a webhook payload and queue it
+
+    Returns:
+        The stored event, or None for a duplicate or a payload without an invoice
+    """
+    invoice_id = str(data.get('api_ref') or data.get('invoice_id') or '')
+    if not invoice_id:
+        return None
+    state = str(data.get('state') or '').upper()
+    # IntaSend sends no delivery id; updated_at tells a new event from a redelivery
+    event_id = str(data.get('id') or data.get('updated_at') or '')
+    try:
+        with transaction.atomic():
+            event = PaymentEvent.objects.create(
+                key=event_key(invoice_id, state, event_id),
+                invoice_id=invoice_id[:50],
+                state=state[:20],
+                payload=data,
+            )
+    except IntegrityError:
+        return None
+    transaction.on_commit(lambda: dispatcher.submit(event.pk, invoice_id))
+    return event
+
+
+def apply_event(event_id: int) -> Optional[str]:
+    """
+    Apply one queued event to its payment
+
+    Returns:
+        The event's new status ('queued' while its payment does not exist), or
+        None when it was not queued (already handled)
+    """
+    with transaction.atomic():
+        event = PaymentEvent.objects.select_for_update().filter(pk=event_id, status='queued').first()
+        if event is None:
+            return None
+        event.status, event.error = _transition(event)
+        if event.status == 'queued':
+            event.save(update_fields=['error'])
+        else:
+            event.processed_at = timezone.now()
+            event.save(update_fields=['status', 'error', 'processed_at'])
+    return event.status
+
+
+def _transition(event: PaymentEvent):
+    status = STATES.get(event.state)
+    if status is None:
+        return 'ignored', f"Unknown state {event.state}"[:255]
+    payment = ISPAccountPayment.objects.select_for_update().filter(invoice_id=event.invoice_id).first()
+    if payment is None:
+        # The webhook may race the payment's own commit; try again on the next drain
+        if timezone.now() - event.received_at < PAYMENT_WAIT:
+            return 'queued', "Payment record not found"
+        return 'failed', "Payment record not found"
+    if RANK[status] <= RANK.get(payment.status, -1):
+        return 'ignored', f"Payment is already {payment.status}"
+
+    data = event.payload
+    payment.status = status
+    if status == 'completed':
+        payment.payment_expiry = timezone.now() + timezone.timedelta(days=30)
+    elif status == 'failed':
+        payment.failed_reason = data.get("failed_reason")
+        payment.failed_code = data.get("failed_code")
+    if data.get("mpesa_reference"):
+        payment.mpesa_reference = data.get("mpesa_reference")
+    payment.save()
+    return 'applied', ''
+
+
+def drain(limit: int = None) -> Dict[str, int]:
+    """Apply queued events in arrival order; returns how many ended in each status"""
+    counts: Dict[str, int] = {}
+    events = PaymentEvent.objects.filter(status='queued').order_by('id').values_list('id', flat=True)
+    for event_id in events[:limit] if limit else events.iterator():
+        try:
+            status = apply_event(event_id)
+        except Exception as e:
+            logger.exception("Payment event %s failed", event_id)
+            PaymentEvent.objects.filter(pk=event_id, status='queued').update(
+                status='failed', error=str(e)[:255], processed_at=timezone.now())
+            status = 'failed'
+        if status:
+            counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+class EventDispatcher:
+    """Worker threads applying events; one invoice always maps to the same worker"""
+
+    def __init__(self, workers: int = None):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._queues: List[queue.Queue] = []
+        self._pid = None
+
+    def submit(self, event_id: int, invoice_id: str) -> bool:
+        """Queue an event without blocking; False when it is left for process_payment_events"""
+        queues = self._started()
+        if not queues:
+            return False
+        try:
+            queues[zlib.crc32(invoice_id.encode()) % len(queues)].put_nowait(event_id)
+        except queue.Full:
+            return False
+        return True
+
+    def _started(self) -> List[queue.Queue]:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads do not survive a fork; the child starts its own
+                self._pid = os.getpid()
+                workers = self.workers if self.workers is not None else settings.PAYMENT_EVENT_WORKERS
+                self._queues = [queue.Queue(QUEUE_SIZE) for _ in range(workers)]
+                for index, q in enumerate(self._queues):
+                    threading.Thread(target=self._run, args=(q,), name=f'payment-events-{index}',
+                                     daemon=True).start()
+            return self._queues
+
+    @staticmethod
+    def _run(q: queue.Queue) -> None:
+        while True:
+            event_id = q.get()
+            try:
+                apply_event(event_id)
+            except Exception:
+                # Stays queued for process_payment_events
+                logger.exception("Payment event %s failed", event_id)
+            finally:
+                close_old_connections()
+
+
+dispatcher = EventDispatcher()
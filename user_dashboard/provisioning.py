@@ -0,0 +1,105 @@
+"""
+Cached RouterOS provisioning scripts
+
+Scripts served by provision_version_content are rendered once per
+(router id, RouterOS version, config hash) and kept in a per-process LRU.
+The config hash covers every value that goes into the script: router
+fields, the settings used and the request host. Editing the router or a
+setting therefore changes the key, and the stale entry is never served
+again. Router saves and deletes also drop that router's entries straight
+away. Responses carry an ETag, so a router re-fetching an unchanged script
+gets a 304.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.template.loader import get_template
+
+from user_dashboard.helpers import get_mode_from_url
+from user_dashboard.models import Router
+
+MAX_SCRIPTS = 4096
+TEMPLATES = {
+    6: 'rsc_files/vpn_6_config.rsc',
+    7: 'rsc_files/vpn_7_config.rsc',
+}
+
+_scripts: "OrderedDict[tuple, Tuple[str, str]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def script_config(router: Router, version: int, host: str) -> Dict:
+    """Template context of a router's VPN provisioning script"""
+    config = {
+        "firewall": "10.8.0.1",
+        "secret": router.password,
+        "identity": router.identity,
+        "mtk_user": settings.MTK_USERNAME,
+        "vpn_url": f"{settings.API_URL}/mikrotik/openvpn/{router.identity}",
+        "hs_login_url": f"{host}/mikrotik/hotspot/{router.identity}/login.html",
+        "hs_rlogin_url": f"{host}/mikrotik/hotspot/{router.identity}/rlogin.html",
+        "walled_garden_host": settings.HOSTNAME,
+        "walled_garden_ip": settings.SERVER_IP,
+    }
+    config["mode"] = get_mode_from_url(config["hs_login_url"])
+
+    # For RouterOS v6, we need additional parameters
+    if version == 6:
+        config.update({
+            "connect_to": settings.VPN_SERVER_IP,
+            "vpn_pass": router.password,
+            "client_cert": f"{router.identity}.config_1"
+        })
+    return config
+
+
+def render_script(router: Router, version: int, host: str) -> Tuple[str, str]:
+    """
+    Provisioning script of a router, from the cache when its config is unchanged
+
+    Args:
+        router: Router to provision
+        version: RouterOS major version (6 or 7; anything else gets the v6 script)
+        host: Scheme and host the router reaches this server on
+
+    Returns:
+        (script, etag)
+    """
+    version = 7 if version == 7 else 6
+    config = script_config(router, version, host)
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+    key = (router.id, version, digest)
+
+    with _lock:
+        cached = _scripts.get(key)
+        if cached is not None:
+            _scripts.move_to_end(key)
+            return cached
+
+    script = get_template(TEMPLATES[version]).render({'config': config})
+    # From the output, so a changed template after a deploy is not answered with 304
+    entry = (script, f'"{hashlib.sha256(script.encode()).hexdigest()[:32]}"')
+    with _lock:
+        _scripts[key] = entry
+        while len(_scripts) > MAX_SCRIPTS:
+            _scripts.popitem(last=False)
+    return entry
+
+
+def invalidate(router_id: int = None) -> None:
+    """Drop the cached scripts of one router, or of all routers"""
+    with _lock:
+        for key in [key for key in _scripts if router_id is None or key[0] == router_id]:
+            del _scripts[key]
+
+
+@receiver(post_save, sender=Router)
+@receiver(post_delete, sender=Router)
+def _router_changed(sender, instance, **kwargs):
+    invalidate(instance.pk)
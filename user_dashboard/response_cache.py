@@ -0,0 +1,159 @@
+"""
+Generation-versioned response cache
+
+Read-mostly endpoints cache their JSON per user under a generation number. A
+write to any model the responses depend on bumps the generation of the
+affected ISP (and the global one), once the writing transaction commits, so
+older entries are never read again and simply expire:
+
+    @cached_response(isp_scope)
+    def start_app(request): ...
+
+Generations live in the default cache. Use a backend shared by all worker
+processes (file based by default, see CACHES) so a write handled by one
+worker invalidates the others. A bump writes the current time in nanoseconds
+as the new generation, which needs no atomic increment from the backend.
+"""
+import hashlib
+import time
+from functools import wraps
+from typing import Callable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from user_dashboard.models import Router, Package, Client, Billing, Payment, SystemUser, User, Ticket
+
+DEFAULT_TIMEOUT = 300
+GLOBAL_SCOPE = 'all'
+
+
+def _generation_key(scope) -> str:
+    return f'resp-gen:{scope}'
+
+
+def generation(scope) -> int:
+    value = cache.get(_generation_key(scope))
+    if value is None:
+        # Start from the clock so a lost counter never reuses an old generation
+        value = time.time_ns()
+        if not cache.add(_generation_key(scope), value, None):
+            value = cache.get(_generation_key(scope), value)
+    return value
+
+
+def bump(scope) -> None:
+    """Invalidate every cached response of a scope"""
+    # A fresh clock value rather than incr(): the file based cache's incr is a get
+    # and a set, so two workers bumping at once could write the same generation
+    cache.set(_generation_key(scope), time.time_ns(), None)
+
+
+class _Bump:
+    def __init__(self, scope):
+        self.scope = scope
+
+    def __call__(self):
+        bump(self.scope)
+
+
+def bump_on_commit(*scopes) -> None:
+    """Bump after the current transaction commits, so no reader caches pre-commit data under the new generation"""
+    connection = transaction.get_connection()
+    # A cascade delete fires once per row; queue each scope once per transaction
+    queued = {getattr(entry[1], 'scope', None) for entry in connection.run_on_commit}
+    for scope in {s for s in scopes if s is not None} | {GLOBAL_SCOPE}:
+        if scope not in queued:
+            transaction.on_commit(_Bump(scope))
+
+
+def isp_scope(request) -> int:
+    """Responses that depend on the requesting ISP account's data"""
+    return request.user.pk
+
+
+def global_scope(request) -> str:
+    """Responses that aggregate across all ISPs"""
+    return GLOBAL_SCOPE
+
+
+def cached_response(scope: Callable, timeout: int = DEFAULT_TIMEOUT):
+    """
+    Cache successful responses of a view per user, request body and scope generation
+
+    Args:
+        scope: Called with the request; returns the generation scope the response depends on
+        timeout: Seconds a cached response is kept
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            fingerprint = hashlib.sha1(
+                request.method.encode() + request.get_full_path().encode() + request.body
+            ).hexdigest()
+            key = (f'resp:{view.__module__}.{view.__name__}:{request.user.pk}:'
+                   f'{generation(scope(request))}:{fingerprint}')
+
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type']), timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def _router_owner(router: Optional[Router]) -> Optional[int]:
+    if router is None:
+        return None
+    return SystemUser.objects.filter(pk=router.isp_id).values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender=Router)
+@receiver(post_delete, sender=Router)
+def _router_changed(sender, instance, **kwargs):
+    bump_on_commit(_router_owner(instance))
+
+
+@receiver(post_save, sender=Package)
+@receiver(post_delete, sender=Package)
+def _package_changed(sender, instance, **kwargs):
+    bump_on_commit(Router.objects.filter(pk=instance.router_id).values_list('isp__user', flat=True).first())
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Billing)
+@receiver(post_delete, sender=Billing)
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def _owned_changed(sender, instance, **kwargs):
+    bump_on_commit(instance.isp_id if sender is Client else instance.user_id)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def _payment_changed(sender, instance, **kwargs):
+    bump_on_commit(instance.user_id,
+                   Billing.objects.filter(pk=instance.billing_id).values_list('user_id', flat=True).first())
+
+
+@receiver(post_save, sender=SystemUser)
+@receiver(post_delete, sender=SystemUser)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _account_changed(sender, instance, **kwargs):
+    # last_login updates on every sign-in and do not show in any response
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        return
+    bump_on_commit(instance.user_id if sender is SystemUser else instance.pk)
@@ -0,0 +1,177 @@
+"""
+Daily revenue rollup
+
+DailyRevenue holds one row per (ISP, day, package type) with billed and paid
+sums and counts, so dashboards and reports read a few hundred rollup rows
+instead of scanning every Billing and Payment. Billing/Payment signals apply
+deltas as rows are written; writes that bypass signals (bulk_create,
+queryset.update/delete) call add() themselves or are repaired with
+rebuild(), which recomputes a date range from the raw rows idempotently.
+
+Payments are attributed to the ISP and package type of the invoice they pay.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from user_dashboard.models import Billing, Payment, DailyRevenue
+
+AMOUNTS = ('billed_amount', 'billed_count', 'paid_amount', 'paid_count')
+
+
+def add(isp_id: int, day: datetime.date, package_type: str, **deltas) -> None:
+    """
+    Add deltas to a rollup row, creating it when missing
+
+    A missing row is not created for a pure decrement: the row was dropped
+    along with its ISP, or a rebuild already excludes the removed data.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if isp_id is None or not deltas:
+        return
+    key = dict(isp_id=isp_id, date=day, package_type=package_type or '')
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if DailyRevenue.objects.filter(**key).update(**changes) or all(d < 0 for d in deltas.values()):
+        return
+    try:
+        with transaction.atomic():
+            DailyRevenue.objects.create(**key, **deltas)
+    except IntegrityError:
+        # Created concurrently; add to it instead
+        DailyRevenue.objects.filter(**key).update(**changes)
+
+
+def aggregate(start: datetime.date = None, end: datetime.date = None,
+              isp_ids: Iterable[int] = None) -> Dict[tuple, Dict]:
+    """
+    Compute rollup values from the raw rows, one grouped query per table
+
+    Args:
+        start: First day (inclusive); from the beginning when omitted
+        end: Last day (inclusive); up to today when omitted
+        isp_ids: Restrict to these ISP accounts
+
+    Returns:
+        {(isp_id, date, package_type): {field: value}}
+    """
+    billed = Billing.objects.annotate(day=TruncDate('created_at'))
+    paid = Payment.objects.annotate(day=TruncDate('created_at'))
+    if start:
+        billed, paid = billed.filter(day__gte=start), paid.filter(day__gte=start)
+    if end:
+        billed, paid = billed.filter(day__lte=end), paid.filter(day__lte=end)
+    if isp_ids is not None:
+        isp_ids = list(isp_ids)
+        billed, paid = billed.filter(user__in=isp_ids), paid.filter(billing__user__in=isp_ids)
+
+    rows = defaultdict(lambda: dict.fromkeys(AMOUNTS, 0))
+    for row in billed.values('user', 'day', 'package_type').annotate(
+            amount=Sum('package_price'), count=Count('id')).order_by():
+        values = rows[(row['user'], row['day'], row['package_type'])]
+        values['billed_amount'], values['billed_count'] = row['amount'], row['count']
+    for row in paid.values('billing__user', 'day', 'billing__package_type').annotate(
+            amount=Sum('package_price'), count=Count('id')).order_by():
+        values = rows[(row['billing__user'], row['day'], row['billing__package_type'])]
+        values['paid_amount'], values['paid_count'] = row['amount'], row['count']
+    return rows
+
+
+def rebuild(start: datetime.date = None, end: datetime.date = None, isp_ids: Iterable[int] = None) -> int:
+    """
+    Replace the rollup rows of a date range with values computed from the raw rows
+
+    Running it twice gives the same result. Returns the number of rows written.
+    """
+    isp_ids = list(isp_ids) if isp_ids is not None else None
+    with transaction.atomic():
+        stale = DailyRevenue.objects.all()
+        if start:
+            stale = stale.filter(date__gte=start)
+        if end:
+            stale = stale.filter(date__lte=end)
+        if isp_ids is not None:
+            stale = stale.filter(isp__in=isp_ids)
+        stale.delete()
+
+        rows = [
+            DailyRevenue(isp_id=isp_id, date=day, package_type=package_type or '', **values)
+            for (isp_id, day, package_type), values in aggregate(start, end, isp_ids).items()
+        ]
+        DailyRevenue.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _billing_key(billing_id: Optional[int], instance: Payment = None) -> tuple:
+    billing = instance._state.fields_cache.get('billing') if instance is not None else None
+    if billing is not None and billing.pk == billing_id:
+        return billing.user_id, billing.package_type
+    return Billing.objects.filter(pk=billing_id).values_list('user_id', 'package_type').first() or (None, '')
+
+
+def _add_payment(billing_id, day, amount, count, instance=None):
+    isp_id, package_type = _billing_key(billing_id, instance)
+    add(isp_id, day, package_type, paid_amount=amount, paid_count=count)
+
+
+def _day(value) -> Optional[datetime.date]:
+    return timezone.localdate(value) if value else None
+
+
+@receiver(post_init, sender=Billing)
+def _billing_snapshot(sender, instance, **kwargs):
+    d = instance.__dict__
+    instance._revenue = (d.get('user_id'), _day(d.get('created_at')), d.get('package_type'), d.get('package_price'))
+
+
+@receiver(post_init, sender=Payment)
+def _payment_snapshot(sender, instance, **kwargs):
+    d = instance.__dict__
+    instance._revenue = (d.get('billing_id'), _day(d.get('created_at')), d.get('package_price'))
+
+
+@receiver(post_save, sender=Billing)
+def _billing_saved(sender, instance, created, **kwargs):
+    current = (instance.user_id, _day(instance.created_at), instance.package_type, Decimal(instance.package_price))
+    if not created and instance._revenue == current:
+        return
+    if not created:
+        isp_id, day, package_type, amount = instance._revenue
+        add(isp_id, day, package_type, billed_amount=-amount, billed_count=-1)
+    isp_id, day, package_type, amount = current
+    add(isp_id, day, package_type, billed_amount=amount, billed_count=1)
+    instance._revenue = current
+
+
+@receiver(post_delete, sender=Billing)
+def _billing_deleted(sender, instance, **kwargs):
+    isp_id, day, package_type, amount = instance._revenue
+    if amount is not None:
+        add(isp_id, day, package_type, billed_amount=-amount, billed_count=-1)
+
+
+@receiver(post_save, sender=Payment)
+def _payment_saved(sender, instance, created, **kwargs):
+    current = (instance.billing_id, _day(instance.created_at), Decimal(instance.package_price))
+    if not created and instance._revenue == current:
+        return
+    if not created:
+        billing_id, day, amount = instance._revenue
+        _add_payment(billing_id, day, -amount, -1)
+    billing_id, day, amount = current
+    _add_payment(billing_id, day, amount, 1, instance)
+    instance._revenue = current
+
+
+@receiver(post_delete, sender=Payment)
+def _payment_deleted(sender, instance, **kwargs):
+    billing_id, day, amount = instance._revenue
+    if amount is not None:
+        _add_payment(billing_id, day, -amount, -1, instance)
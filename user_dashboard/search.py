@@ -0,0 +1,244 @@
+"""
+Search for the client, package and router lists
+
+Searches run against normalized columns (see SearchIndexed in models) instead
+of icontains scans over the raw fields:
+
+* prefix (default): the term is turned into a range on the normalized name
+  (and phone digits for clients), which any database answers from the
+  B-tree index.
+* fulltext: word-prefix matching through the SQLite FTS5 tables or MySQL
+  FULLTEXT indexes created by migration 0012, so "kamau" also finds
+  "John Kamau". Enabled with SEARCH_BACKEND = 'fulltext'; models whose index
+  is missing fall back to prefix.
+
+With SEARCH_SUBSTRING on, prefix searches also match substrings of the
+normalized columns, in the same query, and rank prefix matches first
+(search_rank 0, substring-only matches 1). Only PostgreSQL has an index for
+that (the pg_trgm trigram indexes from the same migration), so it is on by
+default there and off elsewhere, where it would scan every row of the ISP on
+each keystroke. Paginated lists re-order by date (keyset_page), which drops
+the ranking but keeps the same rows.
+
+The SQLite FTS5 tables are kept current by triggers. SQLite migrations that
+rebuild a searched table (most AlterField/AddConstraint operations) drop
+those triggers and must call create_fulltext_index() again afterwards.
+
+    clients = search(Client.objects.filter(isp=user), "0712 34")
+"""
+from dataclasses import dataclass
+from functools import reduce
+from operator import or_
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
+
+from user_dashboard.models import Client, Package, Router, normalize_text, normalize_phone
+
+# Shortest digit run treated as a phone number
+MIN_PHONE_DIGITS = 3
+
+
+@dataclass(frozen=True)
+class SearchSpec:
+    # Normalized name columns, matched by prefix
+    text_columns: Tuple[str, ...]
+    # Normalized phone column, matched by prefix on digit terms
+    phone_column: str = None
+    # Raw columns also matched by prefix (case sensitive)
+    raw_prefix_columns: Tuple[str, ...] = ()
+    # Raw columns only matched in the substring fallback
+    fallback_columns: Tuple[str, ...] = ()
+
+
+SPECS: Dict[type, SearchSpec] = {
+    Client: SearchSpec(text_columns=('search_name',), phone_column='search_phone'),
+    Package: SearchSpec(text_columns=('search_name',), fallback_columns=('download_speed',)),
+    Router: SearchSpec(text_columns=('search_name',), raw_prefix_columns=('ip_address',),
+                       fallback_columns=('location',)),
+}
+
+
+def fulltext_table(model) -> str:
+    return f'{model._meta.db_table}_fts'
+
+
+def search(queryset: QuerySet, term: str, substring: bool = None) -> QuerySet:
+    """
+    Filter a Client, Package or Router queryset by a free-text term
+
+    Args:
+        queryset: Already scoped queryset (e.g. the ISP's clients)
+        term: Name, phone or IP fragment as typed by the user
+        substring: Also match substrings in prefix searches; SEARCH_SUBSTRING when omitted
+
+    Returns:
+        The filtered queryset, prefix matches first; unchanged for a blank term
+    """
+    term = (term or '').strip()
+    if not term:
+        return queryset
+
+    spec = SPECS[queryset.model]
+    if getattr(settings, 'SEARCH_BACKEND', 'prefix') == 'fulltext' and _fulltext_available(queryset.model):
+        condition = _fulltext_q(queryset.model, spec, term)
+        if condition is not None:
+            return queryset.filter(condition)
+
+    prefix = _prefix_q(spec, term)
+    if substring is None:
+        substring = substring_enabled()
+    if not substring:
+        return queryset.filter(prefix)
+    return queryset.filter(prefix | _substring_q(spec, term)).annotate(
+        search_rank=Case(When(prefix, then=Value(0)), default=Value(1), output_field=IntegerField())
+    ).order_by('search_rank')
+
+
+def substring_enabled() -> bool:
+    enabled = str(getattr(settings, 'SEARCH_SUBSTRING', 'auto')).lower()
+    if enabled == 'auto':
+        # Only PostgreSQL has the trigram indexes that serve '%term%'
+        return connection.vendor == 'postgresql'
+    return enabled in ('on', 'true', '1')
+
+
+def _prefix_range(column: str, prefix: str) -> Q:
+    # column >= 'abc' AND column < 'abd' is an index range scan on every backend
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{column}__gte': prefix, f'{column}__lt': upper})
+
+
+def _phone_term(spec: SearchSpec, term: str) -> str:
+    digits = normalize_phone(term)
+    # Only terms made of digits and phone punctuation are phone numbers
+    if spec.phone_column and len(digits) >= MIN_PHONE_DIGITS and not any(c.isalpha() for c in term):
+        return digits
+    return ''
+
+
+def _prefix_q(spec: SearchSpec, term: str) -> Q:
+    text = normalize_text(term)
+    conditions = [_prefix_range(column, text) for column in spec.text_columns]
+    conditions += [Q(**{f'{column}__startswith': term}) for column in spec.raw_prefix_columns]
+    phone = _phone_term(spec, term)
+    if phone:
+        conditions.append(_prefix_range(spec.phone_column, phone))
+    return reduce(or_, conditions)
+
+
+def _substring_q(spec: SearchSpec, term: str) -> Q:
+    text = normalize_text(term)
+    conditions = [Q(**{f'{column}__contains': text}) for column in spec.text_columns]
+    conditions += [Q(**{f'{column}__icontains': term}) for column in spec.fallback_columns]
+    phone = _phone_term(spec, term)
+    if phone:
+        conditions.append(Q(**{f'{spec.phone_column}__contains': phone}))
+    return reduce(or_, conditions)
+
+
+_fulltext_tables = None
+
+
+def _fulltext_available(model) -> bool:
+    global _fulltext_tables
+    if connection.vendor == 'mysql':
+        return True
+    if connection.vendor != 'sqlite':
+        return False
+    if _fulltext_tables is None:
+        # FTS5 may be missing from the SQLite build, in which case the migration skipped the tables
+        _fulltext_tables = set(connection.introspection.table_names())
+    return fulltext_table(model) in _fulltext_tables
+
+
+def _fulltext_q(model, spec: SearchSpec, term: str):
+    """Word-prefix condition, or None when the term has no searchable words"""
+    phone = _phone_term(spec, term)
+    words = [''.join(c for c in word if c.isalnum()) for word in ([phone] if phone else normalize_text(term).split())]
+    words = [word for word in words if word]
+    if not words:
+        return None
+    columns = list(spec.text_columns) + ([spec.phone_column] if spec.phone_column else [])
+
+    if connection.vendor == 'sqlite':
+        # Every word must start a word of the row: "john"* "kam"*
+        query = ' '.join(f'"{word}"*' for word in words)
+        sql = f'"{model._meta.db_table}"."id" IN (SELECT rowid FROM "{fulltext_table(model)}" ' \
+              f'WHERE "{fulltext_table(model)}" MATCH %s)'
+    else:
+        query = ' '.join(f'+{word}*' for word in words)
+        sql = f'MATCH ({", ".join(f"`{c}`" for c in columns)}) AGAINST (%s IN BOOLEAN MODE)'
+
+    condition = Q(id__in=model.objects.extra(where=[sql], params=[query]).values('id'))
+    for column in spec.raw_prefix_columns:
+        condition |= Q(**{f'{column}__startswith': term})
+    return condition
+
+
+def create_fulltext_index(schema_editor, table: str, columns: List[str]) -> None:
+    """
+    Create the word-prefix index of a table for the current database (used by migrations)
+
+    SQLite: FTS5 table over the columns plus sync triggers, skipped when FTS5 is
+    not compiled in. MySQL: FULLTEXT index. PostgreSQL: pg_trgm GIN index per
+    column, serving the substring fallback.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _create_fts5(schema_editor, table, columns)
+    elif vendor == 'mysql':
+        schema_editor.execute(f'CREATE FULLTEXT INDEX {table}_fts ON {table} ({", ".join(columns)})')
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in columns:
+            schema_editor.execute(f'CREATE INDEX {table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)')
+
+
+def drop_fulltext_index(schema_editor, table: str, columns: List[str]) -> None:
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+    elif vendor == 'mysql':
+        schema_editor.execute(f'DROP INDEX {table}_fts ON {table}')
+    elif vendor == 'postgresql':
+        for column in columns:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+def _create_fts5(schema_editor, table: str, columns: List[str]) -> None:
+    fts = f'{table}_fts'
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+
+    # Recreating after a table rebuild: only the triggers are missing
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id')"
+        )
+    except DatabaseError:
+        # SQLite built without FTS5; search() stays on prefix search
+        return
+
+    # External content table: every row change is mirrored into the index
+    schema_editor.execute(
+        f'CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END'
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END"
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f'INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END'
+    )
+    schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
@@ -0,0 +1,153 @@
+"""
+Declarative JSON serializers for Router, Package and Client
+
+Each serializer declares the columns and relations it reads, so prepare() can
+load a whole page with select_related()/only() in a single query instead of
+one query per row and relation:
+
+    serializer = ClientSerializer(compact=True)
+    data = serializer.many(serializer.prepare(Client.objects.filter(isp=user)))
+"""
+from typing import Dict, Iterable, List
+
+from django.db.models import QuerySet
+
+from user_dashboard.models import Router, Package, Client
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _day(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+
+class Serializer:
+    model = None
+    # Output key -> attribute name, or (attribute name, formatter)
+    fields: Dict = {}
+    # Output key -> (relation attribute, serializer class)
+    nested: Dict = {}
+    # Output keys left out in compact mode
+    compact_exclude: tuple = ()
+
+    def __init__(self, compact: bool = False):
+        self.compact = compact
+
+    def _fields(self):
+        for key, source in self.fields.items():
+            if self.compact and key in self.compact_exclude:
+                continue
+            attribute, formatter = source if isinstance(source, tuple) else (source, None)
+            yield key, attribute, formatter
+
+    def _nested(self):
+        for key, (relation, serializer) in self.nested.items():
+            if not (self.compact and key in self.compact_exclude):
+                yield key, relation, serializer(compact=self.compact)
+
+    def columns(self, prefix: str = '') -> List[str]:
+        """Model fields read by this serializer, as only() lookups"""
+        columns = [prefix + self.model._meta.get_field(attribute).name for _, attribute, _ in self._fields()]
+        for _, relation, serializer in self._nested():
+            columns.append(prefix + relation)
+            columns += serializer.columns(f'{prefix}{relation}__')
+        return columns
+
+    def relations(self, prefix: str = '') -> List[str]:
+        """Forward relations to follow, as select_related() lookups"""
+        relations = []
+        for _, relation, serializer in self._nested():
+            relations.append(prefix + relation)
+            relations += serializer.relations(f'{prefix}{relation}__')
+        return relations
+
+    def prepare(self, queryset: QuerySet) -> QuerySet:
+        """Restrict a queryset to one query that loads everything to_dict() reads"""
+        return queryset.select_related(*self.relations()).only(*self.columns())
+
+    def to_dict(self, obj) -> Dict:
+        data = {}
+        for key, attribute, formatter in self._fields():
+            value = getattr(obj, attribute)
+            data[key] = formatter(value) if formatter else value
+        for key, relation, serializer in self._nested():
+            related = getattr(obj, relation)
+            data[key] = serializer.to_dict(related) if related is not None else None
+        return data
+
+    def many(self, objects: Iterable) -> List[Dict]:
+        return [self.to_dict(obj) for obj in objects]
+
+
+class RouterSerializer(Serializer):
+    model = Router
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'password': 'password',
+        'location': 'location',
+        'username': 'username',
+        'ip_address': 'ip_address',
+        'identity': 'identity',
+    }
+    compact_exclude = ('username', 'password')
+
+
+class PackageSerializer(Serializer):
+    model = Package
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'duration': 'duration',
+        'price': 'price',
+        'upload_speed': 'upload_speed',
+        'download_speed': 'download_speed',
+        'speed': 'download_speed',
+        'type': 'type',
+        'created': ('created_at', _iso),
+    }
+    nested = {'router': ('router', RouterSerializer)}
+
+
+class ClientRouterSerializer(RouterSerializer):
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'username': 'username',
+        'password': 'password',
+        'location': 'location',
+    }
+
+
+class ClientPackageSerializer(Serializer):
+    model = Package
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'download_speed': 'download_speed',
+        'upload_speed': 'upload_speed',
+        'duration': 'duration',
+        'price': 'price',
+        'type': 'type',
+        'created_at': ('created_at', _iso),
+    }
+    nested = {'router': ('router', ClientRouterSerializer)}
+
+
+class ClientSerializer(Serializer):
+    model = Client
+    fields = {
+        'id': 'id',
+        'full_name': 'full_name',
+        'phone': 'phone',
+        'address': 'address',
+        'created_at': ('created_at', _iso),
+        'due': ('due', _iso),
+        'package_start': ('package_start', _day),
+        'router_username': 'router_username',
+        'router_password': 'router_password',
+        'isp': 'isp_id',
+    }
+    nested = {'package': ('package', ClientPackageSerializer)}
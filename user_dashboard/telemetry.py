@@ -0,0 +1,283 @@
+"""
+Router telemetry: background collector and compact time-series store
+
+The collector (manage.py collect_telemetry) polls every active router on a
+fixed interval through a bounded thread pool and records:
+
+* cpu_load (%), memory_used (bytes) from /system/resource
+* active_sessions from /ppp/active
+* rx_bps:<port>, tx_bps:<port> computed from the ethernet byte counters
+
+Samples go into an in-memory ring buffer per (router, metric), backed by
+array('d') so a series costs 16 bytes per point. Buffers are flushed in
+batches to a separate SQLite file (TELEMETRY_DB) with three tiers: raw
+points, 5 minute and 1 hour buckets. Buckets keep sum and count, so
+flushes merge into them with an upsert and no re-reads. Each tier has a
+retention period and is pruned after flushes.
+
+The dashboard reads series with TimeSeriesStore.query(), which picks the
+finest tier that both still holds the start of the requested range and
+returns at most MAX_POINTS points for it (the coarsest tier otherwise):
+
+    store = TimeSeriesStore(settings.TELEMETRY_DB)
+    series = store.query(router.id, 'cpu_load', start=time.time() - 86400)
+"""
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+RAW = 0
+# Tier (bucket seconds; 0 = raw) -> retention in seconds
+TIERS = {
+    RAW: 2 * 86400,
+    300: 14 * 86400,
+    3600: 400 * 86400,
+}
+# Largest number of points a query should return before a coarser tier is used
+MAX_POINTS = 1000
+RING_CAPACITY = 512
+
+
+class RingBuffer:
+    """Fixed-size (timestamp, value) series; the oldest points are overwritten when full"""
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.end = 0
+        self.size = 0
+        # Points appended since the last flush
+        self.pending = 0
+
+    def append(self, ts: float, value: float) -> None:
+        self.times[self.end] = ts
+        self.values[self.end] = value
+        self.end = (self.end + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.pending = min(self.pending + 1, self.capacity)
+
+    def last(self, count: int) -> List[Tuple[float, float]]:
+        """The newest ``count`` points, oldest first"""
+        count = min(count, self.size)
+        start = (self.end - count) % self.capacity
+        return [(self.times[(start + i) % self.capacity], self.values[(start + i) % self.capacity])
+                for i in range(count)]
+
+    def take_pending(self) -> List[Tuple[float, float]]:
+        points = self.last(self.pending)
+        self.pending = 0
+        return points
+
+
+class TimeSeriesStore:
+    """SQLite-backed series per (router, metric) with raw, 5m and 1h tiers"""
+
+    def __init__(self, path: str = None, ring_capacity: int = RING_CAPACITY):
+        self.path = path or settings.TELEMETRY_DB
+        self.ring_capacity = ring_capacity
+        self.buffers: Dict[Tuple[int, str], RingBuffer] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            # WAL lets the dashboard read while the collector writes
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS points ('
+                'router_id INTEGER NOT NULL, metric TEXT NOT NULL, tier INTEGER NOT NULL, ts INTEGER NOT NULL, '
+                'sum REAL NOT NULL, count INTEGER NOT NULL, '
+                'PRIMARY KEY (router_id, metric, tier, ts)) WITHOUT ROWID'
+            )
+            self._local.db = db
+        return db
+
+    def record(self, router_id: int, metric: str, ts: float, value: float) -> None:
+        with self._lock:
+            buffer = self.buffers.get((router_id, metric))
+            if buffer is None:
+                buffer = self.buffers[(router_id, metric)] = RingBuffer(self.ring_capacity)
+            buffer.append(ts, value)
+
+    def flush(self) -> int:
+        """Write buffered points to every tier; returns the number of raw points written"""
+        with self._lock:
+            pending = [(key, buffer.take_pending()) for key, buffer in self.buffers.items() if buffer.pending]
+
+        buckets: Dict[tuple, List[float]] = {}
+        rows = []
+        for (router_id, metric), points in pending:
+            for ts, value in points:
+                rows.append((router_id, metric, RAW, int(ts), value, 1))
+                for tier in TIERS:
+                    if tier != RAW:
+                        bucket = buckets.setdefault((router_id, metric, tier, int(ts) // tier * tier), [0.0, 0])
+                        bucket[0] += value
+                        bucket[1] += 1
+        rows += [(*key, total, count) for key, (total, count) in buckets.items()]
+
+        db = self._db()
+        with db:
+            db.executemany(
+                'INSERT INTO points (router_id, metric, tier, ts, sum, count) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (router_id, metric, tier, ts) DO UPDATE '
+                'SET sum = sum + excluded.sum, count = count + excluded.count',
+                rows
+            )
+        return sum(len(points) for _, points in pending)
+
+    def prune(self, now: float = None) -> None:
+        now = now or time.time()
+        db = self._db()
+        with db:
+            for tier, retention in TIERS.items():
+                db.execute('DELETE FROM points WHERE tier = ? AND ts < ?', (tier, int(now - retention)))
+
+    def query(self, router_id: int, metric: str, start: float, end: float = None,
+              tier: Optional[int] = None) -> Dict:
+        """
+        Read a series
+
+        Args:
+            router_id: Router id
+            metric: Metric name, e.g. "cpu_load" or "rx_bps:ether1"
+            start: Range start (unix time)
+            end: Range end (unix time); now when omitted
+            tier: Force a tier (0, 300 or 3600); chosen from the range when omitted
+
+        Returns:
+            {'tier': seconds per point (0 = raw), 'points': [[ts, value], ...]}
+        """
+        end = end or time.time()
+        if tier is None:
+            tier = self.pick_tier(start, end)
+        rows = self._db().execute(
+            'SELECT ts, sum / count FROM points WHERE router_id = ? AND metric = ? AND tier = ? '
+            'AND ts >= ? AND ts <= ? ORDER BY ts',
+            (router_id, metric, tier, int(start) // (tier or 1) * (tier or 1), int(end))
+        ).fetchall()
+        return {'tier': tier, 'points': [[ts, value] for ts, value in rows]}
+
+    def metrics(self, router_id: int) -> List[str]:
+        """Metric names recorded for a router within the raw retention period"""
+        rows = self._db().execute(
+            'SELECT DISTINCT metric FROM points WHERE router_id = ? AND tier = ? AND ts >= ?',
+            (router_id, RAW, int(time.time() - TIERS[RAW]))
+        ).fetchall()
+        return sorted(metric for metric, in rows)
+
+    @staticmethod
+    def pick_tier(start: float, end: float) -> int:
+        interval = settings.TELEMETRY_INTERVAL
+        for tier in sorted(TIERS):
+            if (end - start) / max(tier, interval) <= MAX_POINTS and start >= time.time() - TIERS[tier]:
+                return tier
+        return max(TIERS)
+
+
+class TelemetryCollector:
+    """Polls routers and feeds a TimeSeriesStore"""
+
+    def __init__(self, store: TimeSeriesStore, interval: float = None, concurrency: int = 8):
+        """
+        Args:
+            store: Where samples are recorded
+            interval: Seconds between polls of the same router
+            concurrency: Routers polled at the same time
+        """
+        self.store = store
+        self.interval = interval or settings.TELEMETRY_INTERVAL
+        self.concurrency = concurrency
+        # (router id, port, direction) -> (ts, byte counter) of the previous poll
+        self._counters: Dict[tuple, Tuple[float, int]] = {}
+
+    def run_forever(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception:
+                logger.exception("Telemetry poll failed")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def poll_once(self, routers: Iterable = None) -> int:
+        """Poll routers once (all active ones by default); returns how many answered"""
+        from user_dashboard.models import Router
+
+        close_old_connections()
+        routers = list(routers if routers is not None else
+                       Router.objects.filter(active=True).only('id', 'identity', 'username', 'password'))
+        answered = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='telemetry') as executor:
+            futures = {executor.submit(self.sample, router): router for router in routers}
+            for future in as_completed(futures):
+                router = futures[future]
+                try:
+                    ts, samples = future.result()
+                except Exception as e:
+                    logger.warning("Telemetry poll of router %s failed: %s", router.id, e)
+                    continue
+                answered += 1
+                for metric, value in samples:
+                    self.store.record(router.id, metric, ts, value)
+        self.store.flush()
+        self.store.prune()
+        return answered
+
+    def sample(self, router) -> Tuple[float, List[Tuple[str, float]]]:
+        """Read one router's metrics; runs on a pool thread"""
+        from ISP.settings import mikrotik_manager
+
+        mtk = mikrotik_manager.client(host=router.identity, username=router.username, password=router.password)
+        ts = time.time()
+        samples = []
+
+        resources = mtk.client.system.get_resources()
+        if not resources.success:
+            raise ConnectionError(resources.error_message or resources.error_code)
+        resource = (resources.data or [{}])[0]
+        samples.append(('cpu_load', float(resource.get('cpu-load', 0))))
+        if 'total-memory' in resource and 'free-memory' in resource:
+            samples.append(('memory_used', float(int(resource['total-memory']) - int(resource['free-memory']))))
+
+        sessions = mtk.customers.get_active_connections()
+        if sessions.success:
+            samples.append(('active_sessions', float(len(sessions.data or []))))
+
+        for port in mtk.network.list_ports():
+            for direction, counter in (('rx', port.rx_byte), ('tx', port.tx_byte)):
+                rate = self._rate((router.id, port.name, direction), ts, counter)
+                if rate is not None:
+                    samples.append((f'{direction}_bps:{port.name}', rate))
+        return ts, samples
+
+    def _rate(self, key: tuple, ts: float, counter: int) -> Optional[float]:
+        previous = self._counters.get(key)
+        self._counters[key] = (ts, counter)
+        if previous is None or ts <= previous[0] or counter < previous[1]:
+            # First sample, or the counter was reset by a reboot
+            return None
+        return (counter - previous[1]) * 8 / (ts - previous[0])
+
+
+_store = None
+
+
+def get_store() -> TimeSeriesStore:
+    """Process-wide store for readers"""
+    global _store
+    if _store is None:
+        _store = TimeSeriesStore()
+    return _store
@@ -85,3 +85,284 @@
 #         router.delete()
 #         return JsonResponse({'message': 'Router deleted successfully.'})
 #     return HttpResponseBadRequest()
+
+
+import json
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.utils import timezone
+
+from user_dashboard import connections, intasend_client, payment_events, views
+from user_dashboard.fake_intasend import FakeIntaSend
+from user_dashboard.models import User, SystemUser, Router, Package, Client, ISPAccountPayment, PaymentEvent
+from user_dashboard.pagination import keyset_page
+from user_dashboard.serializers import ClientSerializer, PackageSerializer
+
+
+class SerializerQueryCountTest(TestCase):
+    """A page of any size is serialized with a single query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.isp = User.objects.create(username='isp')
+        company = SystemUser.objects.create(name='ISP', address='-', phone='0700000000',
+                                            email='isp@example.com', user=cls.isp)
+        packages = []
+        for r in range(3):
+            router = Router.objects.create(name=f'router-{r}', identity=f'router-{r}', secrete='s',
+                                           ip_address='10.0.0.1', username='admin', password='pass',
+                                           isp=company)
+            for kind in ('hotspot', 'pppoe'):
+                packages.append(Package.objects.create(name=f'{kind}-{r}', price='1000', type=kind,
+                                                       router=router))
+        for i in range(60):
+            Client.objects.create(package=packages[i % len(packages)], full_name=f'Client {i}',
+                                  phone=f'07{i:08d}', isp=cls.isp, router_username=f'user{i}',
+                                  router_password='secret', due=timezone.now() + timedelta(days=30))
+
+    def test_client_page_query_count(self):
+        for page_size in (1, 10, 50):
+            serializer = ClientSerializer()
+            with self.assertNumQueries(1):
+                rows, _, _ = keyset_page(serializer.prepare(Client.objects.filter(isp=self.isp)),
+                                         page_size=page_size)
+                data = serializer.many(rows)
+            self.assertEqual(len(data), page_size)
+            self.assertEqual(data[0]['package']['router']['password'], 'pass')
+
+    def test_package_page_query_count(self):
+        serializer = PackageSerializer()
+        with self.assertNumQueries(1):
+            rows, _, _ = keyset_page(serializer.prepare(Package.objects.filter(router__isp__user=self.isp)),
+                                     page_size=6)
+            data = serializer.many(rows)
+        self.assertEqual({pkg['router']['name'] for pkg in data}, {'router-0', 'router-1', 'router-2'})
+
+    def test_compact_leaves_out_router_credentials(self):
+        serializer = ClientSerializer(compact=True)
+        with self.assertNumQueries(1):
+            data = serializer.many(serializer.prepare(Client.objects.filter(isp=self.isp))[:10])
+        router = data[0]['package']['router']
+        self.assertNotIn('password', router)
+        self.assertNotIn('username', router)
+
+
+def make_account(username='isp'):
+    user = User.objects.create(username=username + str(User.objects.count()))
+    return SystemUser.objects.create(name='ISP', address='x', phone='0700', email='isp@example.com', user=user)
+
+
+def make_router(identity='isp_MTK1', **fields):
+    account = make_account(identity.split('_')[0])
+    return Router.objects.create(name=identity.split('_')[-1], identity=identity, secrete='task', username='admin',
+                                 password='secret', ip_address='0.0.0.0', isp=account,
+                                 **{'provision_status': 'issued', **fields})
+
+
+class MarkConnectedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_marks_only_vpn_addresses(self):
+        router = make_router('isp_MTK1')
+        other = make_router('isp_MTK2')
+
+        changed = connections.mark_connected({'isp_MTK1': '10.8.0.6\n', 'isp_MTK2': 'not found', 'isp_gone': '10.8.0.9'})
+
+        self.assertEqual(changed, 1)
+        router.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((router.provision_status, router.ip_address), ('connected', '10.8.0.6'))
+        self.assertEqual(other.provision_status, 'issued')
+        # Already connected with the same address: nothing to do
+        self.assertEqual(connections.mark_connected({'isp_MTK1': '10.8.0.6'}), 0)
+
+
+@override_settings(VPN_WEBHOOK_SECRET='s3cret')
+class RouterConnectedWebhookTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = make_router('isp_MTK1')
+        self.factory = RequestFactory()
+
+    def post(self, body, **headers):
+        request = self.factory.post('/api/routers/connected/', data=json.dumps(body),
+                                    content_type='application/json', headers=headers)
+        return views.router_connected_webhook(request)
+
+    def test_rejects_missing_or_wrong_secret(self):
+        for headers in ({}, {'X-Webhook-Secret': 'wrong'}):
+            response = self.post({'identity': 'isp_MTK1', 'ip': '10.8.0.6'}, **headers)
+            self.assertEqual(response.status_code, 403)
+        self.router.refresh_from_db()
+        self.assertEqual(self.router.provision_status, 'issued')
+
+    @override_settings(VPN_WEBHOOK_SECRET='')
+    def test_disabled_without_a_secret(self):
+        response = self.post({'identity': 'isp_MTK1', 'ip': '10.8.0.6'}, **{'X-Webhook-Secret': ''})
+        self.assertEqual(response.status_code, 403)
+
+    def test_marks_routers_connected(self):
+        response = self.post({'clients': [{'identity': 'isp_MTK1', 'ip': '10.8.0.6'}]},
+                             **{'X-Webhook-Secret': 's3cret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'ok': True, 'updated': 1})
+        self.router.refresh_from_db()
+        self.assertEqual(self.router.provision_status, 'connected')
+
+    def test_rejects_malformed_payload(self):
+        response = self.post({'clients': [{'ip': '10.8.0.6'}]}, **{'X-Webhook-Secret': 's3cret'})
+        self.assertEqual(response.status_code, 400)
+
+
+def make_payment(invoice_id='INV-1', **fields):
+    return ISPAccountPayment.objects.create(user=make_account(), amount=500, payment_method='M-PESA',
+                                            invoice_id=invoice_id, **fields)
+
+
+@override_settings(PAYMENT_EVENT_WORKERS=0)
+class PaymentEventTest(TestCase):
+    def ingest(self, invoice_id, state, updated_at, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return payment_events.ingest({'api_ref': invoice_id, 'state': state, 'updated_at': updated_at, **fields})
+
+    def test_duplicate_delivery_is_applied_once(self):
+        payment = make_payment()
+        self.assertIsNotNone(self.ingest('INV-1', 'PROCESSING', 't1'))
+        self.assertIsNone(self.ingest('INV-1', 'PROCESSING', 't1'))
+
+        self.assertEqual(payment_events.drain(), {'applied': 1})
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'processing')
+
+    def test_late_pending_does_not_overwrite_completed(self):
+        payment = make_payment()
+        self.ingest('INV-1', 'COMPLETED', 't2', mpesa_reference='QK1')
+        late = self.ingest('INV-1', 'PENDING', 't1')
+
+        self.assertEqual(payment_events.drain(), {'applied': 1, 'ignored': 1})
+        late.refresh_from_db()
+        self.assertEqual(late.error, 'Payment is already completed')
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.mpesa_reference), ('completed', 'QK1'))
+        self.assertIsNotNone(payment.payment_expiry)
+
+    def test_event_waits_for_its_payment(self):
+        event = self.ingest('INV-1', 'COMPLETED', 't1')
+
+        self.assertEqual(payment_events.drain(), {'queued': 1})
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.error), ('queued', 'Payment record not found'))
+
+        payment = make_payment()
+        self.assertEqual(payment_events.drain(), {'applied': 1})
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+    def test_event_fails_when_its_payment_never_appears(self):
+        event = self.ingest('INV-1', 'COMPLETED', 't1')
+        PaymentEvent.objects.filter(pk=event.pk).update(received_at=timezone.now() - payment_events.PAYMENT_WAIT)
+
+        self.assertEqual(payment_events.drain(), {'failed': 1})
+        self.assertEqual(payment_events.drain(), {})
+
+
+class FakeGatewayMixin:
+    """Runs initiate_payment against a local FakeIntaSend"""
+
+    def setUp(self):
+        super().setUp()
+        self.gateway = FakeIntaSend().start()
+        self.addCleanup(self.gateway.stop)
+        settings_override = override_settings(INTASEND_BASE_URL=self.gateway.url, INTASEND_TIMEOUT=0.5,
+                                             INTASEND_PUBLISHABLE_KEY='pk', INTASEND_SECRET_KEY='sk')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # A client (and breaker) of its own per test
+        intasend_client._client = None
+        self.addCleanup(setattr, intasend_client, '_client', None)
+        self.owner = User.objects.create(username='owner', isp=make_account())
+
+    def initiate(self, **data):
+        request = RequestFactory().post('/api/initiate-payment/', data=json.dumps({'amount': 500, **data}),
+                                        content_type='application/json')
+        request.user = self.owner
+        return views.initiate_payment(request)
+
+
+class InitiatePaymentTest(FakeGatewayMixin, TestCase):
+    def test_sync_checkout(self):
+        response = self.initiate(payment_method='M-PESA', **{'async': False})
+
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.content)
+        payment = ISPAccountPayment.objects.get(invoice_id=body['invoice_id'])
+        self.assertEqual(self.gateway.checkouts[0]['api_ref'], payment.invoice_id)
+        self.assertEqual((payment.checkout_id, payment.payment_url), (body['checkout_id'], body['payment_url']))
+        self.assertEqual(payment.checkout_id, self.gateway.checkouts[0]['id'])
+
+    def test_gateway_timeout_fails_the_payment(self):
+        self.gateway.delay = 1
+
+        response = self.initiate(payment_method='M-PESA', **{'async': False})
+
+        self.assertEqual(response.status_code, 503)
+        payment = ISPAccountPayment.objects.get()
+        self.assertEqual((payment.status, payment.failed_code), ('failed', 'checkout'))
+        self.assertIsNone(payment.checkout_id)
+
+
+class AsyncInitiatePaymentTest(FakeGatewayMixin, TransactionTestCase):
+    def test_async_checkout_completes_in_the_background(self):
+        response = self.initiate(payment_method='M-PESA', **{'async': True})
+
+        self.assertEqual(response.status_code, 202)
+        body = json.loads(response.content)
+        self.assertEqual(body['status'], 'pending')
+        self.assertTrue(body['status_url'].endswith(f"/{body['invoice_id']}/status/"))
+        # Wait for the background checkout
+        intasend_client._executor.shutdown(wait=True)
+        intasend_client._executor = None
+        payment = ISPAccountPayment.objects.get(invoice_id=body['invoice_id'])
+        self.assertEqual(payment.status, 'pending')
+        self.assertEqual(payment.checkout_id, self.gateway.checkouts[0]['id'])
+        self.assertEqual(payment.payment_url, self.gateway.checkouts[0]['url'])
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        self.gateway = FakeIntaSend(delay=0.5).start()
+        self.addCleanup(self.gateway.stop)
+        self.breaker = intasend_client.CircuitBreaker(failures=2, reset_after=0.3)
+        self.client = intasend_client.IntaSendClient('sk', 'pk', base_url=self.gateway.url, timeout=0.1,
+                                                     breaker=self.breaker)
+
+    def checkout(self):
+        return self.client.checkout(email='isp@example.com', amount=500, api_ref='INV-1')
+
+    def test_opens_after_timeouts_and_recovers_through_a_trial(self):
+        for _ in range(2):
+            with self.assertRaises(intasend_client.GatewayError):
+                self.checkout()
+        self.assertEqual(self.breaker.state, 'open')
+        # Open: fails at once without calling the gateway
+        started = time.monotonic()
+        with self.assertRaises(intasend_client.GatewayUnavailable):
+            self.checkout()
+        self.assertLess(time.monotonic() - started, 0.1)
+
+        time.sleep(0.3)
+        self.assertEqual(self.breaker.state, 'half-open')
+        # A failed trial opens the circuit again at once
+        with self.assertRaises(intasend_client.GatewayError):
+            self.checkout()
+        self.assertEqual(self.breaker.state, 'open')
+
+        time.sleep(0.3)
+        self.gateway.delay = 0
+        self.assertEqual(self.checkout()['api_ref'], 'INV-1')
+        self.assertEqual(self.breaker.state, 'closed')
@@ -1,32 +1,41 @@
 from datetime import timedelta
 import random
 import string
-from decouple import config
 import requests
-import routeros_api as r_os
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.paginator import Paginator
-from django.db import transaction
+from django.db import IntegrityError, transaction, connection
 from django.db.models import Q
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.views import View
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 import json, re
-from intasend import APIService
 from ISP import settings
+from mtk_command_api import api_pool
 from mtk_command_api.mtk import MikroManager
 from user_dashboard.helpers import router_to_dict, pkg_to_dict, user_to_dict, company_to_dict, client_to_dict, \
-    generate_invoice_number, transform_ports
-from user_dashboard.models import Router, Package, SystemUser, Client, Billing
-from user_dashboard.models import Router, Package, ISPProvider, Client, Billing ,ISPAccountPayment
+    generate_invoice_number, transform_ports, generate_password
+from user_dashboard.models import Router, Package, SystemUser, Client, Billing, ClientImport
+from user_dashboard.models import Router, Package, Client, Billing ,ISPAccountPayment
 from ISP.settings import mikrotik_manager
 import uuid
+import threading
+import time
+from user_dashboard import connections, intasend_client, payment_events, telemetry
+from user_dashboard.counters import get_counters
+from user_dashboard.response_cache import cached_response, isp_scope
+from user_dashboard.pagination import keyset_page, InvalidCursor
+from user_dashboard.serializers import PackageSerializer, ClientSerializer
+from user_dashboard.search import search as apply_search
+from user_dashboard.client_import import parse_rows, create_import, run_import, import_to_dict
+from user_dashboard.exports import EXPORTS, FORMATS as EXPORT_FORMATS, export_lines
 
 
 # Create your views here.
@@ -35,13 +44,6 @@ def home(request):
     return render(request, 'index.html')
 
 
-def generate_password(name: str) -> str:
-    # Generate 4 random alphanumeric characters
-    random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=5))
-    # Combine the name with the random suffix
-    return f"{name}_{random_suffix}"
-
-
 @api_view(["POST", "GET"])
 @ensure_csrf_cookie
 def set_csrf(request):
@@ -70,15 +72,6 @@ def initiate_payment(request):
             email = user.email
             phone_number = user.phone
 
-            # Initialize IntaSend service
-            publishable_key = config("INTASEND_PUBLISHABLE_KEY")
-            secret_key = config("INTASEND_SECRET_KEY")
-            service = APIService(
-                token=secret_key,
-                publishable_key=publishable_key,
-                test=True  # Set to False in production
-            )
-
             # Create a payment record in our system first
             payment = ISPAccountPayment.objects.create(
                 user=user,
@@ -88,9 +81,7 @@ def initiate_payment(request):
                 invoice_id=f"INV-{uuid.uuid4().hex[:8].upper()}",  # Generate unique invoice ID
                 status='pending'
             )
-
-            # Initiate payment with IntaSend
-            response = service.collect.checkout(
+            checkout = dict(
                 # phone_number=phone_number,
                 email=email,
                 amount=500,
@@ -101,6 +92,25 @@ def initiate_payment(request):
                 redirect_url="https://mksu.com"  # Replace with your actual redirect URL
             )
 
+            if data.get('async', settings.INTASEND_ASYNC_CHECKOUT):
+                # Answer now; the checkout completes on a background worker
+                intasend_client.start_checkout(payment, **checkout)
+                return JsonResponse({
+                    'status': 'pending',
+                    'invoice_id': payment.invoice_id,
+                    'status_url': reverse('payment_status', args=[payment.invoice_id]),
+                }, status=202)
+
+            # Initiate payment with IntaSend
+            try:
+                response = intasend_client.get_client().checkout(**checkout)
+            except intasend_client.GatewayError as e:
+                payment.status = 'failed'
+                payment.failed_reason = str(e)[:255]
+                payment.failed_code = 'checkout'
+                payment.save()
+                return JsonResponse({'status': 'error', 'message': str(e)}, status=503)
+
             # Update payment record with IntaSend checkout details
             payment.checkout_id = response.get('id')
             payment.payment_url = response.get('url')
@@ -121,81 +131,53 @@ def initiate_payment(request):
                 'message': str(e)
             }, status=400)
 
+
+def payment_status(request, invoice_id):
+    """State of an account payment started with initiate_payment"""
+    payment = get_object_or_404(ISPAccountPayment, invoice_id=invoice_id, user=request.user.isp)
+    return JsonResponse({
+        'invoice_id': payment.invoice_id,
+        'status': payment.status,
+        'payment_url': payment.payment_url,
+        'checkout_id': payment.checkout_id,
+        'failed_reason': payment.failed_reason,
+    })
+
 @csrf_exempt
 def intasend_webhook_view(request):
+    """
+    IntaSend payment webhook
+
+    Only stores the event; payment_events applies it in the background, once,
+    and in order per invoice.
+    """
     if request.method == "POST":
         try:
             data = json.loads(request.body)
-            print("IntaSend webhook received:", data)
-
-            # Handle challenge (if IntaSend sends a challenge parameter)
-            # if "challenge" in data:
-            #     return JsonResponse({"challenge": data["challenge"]})
-
-            # Process payment update
-            invoice_id = data.get("api_ref")
-            state = data.get("state")
-
-            # If no invoice ID in api_ref, use invoice_id from the webhook
-            print('here i am222 ',invoice_id,state)
-
-            if not invoice_id:
-                invoice_id = data.get("invoice_id")
-
-            # Try to find our payment record
-            try:
-                print('here i am ')
-                payment = ISPAccountPayment.objects.get(invoice_id=invoice_id)
-                print(payment.status,state)
-
-                # Update payment status based on webhook state
-                if state == "PENDING":
-                    payment.status = "pending"
-                elif state == "PROCESSING":
-                    payment.status = "processing"
-                elif state == "COMPLETED":
-                    payment.status = "completed"
-                    payment.payment_expiry = timezone.now() + timezone.timedelta(days=30)  # Assuming 1 hour expiry
-                elif state == "FAILED":
-                    payment.status = "failed"
-                    payment.failed_reason = data.get("failed_reason")
-                    payment.failed_code = data.get("failed_code")
-
-                # Update additional information
-                payment.mpesa_reference = data.get("mpesa_reference")
-                payment.save()
-
-                # Process additional business logic based on payment status
-                if payment.status == "completed":
-                    # Handle successful payment (e.g., activate service, send notification)
-                    pass
-
-                return JsonResponse({"status": "received", "payment_updated": True}, status=200)
-
-            except ISPAccountPayment.DoesNotExist:
-                return JsonResponse({"status": "received", "payment_updated": False,
-                                    "error": "Payment record not found"}, status=200)
-
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON"}, status=400)
-    else:
-        return JsonResponse({"error": "Invalid request method"}, status=405)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Invalid payload"}, status=400)
 
+        # Handle challenge (if IntaSend sends a challenge parameter)
+        # if "challenge" in data:
+        #     return JsonResponse({"challenge": data["challenge"]})
 
+        event = payment_events.ingest(data)
+        return JsonResponse({"status": "received", "queued": event is not None}, status=200)
+    else:
+        return JsonResponse({"error": "Invalid request method"}, status=405)
 
 
+@cached_response(isp_scope)
 def start_app(request):
     if request.method == "POST":
-        users = Client.objects.filter(isp=request.user.id).count()
-        pakgs = Package.objects.filter(Q(
-            router__isp__user=request.user.id
-        )).count()
-        routers = Router.objects.filter(isp__user=request.user.id).count()
+        counts = get_counters(request.user.id)
         return JsonResponse({
-            "users": users,
+            "users": counts.clients,
             "user": user_to_dict(request.user),
-            "packages": pakgs,
-            "routers": routers,
+            "packages": counts.packages,
+            "routers": counts.routers,
         }, safe=False)
 
 
@@ -208,7 +190,8 @@ def router_list(request):
     if request.method == "POST":
         # Get parameters from request
         load_type = request.POST.get("load_type", "all")
-        page = int(request.POST.get("page", 1))
+        cursor = request.POST.get("cursor")
+        page = int(request.POST.get("page", 1))  # Legacy offset paging, ignored when a cursor is sent
         search = request.POST.get("search", "")
         items_per_page = int(request.POST.get("per_page", 9))  # Allow customizable page size
 
@@ -226,25 +209,19 @@ def router_list(request):
             filtered_routers = user_router.all()
 
         # Apply search filter if provided
-        if search:
-            filtered_routers = filtered_routers.filter(
-                Q(name__icontains=search) |
-                Q(ip_address__icontains=search) |
-                Q(location__icontains=search)
-            )
+        filtered_routers = apply_search(filtered_routers, search)
 
         # Get counts for all tabs
-        all_count = user_router.count()
-        active_count = user_router.filter(active=True).count()
-        inactive_count = user_router.filter(active=False).count()
-
-        # Order by most recently created first
-        ordered_routers = filtered_routers
-        # ordered_routers = filtered_routers.order_by('-created_at')
+        counts = get_counters(request.user.id)
+        all_count = counts.routers
+        active_count = counts.routers_active
+        inactive_count = counts.routers_inactive
 
-        # Use Django's paginator for cleaner handling
-        paginator = Paginator(ordered_routers, items_per_page)
-        current_page = paginator.get_page(page)
+        # Most recently created first, continuing after the cursor
+        try:
+            current_page, next_cursor, has_more = keyset_page(filtered_routers, cursor, items_per_page, page)
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
 
         # Prepare the list of routers for the response
         routers_list = []
@@ -256,7 +233,7 @@ def router_list(request):
                 'location': router.location,
                 'active': router.active,
                 'identity': router.identity,
-                # 'created_at': router.created_at.strftime('%Y-%m-%d %H:%M:%S') if router.created_at else None,
+                'created_at': router.created_at.strftime('%Y-%m-%d %H:%M:%S') if router.created_at else None,
                 # 'last_seen': router.last_seen.strftime('%Y-%m-%d %H:%M:%S') if router.last_seen else None,
             })
 
@@ -266,10 +243,9 @@ def router_list(request):
             'all_count': all_count,
             'active_count': active_count,
             'inactive_count': inactive_count,
-            'current_page': page,
-            'total_pages': paginator.num_pages,
-            'has_next': current_page.has_next(),
-            'has_previous': current_page.has_previous()
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'has_next': has_more,
         })
 
     # Handle GET request or other methods
@@ -285,25 +261,30 @@ def router_create(request):
             if not company:
                 return JsonResponse({'error': "Update company information first"}, status=400)
 
-            conn = r_os.RouterOsApiPool(host=data.get('ip'),
-                                        password=data.get('password'),
-                                        username=data.get('username'),
-                                        plaintext_login=True)
-
             try:
-                conn.get_api()
+                conn = api_pool.connect(data.get('ip'), data.get('username'), data.get('password'))
             except:
                 return JsonResponse({'error': "Router is unreachable ensure you "
                                               "have the correct IP Address and credentials."}, status=400)
 
-            router = Router.objects.create(
-                name=data.get('name'),
-                password=data.get('password'),
-                location=data.get('location'),
-                username=data.get('username'),
-                ip_address=data.get('ip'),
-                isp=SystemUser.objects.get(user=request.user.id)
-            )
+            try:
+                router = Router.objects.create(
+                    name=data.get('name'),
+                    # Same naming as provisioned routers (see gen_mtk_provision)
+                    identity=f"{request.user.username}_{data.get('name')}",
+                    password=data.get('password'),
+                    location=data.get('location'),
+                    username=data.get('username'),
+                    ip_address=data.get('ip'),
+                    isp=SystemUser.objects.get(user=request.user.id),
+                    # Added by address, the login above already reached it
+                    provision_status='connected'
+                )
+            except IntegrityError:
+                conn.disconnect()
+                return JsonResponse({'error': f"Router {data.get('name')} already exists."}, status=400)
+            # Keep the login made for the reachability check
+            api_pool.connections.adopt(router.id, conn, router.ip_address, router.username, router.password)
             return JsonResponse(router_to_dict(router), status=201)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
@@ -341,6 +322,7 @@ def router_update(request, pk):
 def router_delete(request, pk):
     router = get_object_or_404(Router, pk=pk)
     if request.method == "DELETE":
+        api_pool.connections.evict(router.id)
         router.delete()
         return JsonResponse({'message': 'Router deleted successfully.'})
     return HttpResponseBadRequest()
@@ -348,7 +330,7 @@ def router_delete(request, pk):
 
 # @csrf_exempt
 def router_count(request):
-    count = Router.objects.filter(isp__user=request.user).count()
+    count = get_counters(request.user.id).routers
     return JsonResponse({'ok': True, "count": count})
 
 
@@ -364,16 +346,53 @@ def router_interfaces(request):
 
 @api_view(["GET"])
 def check_connection(request, mtk):
+    """
+    Connection state of a provisioned router
+
+    Reads the state stored by the router-connected webhook or the
+    watch_connections command; ?wait=<seconds> waits briefly (at most
+    connections.MAX_WAIT) for the router to connect. Without either of them running, falls back to asking the VPN
+    backend directly.
+    """
     user = request.user
     router_identity = f"{user.username}_{mtk}"
     routerExisting = get_object_or_404(Router, identity=router_identity)
-    ip = requests.get(settings.API_URL + f"/mikrotik/openvpn/client_ip/{router_identity}").text.strip()
-    if ip.startswith("10.8.0"):
-        print(ip)
-        routerExisting.ip_address = ip
-        routerExisting.save()
-        return JsonResponse({'ok': True, "ip": ip, "status": "connected"})
-    return JsonResponse({'ok': False})
+    if routerExisting.provision_status != 'connected':
+        if connections.webhook_enabled() or connections.watcher_alive():
+            try:
+                wait = float(request.GET.get('wait', 0))
+            except ValueError:
+                return JsonResponse({'ok': False, 'error': 'Invalid wait'}, status=400)
+            routerExisting = connections.wait_for_connection(routerExisting, user.id, wait)
+        else:
+            ip = connections.lookup_ip(router_identity)
+            if ip:
+                connections.mark_connected({router_identity: ip})
+                return JsonResponse({'ok': True, "ip": ip, "status": "connected"})
+    if routerExisting.provision_status == 'connected':
+        return JsonResponse({'ok': True, "ip": routerExisting.ip_address, "status": "connected"})
+    return JsonResponse({'ok': False, "status": routerExisting.provision_status})
+
+
+@csrf_exempt
+def router_connected_webhook(request):
+    """
+    Called by the VPN side when routers connect
+
+    POST {"identity": ..., "ip": ...} or {"clients": [{"identity": ..., "ip": ...}, ...]}
+    with the shared secret in the X-Webhook-Secret header.
+    """
+    if request.method != "POST":
+        return HttpResponseBadRequest()
+    if not connections.webhook_authorized(request.headers.get('X-Webhook-Secret', '')):
+        return JsonResponse({'ok': False, 'error': 'Forbidden'}, status=403)
+    try:
+        data = json.loads(request.body)
+        clients = data.get('clients') or [data]
+        addresses = {str(c['identity']): str(c['ip']) for c in clients}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'ok': False, 'error': 'Invalid payload'}, status=400)
+    return JsonResponse({'ok': True, 'updated': connections.mark_connected(addresses)})
 
 
 # packages views
@@ -387,8 +406,10 @@ def pkg_list(request):
         data = json.loads(request.body)
         load_type = data.get("load_type", "all")
         search_term = data.get("search", "")
-        page = int(data.get("page", 1))
+        cursor = data.get("cursor")
+        page = int(data.get("page", 1))  # Legacy offset paging, ignored when a cursor is sent
         page_size = 9  # Items per page
+        serializer = PackageSerializer(compact=bool(data.get("compact")))
 
         # Base queryset
         user_pkgs = Package.objects.filter(
@@ -402,32 +423,30 @@ def pkg_list(request):
             pkgs = user_pkgs.all()
 
         # Search functionality
-        if search_term:
-            pkgs = pkgs.filter(
-                Q(name__icontains=search_term) |
-                Q(download_speed__icontains=search_term)
-                # Q(router_identity__icontains=search_term)
-            )
+        pkgs = apply_search(pkgs, search_term)
 
         # Calculate total counts for filters
 
-        all_count = user_pkgs.count()
-        h_count = user_pkgs.filter(type="hotspot").count()
-        p_count = user_pkgs.filter(type="pppoe").count()
+        counts = get_counters(request.user.id)
+        all_count = counts.packages
+        h_count = counts.packages_hotspot
+        p_count = counts.packages_pppoe
 
-        # Calculate pagination
-        start = (page - 1) * page_size
-        end = start + page_size
-        paginated_pkgs = pkgs[start:end]
+        try:
+            paginated_pkgs, next_cursor, has_more = keyset_page(serializer.prepare(pkgs), cursor, page_size, page)
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
 
         # Convert to list of dictionaries
-        pkgs_data = [pkg_to_dict(pkg) for pkg in paginated_pkgs]
+        pkgs_data = serializer.many(paginated_pkgs)
 
         return JsonResponse({
             "pkgs": pkgs_data,
             "all_count": all_count,
             "pppoe_count": p_count,
             "hotspot_count": h_count,
+            "next_cursor": next_cursor,
+            "has_more": has_more,
         }, safe=False)
 
 
@@ -575,39 +594,6 @@ def user_page(request):
     return render(request, 'index.html')
 
 
-def client_to_dict(client):
-    """Convert a Client model instance to a dictionary"""
-    return {
-        'id': client.id,
-        'full_name': client.full_name,
-        'phone': client.phone,
-        'address': client.address,
-        'created_at': client.created_at.isoformat(),
-        'due': client.due.isoformat() if client.due else None,
-        'package_start': client.package_start.strftime('%Y-%m-%d') if client.package_start else None,
-        'router_username': client.router_username,
-        'router_password': client.router_password,
-        'isp': client.isp_id,
-        'package': {
-            'id': client.package.id,
-            'name': client.package.name,
-            'download_speed': client.package.download_speed,
-            'upload_speed': client.package.upload_speed,
-            'duration': client.package.duration,
-            'price': client.package.price,
-            'type': client.package.type,
-            'created_at': client.package.created_at.isoformat() if client.package.created_at else None,
-            'router': {
-                'id': client.package.router.id,
-                'name': client.package.router.name,
-                'username': client.package.router.username,
-                'password': client.package.router.password,
-                'location': client.package.router.location,
-            } if client.package.router else None
-        } if client.package else None
-    }
-
-
 @csrf_exempt
 def user_list(request):
     if request.method == "POST":
@@ -616,49 +602,41 @@ def user_list(request):
             data = json.loads(request.body)
             load_type = data.get("load_type", "all")
             search = data.get("search", "")
+            cursor = data.get("cursor")
             page = data.get("page", 1)
             page_size = data.get("page_size", 10)
+            compact = bool(data.get("compact"))
         else:
             load_type = request.POST.get("load_type", "all")
             search = request.POST.get("search", "")
+            cursor = request.POST.get("cursor")
             page = int(request.POST.get("page", 1))
             page_size = int(request.POST.get("page_size", 10))
+            compact = request.POST.get("compact") in ("1", "true")
 
         # Apply filters based on load_type
+        users = Client.objects.filter(isp=request.user.id)
         if load_type in ["hotspot", "pppoe"]:
-            users = Client.objects.filter(
+            users = users.filter(
                 Q(package__type=load_type)
             )
-        else:
-            users = Client.objects.all()
 
         # Apply search filter if provided
-        if search:
-            users = users.filter(
-                Q(full_name__icontains=search) |
-                Q(phone__icontains=search) |
-                Q(email__icontains=search)
-            )
+        users = apply_search(users, search)
 
         # Calculate total counts
-        all_count = Client.objects.filter(isp=request.user.id).count()
-        h_count = Client.objects.filter(
-            Q(package__type="hotspot")
-        ).count()
-        p_count = Client.objects.filter(
-            Q(package__type="pppoe")
-        ).count()
-
-        # Apply pagination
-        start_index = (page - 1) * page_size
-        end_index = start_index + page_size
-
-        # Get the paginated results and convert to dict
-        paginated_users = users[start_index:end_index]
-        users_data = [client_to_dict(user) for user in paginated_users]
+        counts = get_counters(request.user.id)
+        all_count = counts.clients
+        h_count = counts.clients_hotspot
+        p_count = counts.clients_pppoe
 
-        # Check if there are more results
-        has_more = users.count() > end_index
+        # Get the next page after the cursor and convert to dict
+        try:
+            serializer = ClientSerializer(compact=compact)
+            paginated_users, next_cursor, has_more = keyset_page(serializer.prepare(users), cursor, page_size, page)
+        except InvalidCursor as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        users_data = serializer.many(paginated_users)
 
         return JsonResponse({
             "users": users_data,
@@ -666,7 +644,7 @@ def user_list(request):
             "pppoe_count": p_count,
             "hotspot_count": h_count,
             "has_more": has_more,
-            "total_count": users.count()
+            "next_cursor": next_cursor
         }, safe=False)
 
 
@@ -764,6 +742,7 @@ def user_create(request):
                     invoice=generate_invoice_number(),
                     package_name=package.name,
                     package_price=package.price,
+                    package_type=package.type,
                     package_start=timezone.now().date(),
                     user=request.user
                 )
@@ -776,6 +755,92 @@ def user_create(request):
     return HttpResponseBadRequest()
 
 
+def client_import(request):
+    """Start a bulk client import from an uploaded CSV/JSON file or a JSON body of rows"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    if request.method != "POST":
+        return HttpResponseBadRequest()
+    try:
+        upload = request.FILES.get('file')
+        if upload:
+            fmt = request.POST.get('format') or ('json' if upload.name.lower().endswith('.json') else 'csv')
+            rows = parse_rows(upload.read().decode('utf-8-sig'), fmt)
+            source = upload.name
+        else:
+            rows = parse_rows(request.body.decode('utf-8'), 'json')
+            source = 'api'
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'error': f"Invalid import file: {e}"}, status=400)
+
+    job = create_import(request.user, rows, source=source)
+
+    def run():
+        try:
+            run_import(job)
+        finally:
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return JsonResponse(import_to_dict(job), status=202)
+
+
+def client_import_status(request, pk):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    job = get_object_or_404(ClientImport, pk=pk, isp=request.user)
+    return JsonResponse(import_to_dict(job, include_rows=request.GET.get('rows') == 'all'))
+
+
+def router_metrics(request, pk):
+    """Telemetry series of a router, e.g. ?metric=cpu_load&metric=rx_bps:ether1&hours=24"""
+    router = get_object_or_404(Router, pk=pk, isp__user=request.user.id)
+    try:
+        hours = float(request.GET.get('hours', 24))
+    except ValueError:
+        return JsonResponse({'error': f"Invalid hours: {request.GET['hours']}"}, status=400)
+
+    store = telemetry.get_store()
+    names = request.GET.getlist('metric') or store.metrics(router.id)
+    end = time.time()
+    tier = store.pick_tier(end - hours * 3600, end)
+    return JsonResponse({
+        'router': router.id,
+        'tier': tier,
+        'metrics': {name: store.query(router.id, name, end - hours * 3600, end, tier)['points'] for name in names},
+    })
+
+
+def export_data(request, kind):
+    """Stream the ISP's clients, billing or payments as CSV or NDJSON"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    if kind not in EXPORTS:
+        return JsonResponse({'error': f"Unknown export: {kind}"}, status=404)
+
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"Unsupported format: {fmt}"}, status=400)
+    filters = {'package_type': request.GET.get('type') or None}
+    for key, param in (('start', 'from'), ('end', 'to')):
+        value = request.GET.get(param)
+        filters[key] = parse_date(value) if value else None
+        if value and filters[key] is None:
+            return JsonResponse({'error': f"Invalid date for {param}: {value}"}, status=400)
+
+    isp_id = request.user.id
+    # Admins may export any ISP's data
+    if request.GET.get('isp') and request.user.is_admin():
+        if not request.GET['isp'].isdigit():
+            return JsonResponse({'error': f"Invalid isp: {request.GET['isp']}"}, status=400)
+        isp_id = int(request.GET['isp'])
+
+    response = StreamingHttpResponse(export_lines(kind, isp_id, fmt, **filters),
+                                     content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}-{timezone.localdate():%Y%m%d}.{fmt}"'
+    return response
+
+
 @csrf_exempt
 def user_detail(request, pk):
     router = get_object_or_404(Router, pk=pk)
@@ -805,6 +870,7 @@ def user_update(request, pk):
 def user_delete(request, pk):
     router = get_object_or_404(Router, pk=pk)
     if request.method == "DELETE":
+        api_pool.connections.evict(router.id)
         router.delete()
         return JsonResponse({'message': 'Router deleted successfully.'})
     return HttpResponseBadRequest()
@@ -849,8 +915,10 @@ class MTKView(View):
 
     def post(self, request, pk):
         router = get_object_or_404(Router, id=pk)
-        conn = router.connection()
-        if not conn:
+        try:
+            with router.lease():
+                pass
+        except Exception:
             return JsonResponse({
                 "error": "Router connection failed."
             }, status=401)